@@ -0,0 +1,74 @@
+"""Сравнение cat: старая реализация (f.read + print) против потоковой.
+
+Запуск: python benchmarks/bench_cat.py [размер_МБ]
+Каждый вариант запускается в отдельном процессе с выводом в /dev/null,
+чтобы пиковый RSS (ru_maxrss) относился только к нему.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK = 1 << 20
+
+CHILD = r'''
+import json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+from dsh import DoyarkaTerminal
+
+def old_cat(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        print(f.read())
+
+terminal = DoyarkaTerminal()
+mode, path = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if mode == 'old':
+    old_cat(path)
+else:
+    terminal.cat_file([path] + sys.argv[3:])
+sys.stdout.flush()
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+sys.stderr.write(json.dumps({{'elapsed': elapsed, 'rss_kb': rss}}) + '\n')
+'''
+
+
+def make_file(size_mb):
+    fd, path = tempfile.mkstemp(suffix='.log')
+    line = b'2024-01-01 12:00:00 INFO worker-17 request handled in 12ms status=200\n'
+    block = line * (CHUNK // len(line))
+    with os.fdopen(fd, 'wb') as f:
+        for _ in range(size_mb * (1 << 20) // len(block)):
+            f.write(block)
+    return path
+
+
+def run(mode, path, *extra):
+    code = CHILD.format(root=ROOT)
+    result = subprocess.run([sys.executable, '-c', code, mode, path, *extra],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    path = make_file(size_mb)
+    try:
+        print(f"Файл: {size_mb} МБ")
+        print(f"{'вариант':<12} {'время, с':>10} {'МБ/с':>10} {'пик RSS, МБ':>12}")
+        for label, mode, extra in (('старый', 'old', ()),
+                                   ('новый', 'new', ()),
+                                   ('новый -n', 'new', ('-n',))):
+            r = run(mode, path, *extra)
+            print(f"{label:<12} {r['elapsed']:>10.3f} {size_mb / r['elapsed']:>10.0f} "
+                  f"{r['rss_kb'] / 1024:>12.1f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Сравнение du: последовательный os.walk + lstat против параллельного du_scan и кэша.
+
+Запуск: python benchmarks/bench_du.py [каталогов] [файлов_в_каталоге]
+Повторный замер с кэшем идёт после изменения одного каталога из ста:
+пересканируются только они, остальные берутся по (inode, mtime).
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import disk_usage, du_scan, du_totals
+
+
+def make_tree(dirs, files_per_dir):
+    root = tempfile.mkdtemp(prefix='bench_du_')
+    subs = []
+    for d in range(dirs):
+        sub = os.path.join(root, f'pkg{d // 20:03d}', f'mod{d:05d}')
+        os.makedirs(sub)
+        subs.append(sub)
+        for f in range(files_per_dir):
+            with open(os.path.join(sub, f'obj{f:05d}.o'), 'wb') as fh:
+                fh.write(b'x' * 64)
+    return root, subs
+
+
+def walk_total(root):
+    total = disk_usage(os.lstat(root))
+    for top, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            total += disk_usage(os.lstat(os.path.join(top, name)))
+    return total
+
+
+def main():
+    dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    root, subs = make_tree(dirs, files_per_dir)
+    try:
+        print(f"Дерево: {dirs} каталогов по {files_per_dir} файлов")
+        print(f"{'вариант':<20} {'время, с':>10} {'байт':>12}")
+        start = time.perf_counter()
+        total = walk_total(root)
+        print(f"{'os.walk + lstat':<20} {time.perf_counter() - start:>10.3f} {total:>12}")
+
+        start = time.perf_counter()
+        records = du_scan([root])
+        total = du_totals(records)[root]
+        print(f"{'du_scan':<20} {time.perf_counter() - start:>10.3f} {total:>12}")
+
+        cache = {key: entry for _, _, _, key, entry, _, _ in records}
+        for sub in subs[::100]:
+            with open(os.path.join(sub, 'new.o'), 'wb') as fh:
+                fh.write(b'y' * 64)
+        start = time.perf_counter()
+        records = du_scan([root], cache)
+        total = du_totals(records)[root]
+        print(f"{'du_scan + кэш':<20} {time.perf_counter() - start:>10.3f} {total:>12}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Сравнение grep: построчный цикл (прежний grep) против grep_file по mmap.
+
+Запуск: python benchmarks/bench_grep.py [мегабайт]
+Каждый вариант выполняется в отдельном процессе (fork), чтобы измерить его
+пиковый RSS через wait4; вывод идёт в /dev/null. Вариант -i с не-ASCII
+шаблоном ищет по тексту, декодированному окнами, поэтому его память не
+растёт с размером файла. В RSS вариантов с mmap входят и прочитанные
+страницы файла — это страничный кэш, а не копии данных.
+"""
+
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import grep_file
+
+PATTERN = 'привет'
+
+
+def make_input(megabytes):
+    fd, path = tempfile.mkstemp(prefix='bench_grep_')
+    rng = random.Random(1)
+    words = [f'{rng.getrandbits(40):x}' for _ in range(5000)] + ['Привет', 'ПРИВЕТ', 'привет']
+    cum_weights = list(range(1, 5001)) + [5002, 5004, 5006]
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        while f.tell() < megabytes * 1024 * 1024:
+            f.write('\n'.join(' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(2, 12)))
+                              for _ in range(10000)) + '\n')
+    return path
+
+
+def line_loop(path, ignore_case):
+    """Прежний grep: текстовый файл построчно, проверка каждой строки"""
+    regex = re.compile(PATTERN, re.IGNORECASE) if ignore_case else None
+    with open(path, 'r', encoding='utf-8') as f, open(os.devnull, 'w') as out:
+        for i, line in enumerate(f, 1):
+            if (regex.search(line) if regex else PATTERN in line):
+                out.write(f"{path}:{i}: {line.strip()}\n")
+
+
+def mmap_grep(path, ignore_case):
+    if ignore_case:
+        pattern = re.compile(PATTERN, re.MULTILINE | re.IGNORECASE)
+    else:
+        pattern = re.compile(re.escape(PATTERN.encode()), re.MULTILINE)
+    with open(os.devnull, 'wb') as out:
+        out.write(grep_file(path, path, pattern, 'n') or b'')
+
+
+def measure(func, *args):
+    """Время и пиковый RSS (МБ) варианта в дочернем процессе"""
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        func(*args)
+        os._exit(0)
+    _, status, usage = os.wait4(pid, 0)
+    if status:
+        raise RuntimeError(f'вариант завершился с кодом {status}')
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    path = make_input(megabytes)
+    try:
+        print(f"Ввод: {megabytes} МБ, шаблон: {PATTERN}")
+        print(f"{'вариант':<32} {'время, с':>10} {'пик RSS, МБ':>12}")
+        variants = [('построчный цикл', line_loop, False),
+                    ('grep_file (байты, mmap)', mmap_grep, False),
+                    ('построчный цикл -i', line_loop, True),
+                    ('grep_file -i (окна текста)', mmap_grep, True)]
+        for label, func, ignore_case in variants:
+            elapsed, peak = measure(func, path, ignore_case)
+            print(f"{label:<32} {elapsed:>10.3f} {peak:>12.0f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
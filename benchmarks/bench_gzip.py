@@ -0,0 +1,68 @@
+"""Сравнение сжатия: gzip.GzipFile (один поток) против ParallelGzipWriter (блоки в пуле потоков).
+
+Запуск: python benchmarks/bench_gzip.py [мегабайт] [потоков ...]
+Данные — текст, похожий на журнал. Для каждого варианта печатаются
+скорость и степень сжатия: словарь из предыдущего блока держит её почти
+на уровне однопоточного gzip. Ускорение ограничено числом ядер.
+"""
+
+import gzip
+import io
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import GZIP_LEVEL, ParallelGzipWriter
+
+
+def make_data(megabytes):
+    rng = random.Random(1)
+    levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        line = (f"2026-10-18 12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                f"{rng.choice(levels)} worker-{rng.randint(1, 64)} request {rng.getrandbits(48):x} "
+                f"took {rng.random() * 100:.3f} ms\n")
+        lines.append(line)
+        size += len(line)
+    return ''.join(lines).encode()
+
+
+def compress_gzipfile(data):
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb', compresslevel=GZIP_LEVEL) as f:
+        for start in range(0, len(data), 1024 * 1024):
+            f.write(data[start:start + 1024 * 1024])
+    return out.getvalue()
+
+
+def compress_parallel(data, workers):
+    out = io.BytesIO()
+    with ParallelGzipWriter(out, workers=workers) as writer:
+        for start in range(0, len(data), 1024 * 1024):
+            writer.write(data[start:start + 1024 * 1024])
+    return out.getvalue()
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    workers = [int(arg) for arg in sys.argv[2:]] or sorted({1, 2, os.cpu_count() or 1})
+    data = make_data(megabytes)
+    print(f"Данные: {len(data) / 1024 / 1024:.0f} МБ, ядер: {os.cpu_count()}")
+    print(f"{'вариант':<24} {'МБ/с':>8} {'сжатие, %':>10}")
+    variants = [('gzip.GzipFile', compress_gzipfile, ())]
+    variants += [(f'ParallelGzipWriter x{n}', compress_parallel, (n,)) for n in workers]
+    for label, func, args in variants:
+        start = time.perf_counter()
+        packed = func(data, *args)
+        elapsed = time.perf_counter() - start
+        assert zlib.decompress(packed, 16 + zlib.MAX_WBITS) == data
+        print(f"{label:<24} {len(data) / 1024 / 1024 / elapsed:>8.1f} {100 * len(packed) / len(data):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Сравнение sha256sum: системная утилита с перехватом вывода, последовательное хэширование и пул потоков.
+
+Запуск: python benchmarks/bench_hash.py [файлов] [размер_МБ]
+Файлы создаются во временном каталоге и к замерам уже лежат в page cache.
+Выигрыш пула растёт с числом ядер: hashlib отпускает GIL на блоках от 2 КБ.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import hash_file, hash_files
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    size_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    root = tempfile.mkdtemp(prefix='bench_hash_')
+    try:
+        paths = []
+        block = os.urandom(1 << 20)
+        for i in range(count):
+            path = os.path.join(root, f'artifact{i:04d}.bin')
+            with open(path, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+            paths.append(path)
+        total = count * size_mb
+        print(f"Файлов: {count} по {size_mb} МБ, ядер: {os.cpu_count()}")
+        print(f"{'вариант':<24} {'время, с':>10} {'МБ/с':>8}")
+        variants = [('hash_file по очереди', lambda: [hash_file(p, hashlib.sha256) for p in paths]),
+                    ('hash_files (пул)', lambda: list(hash_files(paths, hashlib.sha256)))]
+        if shutil.which('sha256sum'):
+            variants.insert(0, ('sha256sum (capture)',
+                                lambda: subprocess.run(['sha256sum'] + paths, capture_output=True)))
+        for label, func in variants:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<24} {elapsed:>10.3f} {total / elapsed:>8.0f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Сравнение ls на синтетическом огромном каталоге: старая реализация против новой.
+
+Запуск: python benchmarks/bench_ls.py [число_файлов]
+Вывод обеих реализаций направляется в /dev/null.
+"""
+
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+def old_get_permissions(path):
+    stat = os.stat(path)
+    permissions = ['d' if os.path.isdir(path) else '-']
+    for bit, ch in zip((0o400, 0o200, 0o100, 0o040, 0o020, 0o010, 0o004, 0o002, 0o001), 'rwxrwxrwx'):
+        permissions.append(ch if stat.st_mode & bit else '-')
+    return ''.join(permissions)
+
+
+def old_ls(path, long_format):
+    for file in os.listdir(path):
+        if file.startswith('.'):
+            continue
+        file_path = os.path.join(path, file)
+        if long_format:
+            stat = os.stat(file_path)
+            mtime = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
+            print(f"{old_get_permissions(file_path)} {stat.st_size:8d} {mtime} {file}")
+        elif os.path.isdir(file_path):
+            print(f"\033[94m{file}/\033[0m")
+        elif os.access(file_path, os.X_OK):
+            print(f"\033[92m{file}\033[0m")
+        else:
+            print(file)
+
+
+def make_dir(count):
+    path = tempfile.mkdtemp(prefix='bench_ls_')
+    for i in range(count):
+        if i % 50 == 0:
+            os.mkdir(os.path.join(path, f'dir{i:07d}'))
+        else:
+            with open(os.path.join(path, f'file{i:07d}.dat'), 'wb') as f:
+                f.write(b'x' * (i % 4096))
+    return path
+
+
+def measure(func):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = make_dir(count)
+    terminal = DoyarkaTerminal()
+    try:
+        print(f"Каталог: {count} записей")
+        print(f"{'вариант':<16} {'старый, с':>10} {'новый, с':>10} {'ускорение':>10}")
+        for label, long_format, args in (('ls', False, []),
+                                         ('ls -l', True, ['-l']),
+                                         ('ls -lS', None, ['-lS'])):
+            if long_format is None:
+                old = None
+            else:
+                old = measure(lambda: old_ls(path, long_format))
+            new = measure(lambda: terminal.list_files(args + [path]))
+            old_text = f"{old:>10.3f}" if old is not None else f"{'—':>10}"
+            speedup = f"{old / new:>9.1f}x" if old is not None else f"{'—':>10}"
+            print(f"{label:<16} {old_text} {new:>10.3f} {speedup}")
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
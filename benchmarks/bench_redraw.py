@@ -0,0 +1,64 @@
+"""Сравнение перерисовки nano: os.system('clear') + печать кадра против Screen.
+
+Запуск: python benchmarks/bench_redraw.py [кадров]
+Кадр — экран редактора, в котором между нажатиями меняется одна строка
+(как при движении курсора). Вывод направляется в /dev/null; кроме времени
+кадра печатается объём вывода — он определяет задержку по SSH.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import Screen
+
+ROWS = 20
+
+
+def make_frame(n):
+    lines = ["DOYARKA NANO - bench.txt", "Команды: Ctrl+S - Сохранить, Ctrl+X - Выход", "─" * 50]
+    cursor = n % ROWS
+    for i in range(ROWS):
+        marker = ">" if i == cursor else " "
+        lines.append(f"{marker} {i + 1:3d}: строка номер {i} с каким-то текстом")
+    lines.extend(["─" * 50, f"Строка {cursor + 1}/{ROWS}"])
+    return lines
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    os.environ.setdefault('TERM', 'xterm')
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        start = time.perf_counter()
+        old_bytes = 0
+        for n in range(frames):
+            os.system('clear')
+            text = '\n'.join(make_frame(n)) + '\n'
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            old_bytes += len(text) + 10
+        old = (time.perf_counter() - start) / frames
+
+        screen = Screen()
+        screen.size = lambda: (120, 40)
+        for n in range(frames):
+            screen.render(make_frame(n))
+        new = sum(screen.frame_times) / len(screen.frame_times)
+        new_bytes = screen.bytes_written
+    finally:
+        os.dup2(saved, 1)
+        os.close(devnull)
+
+    print(f"Кадров: {frames}")
+    print(f"{'вариант':<16} {'мс/кадр':>10} {'байт/кадр':>10}")
+    print(f"{'clear + print':<16} {old * 1000:>10.3f} {old_bytes / frames:>10.0f}")
+    print(f"{'Screen':<16} {new * 1000:>10.3f} {new_bytes / frames:>10.0f}")
+    print(f"ускорение: {old / new:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Сравнение rm -r: shutil.rmtree (старая реализация) против параллельного удаления.
+
+Запуск: python benchmarks/bench_rm.py [каталогов] [файлов_в_каталоге]
+Для каждого варианта создаётся одинаковое синтетическое дерево.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import remove_tree
+
+
+def make_tree(dirs, files_per_dir):
+    root = tempfile.mkdtemp(prefix='bench_rm_')
+    for d in range(dirs):
+        sub = os.path.join(root, f'pkg{d // 20:03d}', f'mod{d:05d}')
+        os.makedirs(sub)
+        for f in range(files_per_dir):
+            with open(os.path.join(sub, f'obj{f:05d}.o'), 'wb') as fh:
+                fh.write(b'x' * 64)
+    return root
+
+
+def main():
+    dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    entries = dirs * (files_per_dir + 1)
+    print(f"Дерево: {dirs} каталогов по {files_per_dir} файлов (~{entries} объектов)")
+    print(f"{'вариант':<16} {'время, с':>10} {'объектов/с':>12}")
+    for label, func in (('shutil.rmtree', shutil.rmtree),
+                        ('remove_tree', remove_tree)):
+        root = make_tree(dirs, files_per_dir)
+        start = time.perf_counter()
+        func(root)
+        elapsed = time.perf_counter() - start
+        assert not os.path.exists(root)
+        print(f"{label:<16} {elapsed:>10.3f} {entries / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Сравнение сбора данных для neofetch/top: открытие и разбор /proc на каждый вызов против ProcSampler.
+
+Запуск: python benchmarks/bench_sampler.py [вызовов]
+Старый вариант повторяет прежние get_uptime/get_cpu_info/get_memory_info и
+platform.*; ProcSampler читает /proc через открытые дескрипторы (os.pread)
+и отдаёт свежий снимок из кэша. Отдельно замерен полный снимок процессов
+без кэша (кадр top).
+"""
+
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import ProcSampler
+
+
+def old_snapshot():
+    with open('/proc/uptime', 'r') as f:
+        uptime = float(f.readline().split()[0])
+    cpu = None
+    with open('/proc/cpuinfo', 'r') as f:
+        for line in f:
+            if 'model name' in line:
+                cpu = line.split(':')[1].strip()
+                break
+    with open('/proc/meminfo', 'r') as f:
+        for line in f:
+            if 'MemTotal' in line:
+                memory = int(line.split()[1])
+                break
+    return platform.system(), platform.node(), platform.release(), uptime, cpu, memory
+
+
+def measure(calls, func):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if not os.path.exists('/proc/stat'):
+        print("Нужен /proc (Linux)")
+        return
+    sampler = ProcSampler()
+
+    def cached():
+        sampler.static()
+        return sampler.sample()
+
+    print(f"Вызовов: {calls}")
+    print(f"{'вариант':<28} {'мкс/вызов':>10}")
+    for label, func in (('open + разбор /proc', old_snapshot),
+                        ('ProcSampler (кэш)', cached),
+                        ('ProcSampler без кэша', lambda: sampler.sample(max_age=0)),
+                        ('снимок процессов (top)', lambda: sampler.sample(True, max_age=0))):
+        func()
+        print(f"{label:<28} {measure(calls if 'top' not in label else calls // 20, func) * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
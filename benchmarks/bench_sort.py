@@ -0,0 +1,76 @@
+"""Сравнение sort: всё в памяти (readlines + sort) против external_sort с лимитом памяти.
+
+Запуск: python benchmarks/bench_sort.py [мегабайт] [лимит_МБ] [процессов]
+Каждый вариант выполняется в отдельном процессе (fork), чтобы измерить его
+пиковый RSS через wait4; вывод идёт в /dev/null. При лимите меньше объёма
+ввода external_sort сбрасывает прогоны во временные файлы и сливает их.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import external_sort, read_line_runs, write_lines
+
+
+def make_input(megabytes):
+    fd, path = tempfile.mkstemp(prefix='bench_sort_')
+    rng = random.Random(1)
+    words = [f'{rng.getrandbits(40):x}' for _ in range(5000)]
+    with os.fdopen(fd, 'w') as f:
+        while f.tell() < megabytes * 1024 * 1024:
+            f.write('\n'.join(' '.join(rng.choices(words, k=rng.randint(2, 8)))
+                              for _ in range(10000)) + '\n')
+    return path
+
+
+def in_memory(path):
+    with open(path, 'rb') as f, open(os.devnull, 'wb') as out:
+        out.writelines(sorted(f.readlines()))
+
+
+def external(path, limit, parallel):
+    with open(path, 'rb') as f, open(os.devnull, 'wb') as out:
+        write_lines(out, external_sort(read_line_runs([f], limit), (None, None, False),
+                                       parallel=parallel))
+
+
+def measure(func, *args):
+    """Время и пиковый RSS (МБ) варианта в дочернем процессе"""
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        func(*args)
+        os._exit(0)
+    _, status, usage = os.wait4(pid, 0)
+    if status:
+        raise RuntimeError(f'вариант завершился с кодом {status}')
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    parallel = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    path = make_input(megabytes)
+    try:
+        print(f"Ввод: {megabytes} МБ, лимит: {limit} МБ, процессов: {parallel}")
+        print(f"{'вариант':<28} {'время, с':>10} {'пик RSS, МБ':>12}")
+        variants = [('readlines + sort', in_memory, (path,)),
+                    (f'external_sort {limit}M', external, (path, limit * 1024 * 1024, 1))]
+        if parallel > 1:
+            # как в sort --parallel: память делится между процессами и чтением
+            variants.append((f'external_sort {limit}M x{parallel}', external,
+                             (path, limit * 1024 * 1024 // (parallel + 1), parallel)))
+        for label, func, args in variants:
+            elapsed, peak = measure(func, *args)
+            print(f"{label:<28} {elapsed:>10.3f} {peak:>12.0f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Сравнение запуска коротких внешних команд: поиск по PATH на каждый запуск против hash.
+
+Запуск: python benchmarks/bench_spawn.py [запусков] [команда ...]
+По умолчанию команда — true. Старая схема — subprocess.Popen, который сам
+перебирает каталоги PATH; новая — execute_system_command с путём из таблицы
+hash. Выигрыш растёт с длиной PATH и позицией каталога команды в нём.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import COMMAND_HASH, DoyarkaTerminal
+
+
+def measure(runs, func, rounds=5):
+    """Лучший из нескольких раундов: запуск процессов сильно зашумлён"""
+    best = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(runs):
+            func()
+        best = max(best, runs / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    argv = sys.argv[2:] or ['true']
+    terminal = DoyarkaTerminal(interactive=False)
+    cwd = terminal.current_dir
+    executable = COMMAND_HASH.lookup(argv[0], cwd)
+
+    def old():
+        subprocess.Popen(argv, cwd=cwd).wait()
+
+    def new():
+        terminal.execute_system_command(argv)
+
+    print(f"Команда: {' '.join(argv)} ({executable}), запусков: {runs}, каталогов в PATH: {len(COMMAND_HASH.dirs)}")
+    print(f"{'вариант':<24} {'команд/с':>10}")
+    results = {}
+    for label, func in (('поиск в PATH', old),
+                        ('hash', new)):
+        func()
+        results[label] = measure(runs, func)
+        print(f"{label:<24} {results[label]:>10.0f}")
+    print(f"ускорение: {results['hash'] / results['поиск в PATH']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Регрессионный замер запуска dsh: время до первого приглашения и dsh -c true.
+
+Запуск: python benchmarks/bench_startup.py [повторов] [--dsh путь/к/dsh.py]
+                                           [--max-prompt мс] [--max-true мс]
+Приглашение ждётся через псевдотерминал (pty), как у интерактивного
+пользователя; HOME подменяется пустым каталогом, чтобы не влияла история.
+Замеры идут для запуска скриптом (python dsh.py, файл компилируется каждый
+раз) и модулем (python -m dsh, байткод из __pycache__). При превышении
+порогов (по медиане, для python dsh.py) скрипт завершается с кодом 1.
+"""
+
+import os
+import pty
+import select
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dsh_argv(dsh, module):
+    if module:
+        return [sys.executable, '-m', os.path.splitext(os.path.basename(dsh))[0]]
+    return [sys.executable, dsh]
+
+
+def time_to_prompt(dsh, env, module=False):
+    """Запустить dsh в pty и дождаться приглашения; вернуть секунды"""
+    argv = dsh_argv(dsh, module)
+    start = time.perf_counter()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execve(sys.executable, argv, env)
+    output = b''
+    try:
+        while not output.rstrip(b' ').endswith(b'$'):
+            if not select.select([fd], [], [], 10)[0]:
+                raise RuntimeError('приглашение не появилось за 10 с')
+            output += os.read(fd, 4096)
+        elapsed = time.perf_counter() - start
+        os.write(fd, b'exit\n')
+        while True:
+            try:
+                if not os.read(fd, 4096):
+                    break
+            except OSError:
+                break
+    finally:
+        os.close(fd)
+        os.waitpid(pid, 0)
+    return elapsed
+
+
+def time_command(dsh, env, module=False):
+    start = time.perf_counter()
+    subprocess.run(dsh_argv(dsh, module) + ['-c', 'true'], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def time_command_python(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    options = {'--dsh': os.path.join(ROOT, 'dsh.py'), '--max-prompt': None, '--max-true': None}
+    runs = 20
+    while args:
+        arg = args.pop(0)
+        if arg in options:
+            options[arg] = args.pop(0)
+        else:
+            runs = int(arg)
+    home = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(os.environ, HOME=home, TERM='xterm',
+               PYTHONPATH=os.path.dirname(os.path.abspath(options['--dsh'])))
+    # как у обычного пользователя: байткод кэшируется в __pycache__
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    try:
+        time_command(options['--dsh'], env, module=True)
+        results = {}
+        for label, measure, module in (('приглашение', time_to_prompt, False),
+                                       ('-c true', time_command, False),
+                                       ('приглашение -m', time_to_prompt, True),
+                                       ('-c true -m', time_command, True)):
+            results[label] = [measure(options['--dsh'], env, module) for _ in range(runs)]
+        baseline = [time_command_python(env) for _ in range(runs)]
+    finally:
+        shutil.rmtree(home)
+
+    print(f"dsh: {options['--dsh']}, повторов: {runs}")
+    print(f"{'замер':<16} {'медиана, мс':>12} {'мин, мс':>10}")
+    for label, times in list(results.items()) + [('python -c pass', baseline)]:
+        print(f"{label:<16} {statistics.median(times) * 1000:>12.1f} {min(times) * 1000:>10.1f}")
+
+    failed = False
+    for label, option in (('приглашение', '--max-prompt'), ('-c true', '--max-true')):
+        limit = options[option]
+        median = statistics.median(results[label]) * 1000
+        if limit is not None and median > float(limit):
+            print(f"РЕГРЕССИЯ: {label} {median:.1f} мс > {limit} мс")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
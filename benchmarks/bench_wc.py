@@ -0,0 +1,77 @@
+"""Сравнение wc и tail на большом логе: построчный цикл Python против счёта блоками и чтения с конца.
+
+Запуск: python benchmarks/bench_wc.py [размер_МБ]
+Построчные варианты повторяют наивную реализацию (for line in f); новые —
+count_stream (bytes.count и translate по блокам) и tail_start (блоки с конца).
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import count_stream, tail_start
+
+
+def naive_wc(path):
+    lines = words = size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            lines += 1
+            words += len(line.split())
+            size += len(line)
+    return lines, words, size
+
+
+def naive_tail(path, count):
+    with open(path, 'rb') as f:
+        return f.readlines()[-count:]
+
+
+def block_tail(path, count):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(tail_start(lambda pos, n: os.pread(f.fileno(), n, pos), size, count))
+        return f.read()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    line = b'2024-05-01 12:00:00 INFO request served path=/api/v1/items status=200\n'
+    fd, path = tempfile.mkstemp(prefix='bench_wc_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            block = line * (CHUNK // len(line))
+            for _ in range(size_mb * (1 << 20) // len(block)):
+                f.write(block)
+        print(f"Файл: {os.path.getsize(path) >> 20} МБ")
+        print(f"{'вариант':<28} {'время, с':>10}")
+        elapsed, expected = timed(naive_wc, path)
+        print(f"{'wc: for line in f':<28} {elapsed:>10.3f}")
+        with open(path, 'rb') as f:
+            elapsed, result = timed(count_stream, f)
+        assert result == expected
+        print(f"{'wc: count_stream':<28} {elapsed:>10.3f}")
+        with open(path, 'rb') as f:
+            elapsed, _ = timed(count_stream, f, False)
+        print(f"{'wc -l: count_stream':<28} {elapsed:>10.3f}")
+        elapsed, expected = timed(naive_tail, path, 10)
+        print(f"{'tail: readlines()[-10:]':<28} {elapsed:>10.3f}")
+        elapsed, result = timed(block_tail, path, 10)
+        assert result == b''.join(expected)
+        print(f"{'tail: tail_start':<28} {elapsed:>10.6f}")
+    finally:
+        os.remove(path)
+
+
+CHUNK = 1 << 20
+
+if __name__ == '__main__':
+    main()
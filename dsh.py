@@ -1,692 +1,6644 @@
-
+import bisect
+import errno
+import fnmatch
+import marshal
+import mmap
 import os
-import shutil
-import subprocess
+import re
+import select
+import signal
+import stat
+import struct
 import sys
-import platform
-from pathlib import Path
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+
+# Тяжёлые модули (asyncio, concurrent.futures, subprocess, shutil, json,
+# tempfile, socket, platform, queue, glob) импортируются в функциях, которым
+# они нужны: до первого приглашения загружается только необходимое
+# (см. dsh --startup-profile).
+
+# readline загружается только для интерактивного приглашения
+readline = None
+
+
+class ReadlineStub:
+    """Заглушка, если нет ни readline, ни pyreadline"""
+    def read_history_file(self, file): pass
+    def write_history_file(self, file): pass
+
+
+def load_readline():
+    """Импортировать readline (на Windows — pyreadline) при первой надобности"""
+    global readline
+    if readline is None:
+        try:
+            import readline as module  # Для Linux/macOS
+        except ImportError:
+            try:
+                import pyreadline as module  # Для Windows
+            except ImportError:
+                module = ReadlineStub()
+        readline = module
+    return readline
 
-# Заменяем readline на кроссплатформенное решение
+# Посимвольный ввод с терминала и блокировки файлов (нет на Windows)
+try:
+    import termios
+except ImportError:
+    termios = None
 try:
-    import readline  # Для Linux/macOS
+    import fcntl
 except ImportError:
-    # Для Windows используем pyreadline
+    fcntl = None
+
+# Размер блока для потокового чтения файлов
+CHUNK_SIZE = 1 << 20
+
+# Непечатаемые символы для cat -A (нотация ^X и M-X, как в GNU cat)
+CAT_VISIBLE_RE = re.compile(rb'[^\x20-\x7e\n]')
+CAT_VISIBLE = {}
+for _byte in range(256):
+    _prefix = b''
+    _low = _byte
+    if _low >= 0x80:
+        _prefix = b'M-'
+        _low -= 0x80
+    if _low < 0x20:
+        _text = b'^' + bytes([_low + 0x40])
+    elif _low == 0x7f:
+        _text = b'^?'
+    else:
+        _text = bytes([_low])
+    CAT_VISIBLE[bytes([_byte])] = _prefix + _text
+del _byte, _prefix, _low, _text
+
+
+def split_options(args):
+    """Разделить аргументы на набор однобуквенных ключей и операнды"""
+    flags = set()
+    operands = []
+    only_operands = False
+    for arg in args:
+        if only_operands or arg == '-' or not arg.startswith('-'):
+            operands.append(arg)
+        elif arg == '--':
+            only_operands = True
+        else:
+            flags.update(arg[1:])
+    return flags, operands
+
+
+def describe_error(error):
+    """Текст ошибки ОС в стиле сообщений терминала"""
+    if isinstance(error, FileNotFoundError):
+        return "Нет такого файла или каталога"
+    if isinstance(error, PermissionError):
+        return "Отказано в доступе"
+    if isinstance(error, IsADirectoryError):
+        return "Это каталог"
+    if isinstance(error, NotADirectoryError):
+        return "Это не каталог"
+    if getattr(error, 'errno', None) == errno.ENOEXEC:
+        return "Неверный формат исполняемого файла"
+    return error.strerror or str(error)
+
+
+# Отметка «встроенная команда сообщила об ошибке» — своя у каждого потока
+# (стадии конвейера выполняются в потоках); по ней execute возвращает 1
+BUILTIN_STATUS = threading.local()
+
+
+def report_error(*args, **kwargs):
+    """print для сообщения об ошибке встроенной команды: её код завершения станет 1"""
+    BUILTIN_STATUS.failed = True
+    print(*args, **kwargs)
+
+
+def exit_status(returncode):
+    """Код завершения процесса в виде оболочки: убит сигналом N — 128 + N"""
+    return 128 - returncode if returncode < 0 else returncode
+
+
+def binary_stdout():
+    """Получить бинарный поток stdout (сбросив текстовый буфер)"""
+    sys.stdout.flush()
+    return getattr(sys.stdout, 'buffer', sys.stdout)
+
+
+def copy_stream(src, dst):
+    """Скопировать файл в поток блоками, по возможности через sendfile"""
+    try:
+        dst_fd = dst.fileno()
+        src_fd = src.fileno()
+    except (AttributeError, OSError, ValueError):
+        dst_fd = None
+    
+    if dst_fd is not None and hasattr(os, 'sendfile') and src.seekable():
+        dst.flush()
+        offset = src.tell()
+        try:
+            while True:
+                sent = os.sendfile(dst_fd, src_fd, offset, CHUNK_SIZE)
+                if sent == 0:
+                    # sendfile не сдвигает позицию файла — ставим её на конец скопированного
+                    src.seek(offset)
+                    return
+                offset += sent
+        except OSError:
+            # sendfile не поддерживается для этой пары дескрипторов
+            src.seek(offset)
+    
+    buf = bytearray(CHUNK_SIZE)
+    view = memoryview(buf)
+    while True:
+        n = src.readinto(buf)
+        if not n:
+            break
+        dst.write(view[:n])
+    dst.flush()
+
+
+class ThreadLocalStream:
+    """Прокси для sys.stdout/sys.stdin, позволяющий подменить поток в отдельном потоке выполнения
+
+    Встроенные команды пишут в sys.stdout и читают sys.stdin как обычно; стадии
+    конвейера, работающие параллельно в разных потоках, видят каждая свои каналы.
+    """
+    
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+    
+    def current(self):
+        stream = getattr(self._local, 'stream', None)
+        return self._default if stream is None else stream
+    
+    def set(self, stream):
+        previous = getattr(self._local, 'stream', None)
+        self._local.stream = stream
+        return previous
+    
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+    
+    def __iter__(self):
+        return iter(self.current())
+
+
+@contextmanager
+def redirect_stdio(stdin=None, stdout=None, stderr=None):
+    """Подменить stdin/stdout/stderr только для текущего потока выполнения"""
+    streams = {'stdin': stdin, 'stdout': stdout, 'stderr': stderr}
+    previous = {}
+    for name, stream in streams.items():
+        if stream is None:
+            continue
+        if not isinstance(getattr(sys, name), ThreadLocalStream):
+            setattr(sys, name, ThreadLocalStream(getattr(sys, name)))
+        previous[name] = getattr(sys, name).set(stream)
     try:
-        import pyreadline as readline
-    except ImportError:
-        # Если pyreadline не установлен, создаем заглушку
-        class ReadlineStub:
-            def read_history_file(self, file): pass
-            def write_history_file(self, file): pass
-        readline = ReadlineStub()
+        yield
+    finally:
+        for name, stream in previous.items():
+            getattr(sys, name).set(stream)
 
-class DoyarkaTerminal:
+
+def stdout_target():
+    """Дескриптор текущего stdout для дочернего процесса (None — унаследовать)"""
+    sys.stdout.flush()
+    try:
+        fd = sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError):
+        import subprocess
+        return subprocess.PIPE
+    return None if fd == 1 else fd
+
+
+def stdin_target():
+    """Дескриптор текущего stdin для дочернего процесса (None — унаследовать)"""
+    try:
+        fd = sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        import subprocess
+        return subprocess.DEVNULL
+    return None if fd == 0 else fd
+
+
+def stderr_target():
+    """Дескриптор текущего stderr для дочернего процесса (None — унаследовать)"""
+    sys.stderr.flush()
+    try:
+        fd = sys.stderr.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    return None if fd == 2 else fd
+
+
+# Операторы конвейера и перенаправлений (& в конце — фоновый запуск)
+PIPELINE_OPERATORS = ('|', '<', '>', '>>')
+OPERATOR_CHARS = '|<>&'
+
+
+class Operator(str):
+    """Оператор | < > >> & из командной строки (в кавычках это обычное слово)"""
+    __slots__ = ()
+
+
+def split_command(command):
+    """Разбить строку на слова по правилам sh: кавычки, \\-экранирование, операторы
+
+    Операторы | < > >> & выделяются, только если они не в кавычках и не
+    экранированы, и возвращаются как Operator — '>' и "a & b" остаются
+    словами. # начинает комментарий только в начале слова.
+    """
+    parts = []
+    word = None  # None — слова нет, '' — пустое слово из кавычек
+    i, n = 0, len(command)
+    while i < n:
+        c = command[i]
+        if c in ' \t\r\n':
+            if word is not None:
+                parts.append(word)
+                word = None
+        elif c == '\\':
+            i += 1
+            if i >= n:
+                raise ValueError("нет символа после \\")
+            word = (word or '') + command[i]
+        elif c == "'":
+            end = command.find("'", i + 1)
+            if end < 0:
+                raise ValueError("нет закрывающей кавычки")
+            word = (word or '') + command[i + 1:end]
+            i = end
+        elif c == '"':
+            chars = []
+            i += 1
+            while i < n and command[i] != '"':
+                if command[i] == '\\' and command[i + 1:i + 2] in ('\\', '"', '$', '`'):
+                    i += 1
+                chars.append(command[i])
+                i += 1
+            if i >= n:
+                raise ValueError("нет закрывающей кавычки")
+            word = (word or '') + ''.join(chars)
+        elif c in OPERATOR_CHARS:
+            if word is not None:
+                parts.append(word)
+                word = None
+            if command.startswith('>>', i):
+                c = '>>'
+                i += 1
+            parts.append(Operator(c))
+        elif c == '#' and word is None:
+            break
+        else:
+            word = (word or '') + c
+        i += 1
+    if word is not None:
+        parts.append(word)
+    return parts
+
+
+def is_operator(part):
+    """Является ли слово оператором командной строки (не в кавычках)"""
+    return isinstance(part, Operator)
+
+
+def parse_pipeline(parts):
+    """Разобрать слова в стадии конвейера и перенаправления ввода/вывода"""
+    stages = [[]]
+    redirects = {}
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        if not is_operator(part):
+            stages[-1].append(part)
+        elif part == '|':
+            if not stages[-1]:
+                raise ValueError("неожиданный '|'")
+            stages.append([])
+        elif part in ('<', '>', '>>'):
+            if i + 1 >= len(parts) or is_operator(parts[i + 1]):
+                raise ValueError(f"неожиданный '{part}'")
+            redirects[str(part)] = parts[i + 1]
+            i += 1
+        else:
+            raise ValueError(f"неожиданный '{part}'")
+        i += 1
+    if not stages[-1]:
+        raise ValueError("пустая команда в конвейере")
+    return stages, redirects
+
+
+# Блокировка вывода фоновых заданий: строки печатаются целиком
+OUTPUT_LOCK = threading.Lock()
+
+
+def pump_lines(fd, target):
+    """Переслать вывод фонового задания из канала в target только целыми строками"""
+    tail = b''
+    with open(fd, 'rb', 0) as src:
+        while True:
+            data = src.read(CHUNK_SIZE)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind(b'\n') + 1
+            if not cut and len(data) < CHUNK_SIZE:
+                tail = data
+                continue
+            cut = cut or len(data)
+            data, tail = data[:cut], data[cut:]
+            write_locked(target, data)
+    if tail:
+        write_locked(target, tail + b'\n')
+
+
+def write_locked(target, data):
+    """Записать байты в поток под блокировкой вывода (ошибки закрытого потока игнорируются)"""
+    try:
+        with OUTPUT_LOCK:
+            target.flush()
+            out = getattr(target, 'buffer', target)
+            out.write(data)
+            out.flush()
+    except (OSError, ValueError):
+        pass
+
+
+def process_group_options(group):
+    """Аргументы Popen для запуска в группе процессов group (0 — новая группа, None — группа оболочки)"""
+    if group is None:
+        return {}
+    if sys.version_info >= (3, 11):
+        return {'process_group': group}
+    return {'preexec_fn': lambda: os.setpgid(0, group)}
+
+
+@contextmanager
+def terminal_foreground(pgid):
+    """Отдать терминал группе процессов pgid на время блока (fg): Ctrl+C получит она, а не оболочка"""
+    try:
+        shell = os.tcgetpgrp(0) if pgid is not None else None
+    except OSError:
+        shell = None
+    if shell is None:
+        yield False
+        return
+    # вернуть терминал из фоновой группы можно, только не получив SIGTTOU
+    previous = signal.signal(signal.SIGTTOU, signal.SIG_IGN)
+    try:
+        try:
+            os.tcsetpgrp(0, pgid)
+            handed = True
+        except OSError:
+            handed = False
+        yield handed
+    finally:
+        try:
+            os.tcsetpgrp(0, shell)
+        except OSError:
+            pass
+        signal.signal(signal.SIGTTOU, previous)
+
+
+class Job:
+    """Фоновое задание: внешние процессы и/или задача пула для встроенных команд
+
+    Внешние процессы задания запускаются в отдельной группе pgid, поэтому
+    Ctrl+C в оболочке их не задевает, а kill и fg обращаются ко всей группе.
+    """
+    
+    def __init__(self, number, command):
+        self.number = number
+        self.command = command
+        self.procs = []
+        self.pgid = None
+        self.future = None
+        self.pump = None
+    
+    def done(self):
+        return ((self.future is None or self.future.done())
+                and all(p.poll() is not None for p in self.procs)
+                and (self.pump is None or not self.pump.is_alive()))
+    
+    def wait(self):
+        if self.future is not None:
+            self.future.result()
+        for proc in self.procs:
+            proc.wait()
+        if self.pump is not None:
+            self.pump.join()
+    
+    def signal(self, sig):
+        """Послать сигнал процессам задания (всей группе); True, если хоть один его получил"""
+        if self.pgid is not None and any(p.poll() is None for p in self.procs):
+            try:
+                os.killpg(self.pgid, sig)
+                return True
+            except (ProcessLookupError, PermissionError):
+                pass
+        sent = False
+        for proc in self.procs:
+            if proc.poll() is None:
+                try:
+                    proc.send_signal(sig)
+                    sent = True
+                except ProcessLookupError:
+                    pass
+        return sent
+    
+    def status(self):
+        if not self.done():
+            return "Выполняется"
+        codes = [p.returncode for p in self.procs]
+        code = codes[-1] if codes else 0
+        if code < 0:
+            try:
+                return f"Прервано ({signal.Signals(-code).name})"
+            except ValueError:
+                return "Прервано"
+        return "Завершено" if code == 0 else f"Выход {code}"
+
+
+class CommandHash:
+    """Таблица путей исполняемых файлов (как hash в bash)
+
+    Для имени запоминается найденный путь и mtime каталогов PATH до него
+    включительно. Запись действительна, пока PATH не изменился и ни один из
+    этих каталогов не поменял mtime: появление, удаление или переименование
+    файла в них могло бы изменить результат поиска. Проверка — несколько
+    stat каталогов вместо перебора кандидатов во всём PATH.
+    """
+    
     def __init__(self):
-        self.current_dir = os.getcwd()
-        self.username = "doyarka"
-        self.hostname = "terminal"
-        self.running = True
-        self.command_history = []
+        self.path = None
+        self.dirs = []
+        self.table = {}
+    
+    def directories(self):
+        path = os.environ.get('PATH', os.defpath)
+        if path != self.path:
+            self.path = path
+            self.dirs = path.split(os.pathsep)
+            self.table = {}
+        return self.dirs
+    
+    @staticmethod
+    def mtime(directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+    
+    def lookup(self, name, cwd):
+        """Полный путь к команде или None; имена с / берутся относительно cwd"""
+        if os.sep in name:
+            return os.path.join(cwd, name)
+        dirs = self.directories()
+        entry = self.table.get(name)
+        if entry is not None:
+            path, mtimes = entry[0], entry[1]
+            if all(self.mtime(d) == m for d, m in zip(dirs, mtimes)):
+                entry[2] += 1
+                return path
+        for i, directory in enumerate(dirs):
+            candidate = os.path.join(cwd, directory or '.', name)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                # относительные каталоги PATH зависят от cwd — их не кэшируем
+                if all(os.path.isabs(d) for d in dirs[:i + 1]):
+                    self.table[name] = [candidate, [self.mtime(d) for d in dirs[:i + 1]], 1]
+                return candidate
+        self.table.pop(name, None)
+        return None
+    
+    def forget(self, name=None):
+        if name is None:
+            self.table = {}
+        else:
+            self.table.pop(name, None)
+    
+    def entries(self):
+        """[(имя, попадания, путь)]"""
+        return sorted((name, hits, path) for name, (path, _, hits) in self.table.items())
+
+
+COMMAND_HASH = CommandHash()
+
+
+class DirectoryListings:
+    """Ограниченный LRU-кэш содержимого каталогов для автодополнения
+
+    Для каталога хранятся mtime, отсортированный список имён и множество
+    имён подкаталогов. Список перечитывается, только если mtime каталога
+    изменился, поэтому повторный Tab в каталоге на 100 тысяч файлов стоит
+    одного stat и поиска префикса делением пополам. Кэш ограничен и по числу
+    каталогов, и по суммарному числу имён.
+    """
+    
+    MAX_DIRS = 64
+    MAX_NAMES = 500000
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.names = 0
+    
+    def listing(self, directory):
+        """(отсортированные имена, имена подкаталогов) или None, если каталог не читается"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(directory)
+            if entry is not None and entry[0] == mtime:
+                self.entries.move_to_end(directory)
+                return entry[1], entry[2]
+        names = []
+        dirs = set()
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    names.append(item.name)
+                    try:
+                        if item.is_dir():
+                            dirs.add(item.name)
+                    except OSError:
+                        pass
+        except OSError:
+            return None
+        names.sort()
+        with self.lock:
+            old = self.entries.pop(directory, None)
+            if old is not None:
+                self.names -= len(old[1])
+            self.entries[directory] = (mtime, names, dirs)
+            self.names += len(names)
+            while len(self.entries) > 1 and (len(self.entries) > self.MAX_DIRS
+                                             or self.names > self.MAX_NAMES):
+                _, evicted = self.entries.popitem(last=False)
+                self.names -= len(evicted[1])
+        return names, dirs
+    
+    def complete(self, directory, prefix):
+        """[(имя, это_каталог)] для имён каталога, начинающихся с prefix"""
+        found = self.listing(directory)
+        if found is None:
+            return []
+        names, dirs = found
+        matches = []
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            name = names[i]
+            if not name.startswith(prefix):
+                break
+            matches.append((name, name in dirs))
+        return matches
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.names = 0
+
+
+DIRECTORY_LISTINGS = DirectoryListings()
+
+
+class Completer:
+    """Автодополнение readline: встроенные команды, программы из PATH и пути
+
+    Первое слово команды (в том числе после |, ;, & и после time/profile)
+    дополняется именами команд, остальные — путями относительно текущего
+    каталога терминала. Скрытые файлы предлагаются, только если префикс
+    начинается с точки.
+    """
+    
+    # Разделители слов для readline: / ~ . - входят в пути и не делят слово
+    DELIMS = ' \t\n|&;<>'
+    PREFIX_COMMANDS = ('time', 'profile')
+    
+    def __init__(self, terminal, listings=DIRECTORY_LISTINGS):
+        self.terminal = terminal
+        self.listings = listings
+        self.matches = []
+        self.builtins = []
+        self.builtins_key = None
+    
+    def install(self, module):
+        """Подключить дополнение к модулю readline (Tab), если он это умеет"""
+        if not hasattr(module, 'set_completer'):
+            return
+        module.set_completer(self.complete)
+        module.set_completer_delims(self.DELIMS)
+        if 'libedit' in (getattr(module, '__doc__', None) or ''):
+            module.parse_and_bind('bind ^I rl_complete')
+        else:
+            module.parse_and_bind('tab: complete')
+    
+    def complete(self, text, state):
+        """Функция-дополнитель readline: state-й вариант для text"""
+        if state == 0:
+            try:
+                line = readline.get_line_buffer()
+                begin = readline.get_begidx()
+                self.matches = self.candidates(text, line[:begin])
+            except Exception:
+                # исключения внутри дополнителя readline молча глотает — не оставляем старые варианты
+                self.matches = []
+        return self.matches[state] if state < len(self.matches) else None
+    
+    def candidates(self, text, before):
+        """Все варианты дополнения text; before — строка до начала слова"""
+        if self.command_position(before) and os.sep not in text and not text.startswith('~'):
+            matches = self.command_names(text)
+        else:
+            matches = self.paths(text)
+        # единственный вариант-файл завершается пробелом, каталог — /
+        if len(matches) == 1 and not matches[0].endswith(os.sep):
+            matches[0] += ' '
+        return matches
+    
+    def command_position(self, before):
+        words = before.split()
+        while words and words[-1] in self.PREFIX_COMMANDS:
+            words.pop()
+        return not words or words[-1][-1] in '|&;'
+    
+    def builtin_names(self):
+        # таблица команд может пополняться плагинами — пересортировать при изменении
+        commands = self.terminal.commands
+        if self.builtins_key != len(commands):
+            self.builtins = sorted(commands)
+            self.builtins_key = len(commands)
+        return self.builtins
+    
+    def command_names(self, prefix):
+        builtins = self.builtin_names()
+        found = set()
+        for i in range(bisect.bisect_left(builtins, prefix), len(builtins)):
+            if not builtins[i].startswith(prefix):
+                break
+            found.add(builtins[i])
+        for directory in COMMAND_HASH.directories():
+            directory = os.path.join(self.terminal.current_dir, directory or '.')
+            for name, is_dir in self.listings.complete(directory, prefix):
+                if not is_dir and name not in found and os.access(os.path.join(directory, name), os.X_OK):
+                    found.add(name)
+        return sorted(found)
+    
+    def paths(self, text):
+        head, prefix = os.path.split(text)
+        directory = os.path.join(self.terminal.current_dir, os.path.expanduser(head))
+        hidden = prefix.startswith('.')
+        return [os.path.join(head, name) + (os.sep if is_dir else '')
+                for name, is_dir in self.listings.complete(directory, prefix)
+                if hidden or not name.startswith('.')]
+
+
+# Таблица строк прав доступа ls: 512 вариантов битов rwx и символ типа файла
+PERMISSION_STRINGS = tuple(
+    ''.join(ch if mode & bit else '-'
+            for ch, bit in zip('rwxrwxrwx', (0o400, 0o200, 0o100, 0o040, 0o020, 0o010, 0o004, 0o002, 0o001)))
+    for mode in range(512)
+)
+FILE_TYPE_CHARS = {stat.S_IFDIR: 'd', stat.S_IFLNK: 'l', stat.S_IFCHR: 'c', stat.S_IFBLK: 'b',
+                   stat.S_IFIFO: 'p', stat.S_IFSOCK: 's'}
+
+
+def permission_string(mode):
+    """Строка прав в UNIX-стиле по st_mode (без системных вызовов)"""
+    return FILE_TYPE_CHARS.get(stat.S_IFMT(mode), '-') + PERMISSION_STRINGS[mode & 0o777]
+
+
+def human_size(size):
+    """Размер в стиле ls -h: 512, 4.0K, 1.2M"""
+    if size < 1024:
+        return str(size)
+    for unit in 'KMGTP':
+        size /= 1024
+        if size < 1024 or unit == 'P':
+            return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+
+
+# Параметры cp: копирование файлов пулом потоков блоками в ядре
+COPY_WORKERS = 8
+COPY_CHUNK = 8 * CHUNK_SIZE
+# Ошибки, при которых нет смысла пробовать запасной способ копирования
+COPY_FATAL_ERRNOS = {errno.ENOSPC, errno.EIO, errno.EDQUOT, errno.EFBIG}
+
+
+class CopyProgress:
+    """Счётчики копирования и строка прогресса (скорость, ETA) в stderr"""
+    
+    def __init__(self, total_bytes, total_files, enabled):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.done_bytes = 0
+        self.done_files = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.shown = False
+        self.stop = threading.Event()
+        self.thread = None
+        if enabled:
+            self.thread = threading.Thread(target=self.report, daemon=True)
+            self.thread.start()
+    
+    def add(self, size):
+        with self.lock:
+            self.done_bytes += size
+    
+    def file_done(self):
+        with self.lock:
+            self.done_files += 1
+    
+    def skip(self, size):
+        with self.lock:
+            self.done_bytes += size
+            self.done_files += 1
+            self.skipped += 1
+            self.skipped_bytes += size
+    
+    def line(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        rate = self.done_bytes / elapsed
+        percent = self.done_bytes * 100 / self.total_bytes if self.total_bytes else 100
+        if rate > 0:
+            eta = int((self.total_bytes - self.done_bytes) / rate)
+            eta_text = f"{eta // 60}:{eta % 60:02d}"
+        else:
+            eta_text = "?"
+        return (f"{human_size(self.done_bytes)}/{human_size(self.total_bytes)} {percent:3.0f}%  "
+                f"{human_size(int(rate))}/с  ETA {eta_text}  файлов {self.done_files}/{self.total_files}")
+    
+    def report(self):
+        while not self.stop.wait(0.5):
+            sys.stderr.write('\r\033[K' + self.line())
+            sys.stderr.flush()
+            self.shown = True
+    
+    def close(self):
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            if self.shown:
+                sys.stderr.write('\r\033[K' + self.line() + '\n')
+                sys.stderr.flush()
+
+
+def copy_data(src_path, dst_path, progress):
+    """Скопировать содержимое файла в ядре: copy_file_range, затем sendfile, затем через буфер"""
+    with open(src_path, 'rb', buffering=0) as fsrc, open(dst_path, 'wb', buffering=0) as fdst:
+        in_fd = fsrc.fileno()
+        out_fd = fdst.fileno()
+        copied = 0
+        
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while True:
+                    n = os.copy_file_range(in_fd, out_fd, COPY_CHUNK)
+                    if not n:
+                        return
+                    copied += n
+                    progress.add(n)
+            except OSError as e:
+                if e.errno in COPY_FATAL_ERRNOS:
+                    raise
+        
+        if hasattr(os, 'sendfile'):
+            try:
+                os.lseek(out_fd, copied, os.SEEK_SET)
+                while True:
+                    n = os.sendfile(out_fd, in_fd, copied, COPY_CHUNK)
+                    if not n:
+                        return
+                    copied += n
+                    progress.add(n)
+            except OSError as e:
+                if e.errno in COPY_FATAL_ERRNOS:
+                    raise
+        
+        os.lseek(in_fd, copied, os.SEEK_SET)
+        os.lseek(out_fd, copied, os.SEEK_SET)
+        buf = bytearray(COPY_CHUNK)
+        view = memoryview(buf)
+        while True:
+            n = fsrc.readinto(buf)
+            if not n:
+                return
+            fdst.write(view[:n])
+            progress.add(n)
+
+
+def same_file(src, dst):
+    """Один ли это файл: та же запись каталога или те же данные (по st_dev, st_ino)"""
+    keys = []
+    for path in (src, dst):
+        try:
+            lst = os.lstat(path)
+        except OSError:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = lst
+        keys.append(((lst.st_dev, lst.st_ino), (st.st_dev, st.st_ino)))
+    return keys[0][0] == keys[1][0] or keys[0][1] == keys[1][1]
+
+
+def copy_one(src, dst, st, policy, progress):
+    """Скопировать один файл с учётом -n/-u/--resume; возвращает текст ошибки или None"""
+    import shutil
+    try:
+        try:
+            dst_st = os.stat(dst)
+        except FileNotFoundError:
+            dst_st = None
+        if dst_st is not None and (dst_st.st_dev, dst_st.st_ino) == (st.st_dev, st.st_ino):
+            # open(dst, 'wb') обнулил бы и сам источник
+            return f"cp: '{src}' и '{dst}' — один и тот же файл"
+        if policy:
+            if dst_st is not None and (
+                    'n' in policy
+                    or ('u' in policy and dst_st.st_mtime_ns >= st.st_mtime_ns)
+                    or ('resume' in policy and dst_st.st_size == st.st_size
+                        and dst_st.st_mtime_ns == st.st_mtime_ns)):
+                progress.skip(st.st_size)
+                return None
+        copy_data(src, dst, progress)
+        shutil.copystat(src, dst)
+        progress.file_done()
+    except OSError as e:
+        return f"cp: невозможно скопировать '{src}': {describe_error(e)}"
+    return None
+
+
+# Параметры rm -r: верхние уровни дерева раскрываются, пока не наберётся
+# достаточно поддеревьев для пула, затем поддеревья удаляются параллельно
+REMOVE_WORKERS = 8
+REMOVE_EXPAND_DEPTH = 3
+REMOVE_DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+REMOVE_WITH_FD = (os.rmdir in os.supports_dir_fd and os.unlink in os.supports_dir_fd
+                  and os.scandir in os.supports_fd)
+
+
+def remove_entries(fd, subdirs, errors):
+    """Удалить файлы каталога fd (без разрешения путей), собрать его подкаталоги"""
+    files = 0
+    with os.scandir(fd) as it:
+        entries = list(it)
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            else:
+                os.unlink(entry.name, dir_fd=fd)
+                files += 1
+        except OSError as e:
+            errors.append(f"'{entry.name}': {describe_error(e)}")
+    return files
+
+
+def remove_tree_fd(parent_fd, name):
+    """Удалить поддерево name относительно каталога parent_fd; возвращает (файлы, каталоги, ошибки)"""
+    files = dirs = 0
+    errors = []
+    try:
+        fd = os.open(name, REMOVE_DIR_FLAGS, dir_fd=parent_fd)
+    except OSError as e:
+        return 0, 0, [f"'{name}': {describe_error(e)}"]
+    try:
+        subdirs = []
+        files += remove_entries(fd, subdirs, errors)
+        for sub in subdirs:
+            f, d, e = remove_tree_fd(fd, sub)
+            files += f
+            dirs += d
+            errors.extend(e)
+    except OSError as e:
+        errors.append(f"'{name}': {describe_error(e)}")
+    finally:
+        os.close(fd)
+    try:
+        os.rmdir(name, dir_fd=parent_fd)
+        dirs += 1
+    except OSError as e:
+        errors.append(f"'{name}': {describe_error(e)}")
+    return files, dirs, errors
+
+
+def remove_tree(path, workers=REMOVE_WORKERS):
+    """Параллельное удаление дерева каталогов; возвращает (файлы, каталоги, ошибки)"""
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+    if not REMOVE_WITH_FD:
+        errors = []
+        shutil.rmtree(path, onerror=lambda func, p, exc: errors.append(f"'{p}': {describe_error(exc[1])}"))
+        return 0, 0, errors
+    
+    files = dirs = 0
+    errors = []
+    parent_fd = os.open(os.path.dirname(os.path.abspath(path)) or os.sep, REMOVE_DIR_FLAGS)
+    # Раскрытые каталоги: (fd родителя, имя, свой fd) — удаляются последними, снизу вверх
+    expanded = []
+    level = [(parent_fd, os.path.basename(os.path.abspath(path)))]
+    tasks = []
+    try:
+        depth = 0
+        while level:
+            if depth >= REMOVE_EXPAND_DEPTH or len(level) >= workers * 4:
+                tasks = level
+                break
+            next_level = []
+            for dir_fd, name in level:
+                try:
+                    fd = os.open(name, REMOVE_DIR_FLAGS, dir_fd=dir_fd)
+                except OSError as e:
+                    errors.append(f"'{name}': {describe_error(e)}")
+                    continue
+                expanded.append((dir_fd, name, fd))
+                subdirs = []
+                try:
+                    files += remove_entries(fd, subdirs, errors)
+                except OSError as e:
+                    errors.append(f"'{name}': {describe_error(e)}")
+                next_level.extend((fd, sub) for sub in subdirs)
+            level = next_level
+            depth += 1
+        
+        if tasks:
+            with ThreadPoolExecutor(workers) as executor:
+                for f, d, e in executor.map(lambda task: remove_tree_fd(*task), tasks):
+                    files += f
+                    dirs += d
+                    errors.extend(e)
+    finally:
+        for dir_fd, name, fd in reversed(expanded):
+            os.close(fd)
+            try:
+                os.rmdir(name, dir_fd=dir_fd)
+                dirs += 1
+            except OSError as e:
+                errors.append(f"'{name}': {describe_error(e)}")
+        os.close(parent_fd)
+    return files, dirs, errors
+
+
+# Параметры grep: файлы крупнее порога читаются через mmap,
+# файлы раздаются процессам пачками, чтобы окупить пересылку
+GREP_MMAP_THRESHOLD = 4 * CHUNK_SIZE
+GREP_BATCH_SIZE = 256
+GREP_BINARY_PROBE = 8192
+# grep -i с не-ASCII шаблоном декодирует файл окнами такого размера
+GREP_TEXT_WINDOW = 4 * CHUNK_SIZE
+
+
+def walk_files(root):
+    """Рекурсивный обход через scandir в детерминированном порядке (без симлинков на каталоги)"""
+    stack = [root]
+    while stack:
+        top = stack.pop()
+        try:
+            with os.scandir(top) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+            except OSError:
+                pass
+        stack.extend(reversed(subdirs))
+
+
+def matching_lines(data, pattern, pos=0, end=None):
+    """Границы строк с совпадениями (по одной на строку) в bytes, mmap или str"""
+    if end is None:
+        end = len(data)
+    newline = '\n' if isinstance(data, str) else b'\n'
+    while pos <= end:
+        m = pattern.search(data, pos, end)
+        if not m:
+            return
+        line_start = data.rfind(newline, 0, m.start()) + 1
+        if line_start >= end:
+            return
+        line_end = data.find(newline, m.end(), end)
+        if line_end == -1:
+            line_end = end
+        yield line_start, line_end
+        pos = line_end + 1
+
+
+def grep_batch(batch, pattern_source, flags, mode):
+    """Поиск по пачке файлов (выполняется в рабочем процессе)
+
+    Возвращает список кусков вывода по порядку: bytes для stdout и str для сообщений.
+    """
+    pattern = re.compile(pattern_source, flags)
+    result = []
+    for path, display in batch:
+        try:
+            chunk = grep_file(path, display, pattern, mode)
+        except OSError as e:
+            chunk = f"grep: {display}: {describe_error(e)}"
+        if chunk:
+            result.append(chunk)
+    return result
+
+
+def grep_decode(data):
+    """Текст для шаблона-строки (grep -i с не-ASCII шаблоном); байты не из UTF-8 сохраняются"""
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def grep_encode(text):
+    """Обратно в байты для вывода (кусок из grep_decode или bytes как есть)"""
+    return text.encode('utf-8', 'surrogateescape') if isinstance(text, str) else text
+
+
+def grep_windows(data, size=GREP_TEXT_WINDOW):
+    """Декодированные окна bytes или mmap по целым строкам (память — одно окно)
+
+    Окно режется по \n, поэтому символ UTF-8 не разрывается; строка длиннее
+    окна попадает в него целиком.
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        stop = min(pos + size, end)
+        if stop < end:
+            cut = data.rfind(b'\n', pos, stop) + 1
+            if cut > pos:
+                stop = cut
+            else:
+                newline = data.find(b'\n', stop)
+                stop = end if newline == -1 else newline + 1
+        yield grep_decode(data[pos:stop])
+        pos = stop
+
+
+def grep_file(path, display, pattern, mode):
+    """Поиск в одном файле по сырым байтам; бинарные файлы пропускаются
+
+    Шаблон-строка (grep -i с не-ASCII шаблоном) ищется по тексту, декодированному
+    окнами grep_windows: крупный файл по-прежнему читается через mmap.
+    """
+    name = os.fsencode(display)
+    text = isinstance(pattern.pattern, str)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        head = f.read(GREP_BINARY_PROBE)
+        if b'\0' in head:
+            return None
+        if size >= GREP_MMAP_THRESHOLD:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = head + f.read()
+    
+    try:
+        windows = grep_windows(data) if text else [data]
+        newline = '\n' if text else b'\n'
+        if mode == 'l':
+            return name + b'\n' if any(pattern.search(window) for window in windows) else None
+        
+        out = []
+        count = 0
+        lineno = 1
+        for window in windows:
+            counted_to = 0
+            for line_start, line_end in matching_lines(window, pattern):
+                count += 1
+                if mode != 'c':
+                    lineno += window[counted_to:line_start].count(newline)
+                    counted_to = line_start
+                    out.append(b'%s:%d: %s\n' % (name, lineno, grep_encode(window[line_start:line_end].strip())))
+            if text and mode != 'c':
+                lineno += window[counted_to:].count(newline)
+        
+        if mode == 'c':
+            return b'%s:%d\n' % (name, count)
+        return b''.join(out) or None
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def grep_stream(f, pattern, mode):
+    """Поиск в потоке (stdin, канал) блоками по целым строкам с постоянной памятью"""
+    count = 0
+    tail = b''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if chunk:
+            data = tail + chunk
+            cut = data.rfind(b'\n') + 1
+            if not cut:
+                tail = data
+                continue
+            data, tail = data[:cut], data[cut:]
+        elif tail:
+            data, tail = tail, b''
+        else:
+            break
+        
+        if isinstance(pattern.pattern, str):
+            # блок режется по \n, поэтому символ UTF-8 не разрывается
+            data = grep_decode(data)
+        out = []
+        for line_start, line_end in matching_lines(data, pattern):
+            count += 1
+            if mode == 'l':
+                yield '(стандартный ввод)\n'.encode()
+                return
+            if mode == 'n':
+                out.append(grep_encode(data[line_start:line_end]) + b'\n')
+        if out:
+            yield b''.join(out)
+    if mode == 'c':
+        yield b'%d\n' % count
+
+
+# Число потоков для обхода каталогов: scandir отпускает GIL на системных вызовах
+WALK_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Единицы -size (как в GNU find; без суффикса — блоки по 512 байт)
+FIND_SIZE_UNITS = {'c': 1, 'w': 2, 'b': 512, 'k': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+class PathEntry:
+    """Минимальная замена os.DirEntry для стартовых путей find"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path.rstrip(os.sep)) or path
+        self._stat = None
+    
+    def stat(self, follow_symlinks=True):
+        if self._stat is None:
+            self._stat = os.lstat(self.path)
+        return self._stat
+    
+    def is_dir(self, follow_symlinks=True):
+        return stat.S_ISDIR(self.stat().st_mode)
+    
+    def is_file(self, follow_symlinks=True):
+        return stat.S_ISREG(self.stat().st_mode)
+    
+    def is_symlink(self):
+        return stat.S_ISLNK(self.stat().st_mode)
+
+
+def compare_number(spec, value):
+    """Сравнение в стиле find: +n — больше, -n — меньше, n — равно"""
+    if spec[0] == '+':
+        return value > int(spec[1:])
+    if spec[0] == '-':
+        return value < int(spec[1:])
+    return value == int(spec)
+
+
+def check_number(option, spec, signed=True):
+    """Проверить число find вида [+-]N (N при signed=False); иначе ValueError для find"""
+    if not re.fullmatch(r'[+-]?[0-9]+' if signed else r'[0-9]+', spec):
+        raise ValueError(f"неверный аргумент '{spec}' для '{option}'")
+
+
+def find_predicates(tokens):
+    """Скомпилировать предикаты find в список функций от DirEntry"""
+    predicates = []
+    tokens = list(tokens)
+    while tokens:
+        option = tokens.pop(0)
+        if not tokens:
+            raise ValueError(f"отсутствует аргумент для '{option}'")
+        value = tokens.pop(0)
+        if option in ('-name', '-iname'):
+            regex = re.compile(fnmatch.translate(value),
+                               re.IGNORECASE if option == '-iname' else 0)
+            predicates.append(lambda e, match=regex.match: match(e.name) is not None)
+        elif option == '-type':
+            tests = {'f': lambda e: e.is_file(follow_symlinks=False),
+                     'd': lambda e: e.is_dir(follow_symlinks=False),
+                     'l': lambda e: e.is_symlink()}
+            if value not in tests:
+                raise ValueError(f"неизвестный тип '{value}'")
+            predicates.append(tests[value])
+        elif option == '-size':
+            unit = FIND_SIZE_UNITS.get(value[-1:])
+            number = value[:-1] if unit else value
+            unit = unit or 512
+            check_number(option, number)
+            predicates.append(lambda e, n=number, u=unit:
+                              compare_number(n, -(-e.stat(follow_symlinks=False).st_size // u)))
+        elif option == '-mtime':
+            check_number(option, value)
+            now = time.time()
+            predicates.append(lambda e, n=value:
+                              compare_number(n, int((now - e.stat(follow_symlinks=False).st_mtime) // 86400)))
+        else:
+            raise ValueError(f"неизвестный предикат '{option}'")
+    return predicates
+
+
+def parallel_tree(roots, scan, workers=WALK_WORKERS):
+    """Обход дерева пулом потоков: scan(узел) -> (результат, дочерние узлы)
+
+    Каждый узел обрабатывает отдельная задача пула; главный поток получает
+    готовые задачи из очереди, отдаёт результаты по мере готовности и ставит
+    дочерние узлы в работу, поэтому пулу не нужны блокировки.
+    """
+    import queue
+    from concurrent.futures import ThreadPoolExecutor
+    done = queue.SimpleQueue()
+    inflight = 0
+    with ThreadPoolExecutor(workers) as executor:
+        def submit(node):
+            nonlocal inflight
+            inflight += 1
+            executor.submit(scan, node).add_done_callback(done.put)
+        
+        try:
+            for node in roots:
+                submit(node)
+            while inflight:
+                result, children = done.get().result()
+                inflight -= 1
+                for child in children:
+                    submit(child)
+                yield result
+        finally:
+            # Прерванный обход: дожидаемся уже запущенных задач без новых
+            while inflight:
+                done.get()
+                inflight -= 1
+
+
+def find_walk(roots, predicates, prune=None, maxdepth=None, mindepth=0):
+    """Параллельный обход каталогов через scandir с потоковой выдачей результатов
+
+    roots — пары (реальный путь, отображаемый путь). Выдаёт пары (путь, ошибка).
+    """
+    def matches(entry, depth):
+        return depth >= mindepth and all(p(entry) for p in predicates)
+    
+    def pruned(entry):
+        return prune is not None and all(p(entry) for p in prune)
+    
+    def scan(node):
+        real, display, depth = node
+        found = []
+        subdirs = []
+        try:
+            with os.scandir(real) as it:
+                for entry in it:
+                    try:
+                        if pruned(entry):
+                            continue
+                        path = display + entry.path[len(real):]
+                        if matches(entry, depth):
+                            found.append(path)
+                        if (entry.is_dir(follow_symlinks=False)
+                                and (maxdepth is None or depth < maxdepth)):
+                            subdirs.append((entry.path, path, depth + 1))
+                    except OSError:
+                        pass
+        except OSError as e:
+            return (found, f"'{display}': {describe_error(e)}"), subdirs
+        return (found, None), subdirs
+    
+    start = []
+    for real, display in roots:
+        try:
+            root = PathEntry(real)
+            root.stat()
+            if matches(root, 0):
+                yield display, None
+            if root.is_dir() and (maxdepth is None or maxdepth > 0):
+                start.append((real, display, 1))
+        except OSError as e:
+            yield None, f"'{display}': {describe_error(e)}"
+    
+    for found, error in parallel_tree(start, scan):
+        for path in found:
+            yield path, None
+        if error:
+            yield None, error
+
+
+def glob_to_regex(pattern):
+    """Шаблон glob в регулярное выражение для одной строки (* и ? не пересекают перевод строки)"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            out.append(r'[^\n]*')
+        elif c == '?':
+            out.append(r'[^\n]')
+        elif c == '[':
+            j = pattern.find(']', i + 1 if pattern[i:i + 1] in ('!', ']') else i)
+            if j == -1:
+                out.append(r'\[')
+                continue
+            body = pattern[i:j]
+            i = j + 1
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\') + ']')
+        else:
+            out.append(re.escape(c))
+    return ''.join(out)
+
+
+# Формат индекса locate: заголовок с длиной блока путей, затем пути по одному
+# на строку (этот блок ищется регулярным выражением прямо через mmap) и
+# marshal-таблица каталогов {путь: (mtime_ns, [(имя, каталог?)])} для updatedb
+LOCATE_MAGIC = b'DSHLOC1 '
+LOCATE_HEADER_SIZE = len(LOCATE_MAGIC) + 17
+
+
+def locate_read_table(db_path):
+    """Прочитать из индекса корни и таблицу каталогов (для инкрементального updatedb)"""
+    with open(db_path, 'rb') as f:
+        header = f.read(LOCATE_HEADER_SIZE)
+        if not header.startswith(LOCATE_MAGIC):
+            raise ValueError("неверный формат индекса")
+        f.seek(int(header[len(LOCATE_MAGIC):-1]), os.SEEK_CUR)
+        return marshal.loads(f.read())
+
+
+def locate_write(db_path, roots, dirs):
+    """Атомарно записать индекс: блок путей и таблицу каталогов"""
+    lines = []
+    for root in roots:
+        if root in dirs:
+            lines.append(root)
+    for directory in sorted(dirs):
+        prefix = directory.rstrip(os.sep) + os.sep
+        for name, _ in sorted(dirs[directory][1]):
+            lines.append(prefix + name)
+    blob = os.fsencode('\n'.join(lines) + '\n') if lines else b''
+    
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(LOCATE_MAGIC + b'%016d\n' % len(blob))
+        f.write(blob)
+        f.write(marshal.dumps({'roots': roots, 'dirs': dirs}))
+    os.replace(tmp_path, db_path)
+    return len(lines)
+
+
+def path_within(path, root):
+    """Лежит ли путь внутри корня (или совпадает с ним)"""
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def locate_merge_roots(roots):
+    """Корни индекса без повторов и без вложенных в другие корни"""
+    merged = []
+    for root in roots:
+        if any(path_within(root, other) for other in merged):
+            continue
+        merged = [other for other in merged if not path_within(other, root)]
+        merged.append(root)
+    return merged
+
+
+def locate_update(roots, old_dirs):
+    """Обойти корни, пересканируя только каталоги с изменившимся mtime
+
+    Возвращает новую таблицу каталогов и число пересканированных каталогов.
+    """
+    def scan(path):
+        try:
+            mtime = os.lstat(path).st_mtime_ns
+        except OSError:
+            return None, []
+        cached = old_dirs.get(path)
+        if cached is not None and cached[0] == mtime:
+            entries = cached[1]
+            rescanned = False
+        else:
+            entries = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            entries.append((entry.name, entry.is_dir(follow_symlinks=False)))
+                        except OSError:
+                            entries.append((entry.name, False))
+            except OSError:
+                pass
+            rescanned = True
+        children = [os.path.join(path, name) for name, is_dir in entries if is_dir]
+        return (path, mtime, entries, rescanned), children
+    
+    dirs = {}
+    rescanned = 0
+    for result in parallel_tree(roots, scan):
+        if result is None:
+            continue
+        path, mtime, entries, changed = result
+        dirs[path] = (mtime, entries)
+        rescanned += changed
+    return dirs, rescanned
+
+
+def locate_search(db_path, pattern):
+    """Пути из индекса, совпадающие с регулярным выражением (bytes, re.MULTILINE)"""
+    with open(db_path, 'rb') as f:
+        header = f.read(LOCATE_HEADER_SIZE)
+        if not header.startswith(LOCATE_MAGIC):
+            raise ValueError("неверный формат индекса")
+        blob_len = int(header[len(LOCATE_MAGIC):-1])
+        if not blob_len:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = LOCATE_HEADER_SIZE + blob_len - 1
+            for line_start, line_end in matching_lines(data, pattern, LOCATE_HEADER_SIZE, end):
+                yield data[line_start:line_end]
+
+
+# Кэш du: marshal-таблица {(st_dev, st_ino): (mtime_ns, байты файлов,
+# [(st_dev, st_ino, байты) файлов с жёсткими ссылками], [имена подкаталогов])}
+DU_CACHE_LIMIT = 1000000
+
+
+def disk_usage(st):
+    """Занятое на диске место по stat (как du); без st_blocks — размер файла"""
+    blocks = getattr(st, 'st_blocks', None)
+    return st.st_size if blocks is None else blocks * 512
+
+
+def du_scan(roots, cache=None):
+    """Параллельный обход для du: [(путь, родитель, глубина, ключ, запись, свой размер, ошибка)]
+
+    Каталог с тем же (устройство, inode) и mtime, что в cache, не читается
+    заново: его файлы и подкаталоги берутся из кэша. mtime каталога меняется
+    только при создании, удалении и переименовании записей, поэтому
+    дописанные на месте файлы кэш не замечает — он включается явно.
+    """
+    cache = cache or {}
+    
+    def scan(node):
+        path, parent, depth = node
+        try:
+            st = os.lstat(path)
+        except OSError as e:
+            return (path, parent, depth, None, None, 0, describe_error(e)), []
+        key = (st.st_dev, st.st_ino)
+        entry = cache.get(key)
+        error = None
+        if entry is None or entry[0] != st.st_mtime_ns:
+            own = 0
+            links = []
+            subdirs = []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                subdirs.append(item.name)
+                                continue
+                            info = item.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if info.st_nlink > 1:
+                            links.append((info.st_dev, info.st_ino, disk_usage(info)))
+                        else:
+                            own += disk_usage(info)
+                entry = (st.st_mtime_ns, own, links, subdirs)
+            except OSError as e:
+                entry = (None, own, links, subdirs)
+                error = describe_error(e)
+        children = [(os.path.join(path, name), path, depth + 1) for name in entry[3]]
+        return (path, parent, depth, key, entry, disk_usage(st), error), children
+    
+    return list(parallel_tree([(root, None, 0) for root in roots], scan))
+
+
+def du_totals(records):
+    """Размеры поддеревьев {путь: байты}; файл с несколькими жёсткими ссылками считается один раз"""
+    totals = {}
+    seen = set()
+    # порядок путей задаёт, какому каталогу достанется файл с несколькими ссылками
+    for path, _, _, _, entry, size, _ in sorted(records, key=lambda r: r[0]):
+        if entry is not None:
+            size += entry[1]
+            for dev, ino, link_size in entry[2]:
+                if (dev, ino) not in seen:
+                    seen.add((dev, ino))
+                    size += link_size
+        totals[path] = size
+    for path, parent, _, _, _, _, _ in sorted(records, key=lambda r: r[2], reverse=True):
+        if parent is not None:
+            totals[parent] += totals[path]
+    return totals
+
+
+def read_cache_table(cache_path):
+    """Прочитать marshal-таблицу кэша (du, treehash); нет файла или он испорчен — пустая"""
+    try:
+        with open(cache_path, 'rb') as f:
+            table = marshal.loads(f.read())
+    except (OSError, ValueError, EOFError, TypeError):
+        return {}
+    return table if isinstance(table, dict) else {}
+
+
+def write_cache_table(cache_path, table, fresh, limit):
+    """Дополнить таблицу свежими записями и атомарно сохранить; сверх limit остаются только свежие"""
+    table.update(fresh)
+    if len(table) > limit:
+        table = fresh
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(marshal.dumps(table))
+    os.replace(tmp_path, cache_path)
+
+
+def du_write_cache(cache_path, cache, records):
+    """Дописать в кэш прочитанные без ошибок каталоги и сохранить его"""
+    fresh = {key: entry for _, _, _, key, entry, _, error in records
+             if key is not None and error is None}
+    write_cache_table(cache_path, cache, fresh, DU_CACHE_LIMIT)
+
+
+# Параметры sha256sum/md5sum/treehash: hashlib отпускает GIL на больших
+# блоках, поэтому файлы хэшируются пулом потоков; крупные — через mmap
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+HASH_MMAP_THRESHOLD = 4 * CHUNK_SIZE
+HASH_MMAP_STEP = 64 * CHUNK_SIZE
+# Кэш treehash: {(st_dev, st_ino): (размер, mtime_ns, ctime_ns, digest)}.
+# Файл, изменённый незадолго до хэширования, не кэшируется: повторная запись
+# в пределах того же такта часов не изменила бы mtime
+TREEHASH_CACHE_LIMIT = 1000000
+TREEHASH_RACY_WINDOW = 2 * 10 ** 9
+
+
+def hash_file(path, factory):
+    """digest файла; factory — конструктор hashlib (hashlib.sha256 и т.п.)"""
+    h = factory()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= HASH_MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                view = memoryview(data)
+                try:
+                    for start in range(0, size, HASH_MMAP_STEP):
+                        h.update(view[start:start + HASH_MMAP_STEP])
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(CHUNK_SIZE)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.digest()
+
+
+def hash_stream(f, factory):
+    h = factory()
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return h.digest()
+        h.update(chunk)
+
+
+def hash_files(paths, factory, workers=HASH_WORKERS):
+    """Хэши файлов пулом потоков: (путь, digest или None, ошибка) в порядке paths"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    def task(path):
+        try:
+            return path, hash_file(path, factory), None
+        except OSError as e:
+            return path, None, e
+    
+    pending = deque()
+    with ThreadPoolExecutor(workers) as executor:
+        try:
+            for path in paths:
+                pending.append(executor.submit(task, path))
+                # ограниченное окно: результаты выдаются по мере готовности, порядок сохраняется
+                while len(pending) > workers * 4 or (pending and pending[0].done()):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def tree_digest_factory():
+    import hashlib
+    return hashlib.blake2b(digest_size=32)
+
+
+def tree_hash(root, cache=None, workers=HASH_WORKERS):
+    """Merkle-хэш дерева (blake2b)
+
+    Хэш файла — хэш содержимого, ссылки — её цели, каталога — хэш
+    отсортированных записей «имя, тип, хэш». Файл, у которого размер, mtime и
+    ctime совпадают с записью в cache, не перечитывается. Возвращает словарь
+    с ключами digests ({относительный путь: digest}, '' — сам root), dirs
+    ({каталог: [имена]}), fresh (новые записи кэша), hashed, cached, bytes и
+    errors.
+    """
+    cache = {} if cache is None else cache
+    result = {'digests': {}, 'dirs': {}, 'fresh': {}, 'hashed': 0, 'cached': 0, 'bytes': 0, 'errors': []}
+    digests = result['digests']
+    items = {}
+    files = []
+    
+    def scan(rel):
+        path = os.path.join(root, rel) if rel else root
+        entries = []
+        found = []
+        children = []
+        error = None
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    child = os.path.join(rel, entry.name) if rel else entry.name
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        if stat.S_ISDIR(st.st_mode):
+                            kind = b'd'
+                            children.append(child)
+                        elif stat.S_ISLNK(st.st_mode):
+                            kind = b'l'
+                            found.append((child, None, os.fsencode(os.readlink(entry.path))))
+                        elif stat.S_ISREG(st.st_mode):
+                            kind = b'x' if st.st_mode & 0o111 else b'f'
+                            found.append((child, st, None))
+                        else:
+                            continue
+                    except OSError as e:
+                        found.append((child, e, None))
+                        continue
+                    entries.append((os.fsencode(entry.name), kind, child))
+        except OSError as e:
+            error = (rel, e)
+        return (rel, entries, found, error), children
+    
+    try:
+        st = os.lstat(root)
+    except OSError as e:
+        result['errors'].append(('', e))
+        return result
+    if stat.S_ISDIR(st.st_mode):
+        for rel, entries, found, error in parallel_tree([''], scan, workers):
+            items[rel] = entries
+            files.extend(found)
+            if error is not None:
+                result['errors'].append(error)
+    else:
+        files.append(('', st, os.fsencode(os.readlink(root)) if stat.S_ISLNK(st.st_mode) else None))
+    
+    racy = time.time_ns() - TREEHASH_RACY_WINDOW
+    todo = {}
+    for rel, st, link in files:
+        if isinstance(st, OSError):
+            result['errors'].append((rel, st))
+        elif link is not None:
+            h = tree_digest_factory()
+            h.update(b'link\0' + link)
+            digests[rel] = h.digest()
+        else:
+            key = (st.st_dev, st.st_ino)
+            signature = (st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+            entry = cache.get(key)
+            if entry is not None and tuple(entry[:3]) == signature:
+                digests[rel] = entry[3]
+                result['cached'] += 1
+            else:
+                todo[os.path.join(root, rel) if rel else root] = (rel, key, signature)
+    
+    for path, digest, error in hash_files(list(todo), tree_digest_factory, workers):
+        rel, key, signature = todo[path]
+        if error is not None:
+            result['errors'].append((rel, error))
+            continue
+        digests[rel] = digest
+        result['hashed'] += 1
+        result['bytes'] += signature[0]
+        if signature[1] < racy and signature[2] < racy:
+            result['fresh'][key] = signature + (digest,)
+    
+    # каталоги — снизу вверх: хэш каталога собирается из хэшей его записей
+    for rel in sorted(items, key=lambda r: r.count(os.sep) + bool(r), reverse=True):
+        h = tree_digest_factory()
+        names = []
+        for name, kind, child in sorted(items[rel]):
+            digest = digests.get(child)
+            if digest is None:
+                continue
+            h.update(name + b'\0' + kind + digest)
+            names.append(child)
+        digests[rel] = h.digest()
+        result['dirs'][rel] = names
+    return result
+
+
+# Параметры tail: блок чтения с конца файла и интервалы опроса для -f
+# (без inotify интервал растёт вдвое, пока файл не меняется)
+TAIL_BLOCK = 64 * 1024
+TAIL_POLL_MIN = 0.05
+TAIL_POLL_MAX = 1.0
+# События inotify: запись (и усечение), атрибуты, удаление и перемещение файла
+INOTIFY_MASK = 0x2 | 0x4 | 0x400 | 0x800
+
+
+def tail_start(read_block, size, lines):
+    """Смещение начала последних lines строк; read_block(pos, n) читает кусок
+
+    Блоки читаются с конца и только считаются bytes.count, пока не наберётся
+    нужное число переводов строки; завершающий перевод строки новую строку не
+    начинает.
+    """
+    if lines <= 0 or size == 0:
+        return size
+    needed = lines + (read_block(size - 1, 1) == b'\n')
+    pos = size
+    while pos > 0:
+        step = min(TAIL_BLOCK, pos)
+        pos -= step
+        block = read_block(pos, step)
+        found = block.count(b'\n')
+        if found < needed:
+            needed -= found
+            continue
+        end = len(block)
+        for _ in range(needed):
+            end = block.rfind(b'\n', 0, end)
+        return pos + end + 1
+    return 0
+
+
+def tail_stream(f, lines=None, count=None):
+    """Хвост потока без перемотки: последние lines строк или count байт
+
+    В памяти держится не больше блоков, чем нужно для ответа.
+    """
+    blocks = deque()
+    newlines = size = 0
+    while True:
+        chunk = f.read1(CHUNK_SIZE)
+        if not chunk:
+            break
+        found = chunk.count(b'\n') if lines is not None else 0
+        blocks.append((chunk, found))
+        newlines += found
+        size += len(chunk)
+        while len(blocks) > 1 and (newlines - blocks[0][1] > lines if lines is not None
+                                   else size - len(blocks[0][0]) >= count):
+            chunk, found = blocks.popleft()
+            newlines -= found
+            size -= len(chunk)
+    data = b''.join(chunk for chunk, _ in blocks)
+    if lines is None:
+        return data[max(len(data) - count, 0):]
+    return data[tail_start(lambda pos, n: data[pos:pos + n], len(data), lines):]
+
+
+def head_copy(f, out, lines=None, count=None, skip=False):
+    """Первые lines строк (или count байт) потока f в out блоками
+
+    При skip эта часть пропускается, а в out идёт остаток (tail -n +N).
+    Возвращает, дошло ли чтение до конца потока.
+    """
+    remaining = lines if lines is not None else count
+    while remaining > 0:
+        chunk = f.read1(CHUNK_SIZE)
+        if not chunk:
+            return True
+        if lines is not None:
+            found = chunk.count(b'\n')
+            if found < remaining:
+                remaining -= found
+                end = len(chunk)
+            else:
+                end = -1
+                for _ in range(remaining):
+                    end = chunk.find(b'\n', end + 1)
+                end += 1
+                remaining = 0
+        else:
+            end = min(remaining, len(chunk))
+            remaining -= end
+        if skip:
+            out.write(chunk[end:])
+        else:
+            out.write(chunk[:end])
+    if skip:
+        copy_stream(f, out)
+        return True
+    return False
+
+
+# Для wc -w: пробельные байты -> ' ', остальные -> 'x'; начало слова — пара ' x'
+WC_WORD_MAP = bytes(0x20 if bytes([byte]).isspace() else 0x78 for byte in range(256))
+
+
+def count_stream(f, words=True):
+    """(строки, слова, байты) потока: bytes.count и translate по блокам, без цикла по строкам"""
+    lines = word_count = size = 0
+    in_word = False
+    buf = bytearray(CHUNK_SIZE)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        size += n
+        lines += buf.count(b'\n', 0, n)
+        if words:
+            mapped = (buf if n == len(buf) else buf[:n]).translate(WC_WORD_MAP)
+            word_count += mapped.count(b' x')
+            # слово в начале блока считается, если не продолжает слово из прошлого блока
+            if mapped[0] == 0x78 and not in_word:
+                word_count += 1
+            in_word = mapped[-1] == 0x78
+    return lines, word_count, size
+
+
+class Inotify:
+    """Ожидание изменений файлов через inotify (Linux, libc через ctypes)"""
+    
+    def __init__(self):
+        import ctypes
+        self.ctypes = ctypes
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+    
+    def watch(self, path):
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK) < 0:
+            raise OSError(self.ctypes.get_errno(), "inotify_add_watch")
+    
+    def wait(self, timeout):
+        """Дождаться событий (True) или таймаута (False); события вычитываются"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+    
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify(paths):
+    """Inotify с наблюдением за paths или None (не Linux, нет libc, исчерпан лимит)"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        watcher = Inotify()
+    except (OSError, AttributeError, ImportError):
+        return None
+    try:
+        for path in paths:
+            watcher.watch(path)
+    except OSError:
+        watcher.close()
+        return None
+    return watcher
+
+
+def output_closed(stream):
+    """Читатель закрыл канал stream (poll сообщает POLLERR); для терминала и файла — False"""
+    if not hasattr(select, 'poll'):
+        return False
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return False
+    poller = select.poll()
+    poller.register(fd, select.POLLOUT)
+    return any(event & select.POLLERR for _, event in poller.poll(0))
+
+
+# Параметры sort: память под прогоны (-S, DSH_SORT_MEMORY), примерная
+# накладная память Python на строку, число прогонов в одном слиянии
+# (столько файлов открыто разом) и размер пачки строк при записи
+SORT_SIZE_UNITS = {'b': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+SORT_LINE_OVERHEAD = 48
+SORT_MERGE_FANIN = 64
+SORT_WRITE_BATCH = 4096
+SORT_NUMBER_RE = re.compile(rb'\s*(-?(?:\d+(?:\.\d*)?|\.\d+))')
+
+
+def parse_size(text):
+    """Размер для sort -S: 512K, 100M, 2G, 300b; число без суффикса — в КБ (как GNU sort)"""
+    text = text.strip()
+    suffix = text[-1:]
+    unit = SORT_SIZE_UNITS.get(suffix if suffix == 'b' else suffix.upper())
+    number = text[:-1] if unit is not None else text
+    size = int(float(number) * (unit or 1024))
+    if size <= 0:
+        raise ValueError(text)
+    return size
+
+
+SORT_MEMORY = parse_size(os.environ.get('DSH_SORT_MEMORY') or '256M')
+
+
+def make_sort_key(spec, unique=False):
+    """(ключ сортировки, ключ сравнения для -u) по spec = (поля, разделитель, числовой)
+
+    Поля — (N, M или None), нумерация с 1; без разделителя поля делятся
+    пробельными символами. Ключ сортировки — (значение поля, строка): при
+    равных полях строки сравниваются целиком, как в GNU sort; с -u этого
+    нет, и из равных остаётся первая по вводу. (None, None) — сравнивать
+    сами строки.
+    """
+    fields, separator, numeric = spec
+    if fields is None and not numeric:
+        return None, None
+    
+    def extract(line):
+        if fields is None:
+            return line
+        parts = line.split(separator) if separator else line.split()
+        return (separator or b' ').join(parts[fields[0] - 1:fields[1]])
+    
+    if numeric:
+        def primary(line):
+            match = SORT_NUMBER_RE.match(extract(line))
+            if not match:
+                return 0
+            # целые — int: сравнение с float точное, большие числа не теряют разрядов
+            number = match.group(1)
+            return float(number) if b'.' in number else int(number)
+    else:
+        primary = extract
+    if unique:
+        return primary, primary
+    return (lambda line: (primary(line), line)), primary
+
+
+def unique_lines(lines, primary=None):
+    """Строки без подряд идущих повторов (по ключу primary)"""
+    previous = object()
+    for line in lines:
+        key = line if primary is None else primary(line)
+        if key != previous:
+            previous = key
+            yield line
+
+
+def write_lines(f, lines):
+    """Записать строки (без \\n) пачками — по одному write на SORT_WRITE_BATCH строк"""
+    import itertools
+    lines = iter(lines)
+    while True:
+        batch = list(itertools.islice(lines, SORT_WRITE_BATCH))
+        if not batch:
+            return
+        f.write(b'\n'.join(batch) + b'\n')
+
+
+def read_line_runs(streams, limit):
+    """Прогоны — списки строк без \\n примерно по limit байт памяти из потоков streams"""
+    run = []
+    used = 0
+    size = min(CHUNK_SIZE, limit)
+    for f in streams:
+        tail = b''
+        while True:
+            chunk = f.read1(size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            run.extend(lines)
+            used += len(chunk) + SORT_LINE_OVERHEAD * len(lines)
+            if used >= limit:
+                yield run
+                run = []
+                used = 0
+        if tail:
+            run.append(tail)
+    if run:
+        yield run
+
+
+def sort_run(lines, spec, reverse, unique, path=None):
+    """Отсортировать прогон; с path — записать в файл и вернуть path (выполняется и в рабочем процессе)"""
+    key, primary = make_sort_key(spec, unique)
+    lines.sort(key=key, reverse=reverse)
+    if unique:
+        lines = list(unique_lines(lines, primary))
+    if path is None:
+        return lines
+    with open(path, 'wb') as f:
+        write_lines(f, lines)
+    return path
+
+
+def merge_runs(paths, spec, reverse, unique):
+    """Слить отсортированные файлы прогонов heapq.merge; строки без \\n"""
+    import heapq
+    key, primary = make_sort_key(spec, unique)
+    files = [open(path, 'rb') for path in paths]
+    try:
+        merged = heapq.merge(*[(line[:-1] for line in f) for f in files], key=key, reverse=reverse)
+        yield from unique_lines(merged, primary) if unique else merged
+    finally:
+        for f in files:
+            f.close()
+
+
+def spill_runs(runs, spec, reverse, unique, workdir, parallel):
+    """Отсортировать прогоны и сбросить их во временные файлы; при parallel > 1 — в процессах
+
+    Пока рабочие сортируют, в памяти читается не больше одного следующего
+    прогона на процесс. Пути возвращаются в порядке прогонов (для устойчивости).
+    Рабочие запускаются через forkserver: при обычном fork они унаследовали бы
+    концы каналов конвейера, и sort не дождался бы конца своего ввода.
+    """
+    paths = []
+    if parallel <= 1:
+        for i, run in enumerate(runs):
+            paths.append(sort_run(run, spec, reverse, unique, os.path.join(workdir, f'run{i}')))
+            del run
+        return paths
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    pending = deque()
+    with ProcessPoolExecutor(parallel, mp_context=multiprocessing.get_context('forkserver')) as executor:
+        for i, run in enumerate(runs):
+            pending.append(executor.submit(sort_run, run, spec, reverse, unique,
+                                           os.path.join(workdir, f'run{i}')))
+            del run
+            while len(pending) >= parallel:
+                paths.append(pending.popleft().result())
+        while pending:
+            paths.append(pending.popleft().result())
+    return paths
+
+
+def external_sort(runs, spec, reverse=False, unique=False, tmpdir=None, parallel=1):
+    """Сортировка слиянием для данных больше памяти; генератор строк без \\n
+
+    Если весь ввод уместился в один прогон, он сортируется в памяти. Иначе
+    прогоны сбрасываются во временный каталог и сливаются heapq.merge, при
+    числе прогонов больше SORT_MERGE_FANIN — в несколько проходов. Временный
+    каталог удаляется при закрытии генератора.
+    """
+    import shutil
+    import tempfile
+    runs = iter(runs)
+    first = next(runs, None)
+    if first is None:
+        return
+    second = next(runs, None)
+    if second is None:
+        yield from sort_run(first, spec, reverse, unique)
+        return
+
+    head = [first, second]
+    del first, second
+    
+    def all_runs():
+        while head:
+            yield head.pop(0)
+        yield from runs
+    
+    workdir = tempfile.mkdtemp(prefix='dsh-sort-', dir=tmpdir)
+    try:
+        paths = spill_runs(all_runs(), spec, reverse, unique, workdir, parallel)
+        level = 0
+        while len(paths) > SORT_MERGE_FANIN:
+            merged = []
+            for i in range(0, len(paths), SORT_MERGE_FANIN):
+                group = paths[i:i + SORT_MERGE_FANIN]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                path = os.path.join(workdir, f'merge{level}-{i}')
+                with open(path, 'wb') as f:
+                    write_lines(f, merge_runs(group, spec, reverse, unique))
+                for old in group:
+                    os.remove(old)
+                merged.append(path)
+            paths = merged
+            level += 1
+        yield from merge_runs(paths, spec, reverse, unique)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Параметры gzip/tar -z: сжатие как в pigz — блоки по GZIP_BLOCK байт
+# сжимаются независимо в пуле потоков (zlib отпускает GIL), словарь блока —
+# последние 32 КБ предыдущего, поэтому степень сжатия почти как у gzip
+GZIP_BLOCK = 128 * 1024
+GZIP_DICT = 32 * 1024
+GZIP_LEVEL = 6
+GZIP_WORKERS = os.cpu_count() or 1
+GZIP_SUFFIXES = (('.tgz', '.tar'), ('.gz', ''), ('.z', ''))
+
+
+def deflate_block(block, dictionary, level, last):
+    """Сжать блок в raw deflate; не последний завершается Z_SYNC_FLUSH (граница байта)"""
+    import zlib
+    options = {'zdict': dictionary} if dictionary else {}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, **options)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter:
+    """Файловый объект записи gzip с параллельным сжатием блоков (как pigz)
+
+    Сжатые блоки склеиваются в один поток deflate одного члена gzip, CRC32 и
+    длина считаются по ходу записи. В работе не больше 2 × workers блоков,
+    так что память не зависит от объёма данных. close() дописывает хвост,
+    но не закрывает нижележащий файл.
+    """
+    
+    def __init__(self, fileobj, level=GZIP_LEVEL, workers=GZIP_WORKERS, name='', mtime=0):
+        import zlib
+        self.zlib = zlib
+        self.fileobj = fileobj
+        self.level = level
+        self.workers = workers
+        self.buffer = bytearray()
+        self.dictionary = b''
+        self.crc = 0
+        self.size = 0
+        self.pending = deque()
+        self.executor = None
+        self.closed = False
+        fname = os.fsencode(os.path.basename(name)).replace(b'\0', b'') if name else b''
+        extra = 2 if level == 9 else 4 if level == 1 else 0
+        fileobj.write(struct.pack('<BBBBIBB', 0x1f, 0x8b, 8, 8 if fname else 0,
+                                  int(mtime) & 0xffffffff, extra, 3))
+        if fname:
+            fileobj.write(fname + b'\0')
+    
+    def write(self, data):
+        self.crc = self.zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self.buffer += data
+        if len(self.buffer) >= GZIP_BLOCK:
+            pending = bytes(self.buffer)
+            end = len(pending) - len(pending) % GZIP_BLOCK
+            self.buffer = bytearray(pending[end:])
+            for start in range(0, end, GZIP_BLOCK):
+                self.submit(pending[start:start + GZIP_BLOCK], last=False)
+        return len(data)
+    
+    def submit(self, block, last):
+        if self.workers <= 1:
+            self.fileobj.write(deflate_block(block, self.dictionary, self.level, last))
+        else:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(self.workers)
+            self.pending.append(self.executor.submit(deflate_block, block, self.dictionary,
+                                                     self.level, last))
+            while len(self.pending) > 2 * self.workers or (self.pending and self.pending[0].done()):
+                self.fileobj.write(self.pending.popleft().result())
+        self.dictionary = block[-GZIP_DICT:]
+    
+    def close(self):
+        """Сжать остаток, дописать CRC32 и длину"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.submit(bytes(self.buffer), last=True)
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+            self.fileobj.write(struct.pack('<II', self.crc, self.size & 0xffffffff))
+        finally:
+            self.abort()
+    
+    def abort(self):
+        """Остановить пул без записи хвоста (при ошибке)"""
+        self.closed = True
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        self.pending.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def gunzip_stream(src, dst):
+    """Распаковать gzip потоком, в том числе из нескольких членов; вернуть число байт
+
+    Вывод на каждый шаг ограничен CHUNK_SIZE (бомба из нулей не раздувает
+    память), CRC32 и длину каждого члена проверяет zlib. Нули после
+    последнего члена допускаются, как в gzip.
+    """
+    import zlib
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    started = False
+    total = 0
+    while True:
+        chunk = src.read1(CHUNK_SIZE)
+        if not chunk:
+            break
+        while chunk:
+            if decompressor.eof:
+                if not chunk.strip(b'\0'):
+                    break
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            started = True
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            dst.write(data)
+            total += len(data)
+            chunk = decompressor.unconsumed_tail or decompressor.unused_data
+    if not started or not decompressor.eof:
+        raise zlib.error("неожиданный конец сжатых данных")
+    return total
+
+
+def tar_add_tree(tar, path, arcname, skip=None):
+    """Добавить path в архив рекурсивно; выдаёт (имя в архиве, ошибка или None) по элементам
+
+    Ошибка чтения одного файла не прерывает обход. skip — (st_dev, st_ino)
+    самого архива, чтобы не упаковать его в себя.
+    """
+    stack = [(path, arcname)]
+    while stack:
+        path, arcname = stack.pop()
+        try:
+            st = os.lstat(path)
+            if skip == (st.st_dev, st.st_ino):
+                continue
+            tar.add(path, arcname, recursive=False)
+        except OSError as e:
+            yield arcname, e
+            continue
+        yield arcname, None
+        if stat.S_ISDIR(st.st_mode):
+            try:
+                names = sorted(os.listdir(path), reverse=True)
+            except OSError as e:
+                yield arcname, e
+                continue
+            base = arcname.rstrip('/')
+            stack.extend((os.path.join(path, name), f"{base}/{name}") for name in names)
+
+
+def tar_listing(member):
+    """Строка tar -tv: права, владелец, размер, время и имя члена архива"""
+    kind = 'd' if member.isdir() else 'l' if member.issym() else 'h' if member.islnk() else '-'
+    owner = f"{member.uname or member.uid}/{member.gname or member.gid}"
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(member.mtime))
+    line = f"{kind}{stat.filemode(member.mode)[1:]} {owner} {member.size:>10} {when} {member.name}"
+    if member.issym():
+        line += f" -> {member.linkname}"
+    elif member.islnk():
+        line += f" ссылка на {member.linkname}"
+    return line
+
+
+def percentile(ordered, fraction):
+    """Перцентиль по отсортированному списку (0.0 для пустого)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class CommandStats:
+    """Счётчики команд по имени: число вызовов, суммарное время и задержки
+
+    Запись идёт из execute только при включённом сборе (stats on или
+    DSH_STATS=1); выключенный сбор стоит одной проверки флага.
+    """
+    
+    WINDOW = 1024
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.commands = {}
+    
+    def record(self, name, builtin, elapsed):
+        with self.lock:
+            entry = self.commands.get(name)
+            if entry is None:
+                entry = self.commands[name] = [builtin, 0, 0.0, deque(maxlen=self.WINDOW)]
+            entry[1] += 1
+            entry[2] += elapsed
+            entry[3].append(elapsed)
+    
+    def reset(self):
+        with self.lock:
+            self.commands = {}
+    
+    def rows(self):
+        """[(имя, встроенная?, вызовов, всего, p50, p95, p99, макс)] по убыванию суммарного времени"""
+        with self.lock:
+            items = [(name, builtin, count, total, sorted(window))
+                     for name, (builtin, count, total, window) in self.commands.items()]
+        items.sort(key=lambda item: -item[3])
+        return [(name, builtin, count, total, percentile(ordered, 0.50), percentile(ordered, 0.95),
+                 percentile(ordered, 0.99), ordered[-1])
+                for name, builtin, count, total, ordered in items]
+
+
+COMMAND_STATS = CommandStats(os.environ.get('DSH_STATS', '') not in ('', '0'))
+
+
+# История команд: лимит записей (DSH_HISTSIZE) и удаление повторов при
+# уплотнении файла (DSH_HISTDEDUP=1)
+HISTORY_SIZE = int(os.environ.get('DSH_HISTSIZE') or 10000)
+HISTORY_DEDUP = os.environ.get('DSH_HISTDEDUP', '') not in ('', '0')
+
+
+def last_lines(text, count):
+    """Последние count строк текста, где каждая строка оканчивается на '\\n'"""
+    pos = len(text) - 1
+    for _ in range(count):
+        pos = text.rfind('\n', 0, pos)
+        if pos == -1:
+            return text
+    return text[pos + 1:]
+
+
+class HistoryStore:
+    """История команд с дозаписью в файл, ограничением размера и поиском
+
+    Каждая команда сразу дописывается в файл (O_APPEND под flock на файле
+    блокировки), так что сбой не теряет сеанс, а несколько сеансов пишут в
+    один файл, не перемешивая строки. Когда файл вырастает в полтора раза
+    больше лимита, он уплотняется: остаются последние limit команд (при
+    dedupe — только последние вхождения повторов), запись идёт во временный
+    файл с rename. Порог проверяется по размеру файла после дозаписи (он
+    учитывает строки всех сеансов) и по числу своих дозаписей, а решение об
+    уплотнении принимается по числу строк, пересчитанному из файла под
+    блокировкой. В памяти загруженная история хранится одним блоком текста;
+    отдельного индекса нет — поиск делает один проход регулярного выражения
+    по блоку.
+    """
+    
+    def __init__(self, path=None, limit=HISTORY_SIZE, dedupe=HISTORY_DEDUP):
+        self.path = path
+        self.limit = max(limit, 1)
+        self.dedupe = dedupe
+        self.blob = ''
+        self.count = 0
+        self.tail = []
+        # размер файла, при котором пора пересчитать его строки (None — сразу),
+        # и сколько своих дозаписей до этого осталось (на случай строк короче средней)
+        self.compact_at = None
+        self.appends_left = 0
+        # файл читается при первом обращении, а не при запуске
+        self.loaded = path is None
+    
+    def __len__(self):
+        self.ensure_loaded()
+        return self.count + len(self.tail)
+    
+    def ensure_loaded(self):
+        if not self.loaded:
+            try:
+                self.load()
+            except OSError:
+                self.loaded = True
+    
+    @contextmanager
+    def locked(self):
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+    
+    def read_file(self):
+        try:
+            with open(self.path, 'rb') as f:
+                text = f.read().decode('utf-8', 'replace')
+        except FileNotFoundError:
+            return ''
+        if text and not text.endswith('\n'):
+            text += '\n'
+        return text
+    
+    def load(self):
+        """Прочитать историю из файла (не больше limit последних команд)"""
+        text = self.read_file()
+        self.note_file(len(text.encode('utf-8')), text.count('\n'))
+        self.set_text(last_lines(text, self.limit))
+        self.loaded = True
+    
+    def note_file(self, size, lines):
+        """Запомнить, при каком размере файла в нём станет больше полутора limit строк"""
+        average = size / lines if lines else 64
+        self.appends_left = max(self.limit + self.limit // 2 - lines, 1)
+        self.compact_at = size + self.appends_left * average
+    
+    def set_text(self, text):
+        self.blob = text
+        self.count = text.count('\n')
+        self.tail = []
+    
+    def last(self):
+        self.ensure_loaded()
+        if self.tail:
+            return self.tail[-1]
+        return self.blob[self.blob.rfind('\n', 0, len(self.blob) - 1) + 1:-1] if self.blob else None
+    
+    def append(self, command):
+        """Добавить команду (подряд идущие повторы не записываются)"""
+        command = command.replace('\n', ' ')
+        if command == self.last():
+            return
+        self.tail.append(command)
+        if len(self) > self.limit + self.limit // 2:
+            self.set_text(last_lines(self.text(), self.limit))
+        if self.path is None:
+            return
+        try:
+            with self.locked():
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                try:
+                    os.write(fd, (command + '\n').encode('utf-8'))
+                    size = os.fstat(fd).st_size
+                finally:
+                    os.close(fd)
+                # размер включает дозаписи других сеансов; строки считаются заново
+                self.appends_left -= 1
+                if self.compact_at is None or size >= self.compact_at or self.appends_left <= 0:
+                    self.compact_locked(force=False)
+        except OSError:
+            pass
+    
+    def compact(self):
+        """Уплотнить файл истории; вернуть число оставшихся команд"""
+        with self.locked():
+            return self.compact_locked()
+    
+    def compact_locked(self, force=True):
+        """Уплотнить файл (при force=False — только если строк больше полутора limit)"""
+        import tempfile
+        text = self.read_file()
+        lines = text.split('\n')[:-1]
+        if not force and len(lines) <= self.limit + self.limit // 2:
+            self.note_file(len(text.encode('utf-8')), len(lines))
+            return len(lines)
+        if self.dedupe:
+            seen = set()
+            unique = []
+            for command in reversed(lines):
+                if command not in seen:
+                    seen.add(command)
+                    unique.append(command)
+            lines = unique[::-1]
+        lines = lines[-self.limit:]
+        text = ''.join(command + '\n' for command in lines)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.doyarka_history.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.note_file(len(text.encode('utf-8')), len(lines))
+        return len(lines)
+    
+    def text(self):
+        return self.blob + ''.join(command + '\n' for command in self.tail)
+    
+    def recent(self, count):
+        """Последние count команд: [(номер, команда)]"""
+        self.ensure_loaded()
+        commands = self.tail[-count:] if count > 0 else []
+        if count > len(commands):
+            commands = last_lines(self.blob, count - len(commands)).split('\n')[:-1] + commands
+        first = len(self) - len(commands) + 1
+        return list(enumerate(commands, first))
+    
+    def search(self, regex):
+        """Команды с совпадением: [(номер, команда)]
+
+        Блок текста просматривается одним regex.search на каждую найденную
+        строку; номера строк — подсчётом переводов строк между совпадениями.
+        """
+        self.ensure_loaded()
+        results = []
+        text = self.blob
+        line = pos = 0
+        while True:
+            match = regex.search(text, pos)
+            if match is None:
+                break
+            start = match.start()
+            line += text.count('\n', pos, start)
+            begin = max(pos, text.rfind('\n', pos, start) + 1)
+            end = text.find('\n', start)
+            if end == -1:
+                break
+            results.append((line + 1, text[begin:end]))
+            line += 1
+            pos = end + 1
+        for k, command in enumerate(self.tail, self.count + 1):
+            if regex.search(command):
+                results.append((k, command))
+        return results
+
+
+class LineIndex:
+    """Ленивый индекс строк для mmap: число переводов строк по блокам
+
+    Блоки считаются только по мере надобности (bytes.count), а точные смещения
+    строк хранятся лишь для недавно просмотренных блоков, поэтому открытие
+    файла и переходы по нему не требуют сканирования всего файла.
+    """
+    
+    DENSE_BLOCKS = 64
+    
+    def __init__(self, data, block_size=CHUNK_SIZE):
+        self.data = data
+        self.size = len(data)
+        self.block_size = block_size
+        # newlines[b] — число переводов строк до начала блока b
+        self.newlines = [0]
+        self.dense = OrderedDict()
+    
+    def scan_block(self):
+        """Посчитать переводы строк в следующем блоке; False, если файл просчитан целиком"""
+        start = (len(self.newlines) - 1) * self.block_size
+        if start >= self.size:
+            return False
+        self.newlines.append(self.newlines[-1] + self.data[start:start + self.block_size].count(b'\n'))
+        return True
+    
+    def complete(self):
+        return (len(self.newlines) - 1) * self.block_size >= self.size
+    
+    def has_line(self, i):
+        """Есть ли строка i (строк на одну больше, чем переводов строк)"""
+        while self.newlines[-1] < i and self.scan_block():
+            pass
+        return self.newlines[-1] >= i
+    
+    def line_count(self):
+        while self.scan_block():
+            pass
+        return self.newlines[-1] + 1
+    
+    def known_lines(self):
+        """Число уже известных строк и признак того, что оно окончательное"""
+        return self.newlines[-1] + 1, self.complete()
+    
+    def block_offsets(self, block):
+        """Смещения начала строк внутри блока (позиции сразу после переводов строк)"""
+        offsets = self.dense.get(block)
+        if offsets is None:
+            start = block * self.block_size
+            end = min(start + self.block_size, self.size)
+            offsets = []
+            pos = self.data.find(b'\n', start, end)
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = self.data.find(b'\n', pos + 1, end)
+            self.dense[block] = offsets
+            if len(self.dense) > self.DENSE_BLOCKS:
+                self.dense.popitem(last=False)
+        else:
+            self.dense.move_to_end(block)
+        return offsets
+    
+    def line_start(self, i):
+        if i == 0:
+            return 0
+        if not self.has_line(i):
+            raise IndexError(i)
+        block = bisect.bisect_left(self.newlines, i) - 1
+        return self.block_offsets(block)[i - self.newlines[block] - 1]
+    
+    def line_end(self, i):
+        """Смещение конца строки i (без перевода строки)"""
+        return self.line_start(i + 1) - 1 if self.has_line(i + 1) else self.size
+
+
+class PieceTable:
+    """Буфер редактора: таблица кусков поверх mmap исходного файла
+
+    Куски — это диапазоны строк исходного файла ('o', начало, число строк)
+    или добавленных строк ('a', начало, число строк). Правка строки меняет
+    только список кусков; последний исходный кусок может быть открытым
+    (число строк None — «до конца файла»), пока файл не просчитан целиком.
+    """
+    
+    MATCH_CACHE = 16
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.index = LineIndex(self.data)
+        self.added = []
+        self.pieces = [('o', 0, None)]
+        # номер правки: кэш совпадений буфера действителен, пока он не изменился
+        self.version = 0
+        self.original_matches = OrderedDict()
+        self.buffer_matches = OrderedDict()
+    
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+    
+    def piece_length(self, piece):
+        source, start, length = piece
+        if length is None:
+            return self.index.line_count() - start
+        return length
+    
+    def locate(self, i):
+        """Найти кусок со строкой i: (номер куска, смещение в куске)"""
+        base = 0
+        for n, (source, start, length) in enumerate(self.pieces):
+            if length is None:
+                if self.index.has_line(start + i - base):
+                    return n, i - base
+                # индекс уже просчитан до конца — длина куска известна
+                length = self.index.line_count() - start
+            if i < base + length:
+                return n, i - base
+            base += length
+        raise IndexError(i)
+    
+    def has_line(self, i):
+        try:
+            self.locate(i)
+            return True
+        except IndexError:
+            return False
+    
+    def line_count(self):
+        return sum(self.piece_length(piece) for piece in self.pieces)
+    
+    def known_line_count(self):
+        """Число строк без полного просчёта файла: (число, окончательное ли)"""
+        total = 0
+        for source, start, length in self.pieces:
+            if length is None:
+                known, complete = self.index.known_lines()
+                if not complete:
+                    return total + known - start, False
+                length = known - start
+            total += length
+        return total, True
+    
+    def original_line(self, i):
+        return self.data[self.index.line_start(i):self.index.line_end(i)]
+    
+    def get_line(self, i):
+        n, k = self.locate(i)
+        source, start, length = self.pieces[n]
+        if source == 'a':
+            return self.added[start + k]
+        return self.original_line(start + k).decode('utf-8', 'replace')
+    
+    def split(self, i):
+        """Разрезать куски так, чтобы строка i начинала кусок; вернуть его номер"""
+        try:
+            n, k = self.locate(i)
+        except IndexError:
+            if i == self.line_count():
+                return len(self.pieces)
+            raise
+        if k == 0:
+            return n
+        source, start, length = self.pieces[n]
+        tail = None if length is None else length - k
+        self.pieces[n:n + 1] = [(source, start, k), (source, start + k, tail)]
+        return n + 1
+    
+    def insert_line(self, i, text):
+        n = self.split(i)
+        self.added.append(text)
+        self.pieces.insert(n, ('a', len(self.added) - 1, 1))
+        self.version += 1
+    
+    def delete_line(self, i):
+        self.version += 1
+        n = self.split(i)
+        source, start, length = self.pieces[n]
+        if length is None:
+            if not self.index.has_line(start + 1):
+                del self.pieces[n]
+            else:
+                self.pieces[n] = (source, start + 1, None)
+        elif length == 1:
+            del self.pieces[n]
+        else:
+            self.pieces[n] = (source, start + 1, length - 1)
+    
+    def set_line(self, i, text):
+        self.delete_line(i)
+        self.insert_line(i, text)
+    
+    def cache_put(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.MATCH_CACHE:
+            cache.popitem(last=False)
+    
+    def original_match_lines(self, regex):
+        """Совпадения в исходном файле (поиск по mmap целиком)
+
+        Возвращает два параллельных списка по возрастанию: номера строк и
+        смещения их начал. Переводы строк между соседними совпадениями
+        считаются bytes.count, так что проход по файлу один.
+        """
+        key = (regex.pattern, regex.flags)
+        found = self.original_matches.get(key)
+        if found is not None:
+            self.original_matches.move_to_end(key)
+            return found
+        lines, starts = [], []
+        data = self.data
+        line = pos = 0
+        while True:
+            match = regex.search(data, pos)
+            if match is None:
+                break
+            start = match.start()
+            line += data[pos:start].count(b'\n')
+            lines.append(line)
+            starts.append(max(pos, data.rfind(b'\n', pos, start) + 1))
+            # одной строке достаточно одного совпадения
+            end = data.find(b'\n', start)
+            if end == -1:
+                break
+            line += 1
+            pos = end + 1
+        found = (lines, starts)
+        self.cache_put(self.original_matches, key, found)
+        return found
+    
+    def match_lines(self, regex):
+        """Номера строк буфера с совпадениями по возрастанию
+
+        Совпадения в исходном файле переводятся в номера строк буфера через
+        список кусков; добавленные строки проверяются по отдельности.
+        Результат кэшируется до следующей правки буфера.
+        """
+        key = (regex.pattern, regex.flags)
+        cached = self.buffer_matches.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        original, _ = self.original_match_lines(regex)
+        lines = []
+        base = 0
+        for source, start, length in self.pieces:
+            if source == 'a':
+                for k in range(length):
+                    if regex.search(self.added[start + k].encode('utf-8')):
+                        lines.append(base + k)
+            else:
+                if length is None:
+                    length = self.index.line_count() - start
+                lo = bisect.bisect_left(original, start)
+                hi = bisect.bisect_left(original, start + length)
+                lines.extend(base + line - start for line in original[lo:hi])
+            base += length
+        self.cache_put(self.buffer_matches, key, (self.version, lines))
+        return lines
+    
+    def find(self, regex, line, backward=False):
+        """Следующее совпадение после строки line (или перед ней): (строка, был ли переход через край)"""
+        lines = self.match_lines(regex)
+        if not lines:
+            return None
+        if backward:
+            k = bisect.bisect_left(lines, line) - 1
+            return (lines[k], False) if k >= 0 else (lines[-1], True)
+        k = bisect.bisect_right(lines, line)
+        return (lines[k], False) if k < len(lines) else (lines[0], True)
+    
+    def replace_all(self, regex, repl):
+        """Заменить совпадения во всех строках (в пределах строки); вернуть число замен
+
+        Список кусков перестраивается за один проход: нетронутые диапазоны
+        исходного файла остаются ссылками на mmap, изменённые строки
+        становятся добавленными.
+        """
+        original, starts = self.original_match_lines(regex)
+        pieces = []
+        count = 0
+        
+        def emit(source, start, length):
+            if pieces:
+                last_source, last_start, last_length = pieces[-1]
+                if last_source == source and last_start + last_length == start:
+                    pieces[-1] = (source, last_start, last_length + length)
+                    return
+            pieces.append((source, start, length))
+        
+        def emit_new(data):
+            self.added.append(data.decode('utf-8', 'replace'))
+            emit('a', len(self.added) - 1, 1)
+        
+        for source, start, length in self.pieces:
+            if source == 'a':
+                for k in range(start, start + length):
+                    data, n = regex.subn(repl, self.added[k].encode('utf-8'))
+                    if n:
+                        count += n
+                        emit_new(data)
+                    else:
+                        emit('a', k, 1)
+                continue
+            if length is None:
+                length = self.index.line_count() - start
+            pos = start
+            lo = bisect.bisect_left(original, start)
+            hi = bisect.bisect_left(original, start + length)
+            for k in range(lo, hi):
+                line, begin = original[k], starts[k]
+                end = self.data.find(b'\n', begin)
+                data, n = regex.subn(repl, self.data[begin:end if end != -1 else len(self.data)])
+                if not n:
+                    continue
+                count += n
+                if line > pos:
+                    emit('o', pos, line - pos)
+                emit_new(data)
+                pos = line + 1
+            if start + length > pos:
+                emit('o', pos, start + length - pos)
+        if count:
+            self.pieces = pieces
+            self.version += 1
+        return count
+    
+    def chunks(self):
+        """Содержимое буфера блоками bytes (исходные строки копируются из mmap без декодирования)"""
+        first = True
+        for source, start, length in self.pieces:
+            if length == 0:
+                continue
+            if not first:
+                yield b'\n'
+            first = False
+            if source == 'a':
+                yield '\n'.join(self.added[start:start + length]).encode('utf-8')
+                continue
+            begin = self.index.line_start(start)
+            end = self.index.size if length is None else self.index.line_end(start + length - 1)
+            for pos in range(begin, end, COPY_CHUNK):
+                yield self.data[pos:min(pos + COPY_CHUNK, end)]
+    
+    def save(self, path=None):
+        """Атомарно сохранить буфер: запись во временный файл рядом и rename"""
+        import shutil
+        import tempfile
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self.chunks():
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                shutil.copymode(path, tmp_path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class ProcSampler:
+    """Снимки состояния системы из /proc с переиспользованием дескрипторов
+
+    Файлы /proc открываются один раз и перечитываются os.pread с нулевого
+    смещения: ядро формирует содержимое заново при каждом чтении, а open и
+    close на каждый замер не нужны. Загрузка CPU (общая и по процессам)
+    считается по разнице счётчиков между соседними снимками. Снимок моложе
+    max_age отдаётся из кэша, поэтому частые вызовы (neofetch) почти бесплатны.
+    """
+    
+    MAX_AGE = 0.5
+    # дескрипторы /proc/<pid>/stat держим не для всех процессов
+    MAX_PROC_FDS = 1024
+    
+    def __init__(self, root='/proc'):
+        self.root = root
+        self.lock = threading.Lock()
+        self.fds = {}
+        self.proc_fds = {}
+        self.info = None
+        self.snapshot = None
+        self.prev_cpu = None
+        self.prev_ticks = {}
+        self.clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+    
+    @staticmethod
+    def pread_all(fd):
+        size = 65536
+        while True:
+            data = os.pread(fd, size, 0)
+            if len(data) < size:
+                return data
+            size *= 4
+    
+    def read(self, name):
+        """Содержимое /proc/<name> через закэшированный дескриптор"""
+        fd = self.fds.get(name)
+        if fd is None:
+            fd = self.fds[name] = os.open(os.path.join(self.root, name), os.O_RDONLY)
+        return self.pread_all(fd)
+    
+    def read_proc(self, pid):
+        """Содержимое /proc/<pid>/stat или None, если процесса уже нет"""
+        fd = self.proc_fds.pop(pid, None)
+        for attempt in range(2):
+            if fd is None:
+                try:
+                    fd = os.open(os.path.join(self.root, str(pid), 'stat'), os.O_RDONLY)
+                except OSError:
+                    return None
+            try:
+                data = self.pread_all(fd)
+            except OSError:
+                # дескриптор остался от завершившегося процесса (pid мог достаться новому)
+                os.close(fd)
+                fd = None
+                continue
+            if len(self.proc_fds) < self.MAX_PROC_FDS:
+                self.proc_fds[pid] = fd
+            else:
+                os.close(fd)
+            return data
+        return None
+    
+    def static(self):
+        """Неизменные сведения: система, имя узла, ядро, модель CPU, число ядер"""
+        if self.info is None:
+            uname = os.uname() if hasattr(os, 'uname') else None
+            info = {'system': uname.sysname if uname else os.name,
+                    'node': uname.nodename if uname else '',
+                    'release': uname.release if uname else '',
+                    'cpu_model': None,
+                    'cpus': os.cpu_count() or 1}
+            try:
+                with open(os.path.join(self.root, 'cpuinfo'), 'rb') as f:
+                    for line in f:
+                        if line.startswith(b'model name'):
+                            info['cpu_model'] = line.split(b':', 1)[1].strip().decode(errors='replace')
+                            break
+            except OSError:
+                pass
+            if info['cpu_model'] is None:
+                import platform
+                info['cpu_model'] = platform.processor() or "Unknown"
+            if uname is None:
+                import platform
+                info.update(system=platform.system(), node=platform.node(), release=platform.release())
+            self.info = info
+        return self.info
+    
+    def sample(self, processes=False, max_age=MAX_AGE):
+        """Снимок: uptime, load, cpu (%), память в байтах и, если нужно, процессы
+
+        Без /proc возвращает None.
+        """
+        with self.lock:
+            now = time.monotonic()
+            snapshot = self.snapshot
+            if (snapshot is not None and now - snapshot['time'] < max_age
+                    and (snapshot['processes'] is not None or not processes)):
+                return snapshot
+            try:
+                snapshot = self.read_system(now)
+            except (OSError, ValueError, IndexError):
+                return None
+            if processes:
+                snapshot['processes'] = self.read_processes(now)
+            self.snapshot = snapshot
+            return snapshot
+    
+    def read_system(self, now):
+        fields = self.read('stat').split(b'\n', 1)[0].split()[1:]
+        counters = [int(x) for x in fields[:8]]
+        idle = counters[3] + counters[4]
+        total = sum(counters)
+        cpu = 0.0
+        if self.prev_cpu is not None and total > self.prev_cpu[0]:
+            cpu = 100.0 * (1 - (idle - self.prev_cpu[1]) / (total - self.prev_cpu[0]))
+        self.prev_cpu = (total, idle)
+        
+        memory = {}
+        for line in self.read('meminfo').split(b'\n'):
+            key, _, value = line.partition(b':')
+            if key in (b'MemTotal', b'MemAvailable', b'MemFree', b'SwapTotal', b'SwapFree'):
+                memory[key.decode()] = int(value.split()[0]) * 1024
+        return {
+            'time': now,
+            'uptime': float(self.read('uptime').split()[0]),
+            'load': tuple(float(x) for x in self.read('loadavg').split()[:3]),
+            'cpu': cpu,
+            'mem_total': memory.get('MemTotal', 0),
+            'mem_available': memory.get('MemAvailable', memory.get('MemFree', 0)),
+            'swap_total': memory.get('SwapTotal', 0),
+            'swap_free': memory.get('SwapFree', 0),
+            'processes': None,
+        }
+    
+    def read_processes(self, now):
+        """[(pid, имя, состояние, %CPU, RSS в байтах)]; %CPU — за время с прошлого снимка"""
+        pids = [int(name) for name in os.listdir(self.root) if name.isdigit()]
+        previous = self.prev_ticks
+        elapsed = now - previous.get(None, now)
+        ticks = {None: now}
+        result = []
+        for pid in pids:
+            data = self.read_proc(pid)
+            if not data:
+                continue
+            end = data.rfind(b')')
+            fields = data[end + 2:].split()
+            try:
+                used = int(fields[11]) + int(fields[12])
+                rss = int(fields[21]) * mmap.PAGESIZE
+            except (IndexError, ValueError):
+                continue
+            ticks[pid] = used
+            cpu = 0.0
+            if elapsed > 0 and pid in previous:
+                cpu = 100.0 * (used - previous[pid]) / (elapsed * self.clock_ticks)
+            name = data[data.find(b'(') + 1:end].decode(errors='replace')
+            result.append((pid, name, fields[0].decode(), cpu, rss))
+        self.prev_ticks = ticks
+        for pid in [pid for pid in self.proc_fds if pid not in ticks]:
+            os.close(self.proc_fds.pop(pid))
+        return result
+    
+    def close(self):
+        with self.lock:
+            for fd in list(self.fds.values()) + list(self.proc_fds.values()):
+                os.close(fd)
+            self.fds = {}
+            self.proc_fds = {}
+
+
+SYSTEM_SAMPLER = ProcSampler()
+
+
+# Escape-последовательности клавиш (xterm/VT100)
+KEY_SEQUENCES = {
+    b'\x1b[A': 'up', b'\x1b[B': 'down', b'\x1b[C': 'right', b'\x1b[D': 'left',
+    b'\x1bOA': 'up', b'\x1bOB': 'down', b'\x1bOC': 'right', b'\x1bOD': 'left',
+    b'\x1b[H': 'home', b'\x1b[F': 'end', b'\x1b[1~': 'home', b'\x1b[4~': 'end',
+    b'\x1b[5~': 'pgup', b'\x1b[6~': 'pgdn', b'\x1b[3~': 'delete',
+}
+
+
+class RawInput:
+    """Посимвольное чтение клавиш через termios
+
+    Внутри with терминал переводится в неканонический режим без эха,
+    сигналов и управления потоком (чтобы до программы доходили Ctrl+C и
+    Ctrl+S); при выходе исходные настройки восстанавливаются.
+    """
+    
+    def __init__(self, fd=None):
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.saved = None
+        self.pending = b''
+    
+    def __enter__(self):
+        self.saved = termios.tcgetattr(self.fd)
+        mode = termios.tcgetattr(self.fd)
+        mode[0] &= ~(termios.IXON | termios.ICRNL)
+        mode[3] &= ~(termios.ECHO | termios.ICANON | termios.ISIG | termios.IEXTEN)
+        mode[6][termios.VMIN] = 1
+        mode[6][termios.VTIME] = 0
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, mode)
+        return self
+    
+    def __exit__(self, *exc):
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+    
+    def fill(self, timeout=None):
+        """Дочитать байты с терминала; False — таймаут или конец ввода"""
+        if timeout is not None and not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        chunk = os.read(self.fd, 64)
+        self.pending += chunk
+        return bool(chunk)
+    
+    def read_key(self):
+        """Следующая клавиша: имя ('up', 'pgdn', 'esc', ...) или символ"""
+        if not self.pending and not self.fill():
+            raise EOFError
+        if self.pending[:1] == b'\x1b':
+            # одиночный Esc отличаем от начала последовательности по паузе
+            if len(self.pending) == 1:
+                self.fill(0.05)
+            for seq, name in KEY_SEQUENCES.items():
+                if self.pending.startswith(seq):
+                    self.pending = self.pending[len(seq):]
+                    return name
+            if self.pending[1:2] in (b'[', b'O'):
+                # неизвестная последовательность: пропускаем до финального байта
+                end = 2
+                while end < len(self.pending) and not 0x40 <= self.pending[end] <= 0x7e:
+                    end += 1
+                self.pending = self.pending[end + 1:]
+                return ''
+            self.pending = self.pending[1:]
+            return 'esc'
+        lead = self.pending[0]
+        size = 1 if lead < 0xc0 else 2 if lead < 0xe0 else 3 if lead < 0xf0 else 4
+        while len(self.pending) < size and self.fill():
+            pass
+        key, self.pending = self.pending[:size], self.pending[size:]
+        return key.decode('utf-8', 'replace')
+
+
+class Screen:
+    """Модель экрана: при перерисовке выводятся только изменившиеся строки
+
+    Строка выводится позиционированием курсора (CSI строка;1H) и стиранием
+    хвоста (CSI K) — без очистки всего экрана и без запуска внешних программ.
+    Без ANSI (вывод не в терминал) кадр печатается целиком. Длительность
+    кадров копится в frame_times.
+    """
+    
+    def __init__(self, ansi=True, stream=None):
+        self.ansi = ansi
+        self.stream = stream
+        self.rows = []
+        self.dims = None
+        self.frames = 0
+        self.bytes_written = 0
+        self.frame_times = deque(maxlen=256)
+    
+    def write(self, text):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+        self.bytes_written += len(text)
+    
+    def size(self):
+        import shutil
+        return tuple(shutil.get_terminal_size())
+    
+    def enter(self):
+        """Перейти на альтернативный экран терминала"""
+        self.write('\033[?1049h\033[H\033[2J')
+        self.rows = []
+    
+    def leave(self):
+        self.write('\033[?1049l')
+    
+    def clear(self, scrollback=False):
+        self.write('\033[H\033[2J' + ('\033[3J' if scrollback else ''))
+        self.rows = []
+    
+    def render(self, lines, cursor=None, since=None):
+        """Вывести кадр; since — момент нажатия клавиши для замера задержки"""
+        start = time.perf_counter() if since is None else since
+        if not self.ansi:
+            self.write('\n'.join(lines) + '\n')
+        else:
+            out = ['\033[?25l']
+            dims = self.size()
+            if dims != self.dims:
+                self.dims = dims
+                self.rows = []
+                out.append('\033[H\033[2J')
+            width, height = dims
+            lines = [line[:width] for line in lines[:height]]
+            for row, line in enumerate(lines):
+                if row >= len(self.rows) or self.rows[row] != line:
+                    out.append(f'\033[{row + 1};1H{line}\033[K')
+            for row in range(len(lines), len(self.rows)):
+                if self.rows[row]:
+                    out.append(f'\033[{row + 1};1H\033[K')
+            self.rows = lines
+            if cursor is not None:
+                out.append(f'\033[{cursor[0] + 1};{min(cursor[1], width - 1) + 1}H')
+            out.append('\033[?25h')
+            self.write(''.join(out))
+        self.frames += 1
+        self.frame_times.append(time.perf_counter() - start)
+    
+    def latency(self):
+        """Задержка кадров: (последняя, средняя, максимальная) в секундах"""
+        if not self.frame_times:
+            return 0.0, 0.0, 0.0
+        times = self.frame_times
+        return times[-1], sum(times) / len(times), max(times)
+
+
+class NanoView:
+    """Экран и ввод редактора nano
+
+    В терминале — посимвольный ввод через termios и инкрементальная
+    перерисовка на альтернативном экране; без терминала (конвейер, скрипт)
+    — построчный ввод через input() и вывод кадров целиком.
+    """
+    
+    HEADER = "Команды: Ctrl+S - Сохранить, Ctrl+X - Выход, Ctrl+G - Помощь"
+    # Клавиши, которые действуют сразу, без Enter (при пустой строке ввода)
+    SHORTCUTS = {'\x13': '\x13', '\x18': '\x18', '\x07': '\x07',
+                 'up': 'k', 'down': 'j', 'home': 'g', 'end': 'G',
+                 'pgup': 'pgup', 'pgdn': 'pgdn'}
+    
+    def __init__(self, filename, buffer):
+        self.filename = filename
+        self.buffer = buffer
+        self.line = 0
+        self.message = ''
+        self.last_search = None
+        self.raw = termios is not None and sys.stdin.isatty() and sys.stdout.isatty()
+        self.screen = Screen(ansi=self.raw)
+        self.keys = RawInput() if self.raw else None
+        self.key_time = None
+    
+    def __enter__(self):
+        if self.raw:
+            self.keys.__enter__()
+            self.screen.enter()
+        return self
+    
+    def __exit__(self, *exc):
+        if self.raw:
+            self.screen.leave()
+            self.keys.__exit__(*exc)
+    
+    def page(self):
+        """Сколько строк файла помещается на экран"""
+        return max(self.screen.size()[1] - 7, 1) if self.raw else 15
+    
+    def frame(self, prompt=''):
+        lines = [f"DOYARKA NANO - {self.filename}", self.HEADER, "─" * 50]
+        page = self.page()
+        start = max(0, self.line - page // 3)
+        i = start
+        while i < start + page and self.buffer.has_line(i):
+            marker = ">" if i == self.line else " "
+            lines.append(f"{marker} {i+1:3d}: {self.buffer.get_line(i)}")
+            i += 1
+        if self.raw:
+            lines.extend([''] * (start + page - i))
+        lines.append("─" * 50)
+        total, exact = self.buffer.known_line_count()
+        status = f"Строка {self.line + 1}/{total}{'' if exact else '+'}"
+        if self.raw and self.screen.frames:
+            status += f"    кадр {self.screen.latency()[0] * 1000:.2f} мс"
+        lines.append(status)
+        if self.raw:
+            lines.extend([self.message, prompt])
+        return lines
+    
+    def show(self, prompt=''):
+        lines = self.frame(prompt)
+        cursor = (len(lines) - 1, len(prompt)) if self.raw else None
+        self.screen.render(lines, cursor, since=self.key_time)
+    
+    def read_key(self):
+        key = self.keys.read_key()
+        self.key_time = time.perf_counter()
+        return key
+    
+    def ask(self, prompt, shortcuts=None):
+        """Прочитать строку ввода; Ctrl+C — KeyboardInterrupt"""
+        if not self.raw:
+            return input(prompt)
+        text = ''
+        while True:
+            self.show(prompt + text)
+            key = self.read_key()
+            if shortcuts and not text and key in shortcuts:
+                self.message = ''
+                return shortcuts[key]
+            if key in ('\r', '\n'):
+                self.message = ''
+                return text
+            if key == '\x03':
+                raise KeyboardInterrupt
+            if key in ('\x7f', '\x08'):
+                text = text[:-1]
+            elif key == '\x15':  # Ctrl+U
+                text = ''
+            elif len(key) == 1 and key.isprintable():
+                text += key
+    
+    def command(self):
+        """Команда или текст для текущей строки (в терминале — с горячими клавишами)"""
+        if not self.raw:
+            self.show()
+        return self.ask("Введите текст или команду: ", self.SHORTCUTS)
+    
+    def notify(self, text):
+        """Показать сообщение (без терминала — с ожиданием Enter)"""
+        if self.raw:
+            self.message = text
+        else:
+            print(text)
+            input("Нажмите Enter для продолжения...")
+    
+    def show_text(self, text):
+        """Показать текст во весь экран до нажатия клавиши"""
+        if not self.raw:
+            print(text)
+            input("Нажмите Enter для продолжения...")
+            return
+        self.screen.render(text.strip('\n').split('\n') + ['', "Нажмите любую клавишу..."])
+        self.read_key()
+
+
+class DoyarkaTerminal:
+    def __init__(self, interactive=True):
+        self.current_dir = os.getcwd()
+        self.username = "doyarka"
+        self.hostname = "terminal"
+        self.running = True
+        self.interactive = interactive
+        # Код завершения последней команды (для пакетного режима и exit)
+        self.status = 0
+        # Можно ли менять рабочий каталог процесса (нельзя в сеансах сервера)
+        self.owns_cwd = True
+        # Фоновые задания: номер -> Job
+        self.jobs = {}
+        self.job_counter = 0
+        self.job_executor = None
+        
+        # Настройка истории команд: в файл пишет только интерактивный сеанс
+        self.history_file = os.path.join(os.path.expanduser('~'), '.doyarka_history')
+        self.history = HistoryStore(self.history_file if interactive else None)
+        self.locate_db = os.path.join(os.path.expanduser('~'), '.doyarka_locate.db')
+        self.du_cache = os.path.join(os.path.expanduser('~'), '.doyarka_du.cache')
+        self.treehash_cache = os.path.join(os.path.expanduser('~'), '.doyarka_treehash.cache')
+    
+    def load_history(self):
+        """Загрузка истории в readline — для стрелок и Ctrl+R в приглашении"""
+        try:
+            if os.path.exists(self.history_file):
+                load_readline().read_history_file(self.history_file)
+        except Exception:
+            pass
+    
+    def trim_readline_history(self):
+        """Не давать истории readline расти сверх лимита в долгих сеансах"""
+        try:
+            while readline.get_current_history_length() > self.history.limit:
+                readline.remove_history_item(0)
+        except AttributeError:
+            pass
+    
+    def display_prompt(self):
+        """Отображение приглашения командной строки"""
+        path = self.current_dir
+        home = os.path.expanduser('~')
+        if path.startswith(home):
+            path = "~" + path[len(home):]
+            
+        return f"\033[92m{self.username}@{self.hostname}\033[0m:\033[94m{path}\033[0m$ "
+    
+    def run_command(self, command):
+        """Обработка и выполнение команд"""
+        if not command.strip():
+            return
+            
+        # Добавляем команду в историю (сразу дописывается в файл)
+        self.history.append(command)
+        
+        try:
+            parts = split_command(command)
+            background = bool(parts) and is_operator(parts[-1]) and parts[-1] == '&'
+            if background:
+                parts = parts[:-1]
+            pipeline = None
+            # time/profile применяются ко всей строке, включая конвейер
+            prefixed = parts[:1] in (['time'], ['profile']) and not background
+            if not prefixed and (background or any(is_operator(part) for part in parts)):
+                pipeline = parse_pipeline(parts)
+        except ValueError as e:
+            print(f"Ошибка синтаксиса: {e}")
+            self.status = 2
+            return
+        if not parts:
+            return
+        
+        try:
+            if background:
+                self.start_job(command.rstrip().rstrip('&').rstrip(), *pipeline)
+                self.status = 0
+            elif pipeline is not None:
+                self.status = self.run_pipeline(*pipeline)
+            else:
+                self.status = self.execute(parts)
+        except Exception as e:
+            print(f"Ошибка: {e}")
+            self.status = 1
+    
+    def execute(self, parts):
+        """Выполнить простую команду: встроенную (по таблице commands) или системную
+
+        Возвращает код завершения: у системной — её returncode, у встроенной —
+        возвращённое ею число, иначе 1, если она сообщила об ошибке через
+        report_error, и 0.
+        """
+        handler = self.commands.get(parts[0])
+        if COMMAND_STATS.enabled:
+            return self.execute_timed(handler, parts)
+        return self.call_handler(handler, parts)
+    
+    def call_handler(self, handler, parts):
+        if handler is None:
+            return self.execute_system_command(parts)
+        # отметка внешней команды (time, profile) восстанавливается после вложенной
+        outer = getattr(BUILTIN_STATUS, 'failed', False)
+        BUILTIN_STATUS.failed = False
+        try:
+            result = handler(self, parts[1:])
+            failed = BUILTIN_STATUS.failed
+        finally:
+            BUILTIN_STATUS.failed = outer
+        if isinstance(result, int) and not isinstance(result, bool):
+            return result
+        return 1 if failed else 0
+    
+    def execute_timed(self, handler, parts):
+        """execute с записью времени в COMMAND_STATS"""
+        started = time.perf_counter()
+        try:
+            return self.call_handler(handler, parts)
+        finally:
+            COMMAND_STATS.record(parts[0], handler is not None, time.perf_counter() - started)
+    
+    def run_parts(self, parts):
+        """Выполнить уже разбитую строку: простую команду или конвейер; вернуть код завершения"""
+        if not any(is_operator(part) for part in parts):
+            return self.execute(parts)
+        try:
+            pipeline = parse_pipeline(parts)
+        except ValueError as e:
+            print(f"Ошибка синтаксиса: {e}")
+            return 2
+        return self.run_pipeline(*pipeline)
+    
+    def time_command(self, args):
+        """Реализация time: реальное время, время CPU и пиковый RSS команды"""
+        if not args:
+            report_error("Использование: time <команда>")
+            return
+        try:
+            import resource
+        except ImportError:
+            resource = None
+        
+        def usage():
+            if resource is None:
+                return None
+            return (resource.getrusage(resource.RUSAGE_SELF),
+                    resource.getrusage(resource.RUSAGE_CHILDREN))
+        
+        before_times, before_usage = os.times(), usage()
+        started = time.perf_counter()
+        try:
+            status = self.run_parts(args)
+        finally:
+            elapsed = time.perf_counter() - started
+            after_times, after_usage = os.times(), usage()
+            user = (after_times.user - before_times.user
+                    + after_times.children_user - before_times.children_user)
+            system = (after_times.system - before_times.system
+                      + after_times.children_system - before_times.children_system)
+            lines = [f"\nреальное  {elapsed:.3f} с",
+                     f"польз.    {user:.3f} с",
+                     f"сист.     {system:.3f} с"]
+            if after_usage is not None:
+                # ru_maxrss: КБ в Linux, байты в macOS
+                scale = 1 if sys.platform == 'darwin' else 1024
+                own = after_usage[0].ru_maxrss * scale
+                grown = (after_usage[0].ru_maxrss - before_usage[0].ru_maxrss) * scale
+                lines.append(f"пик RSS   {human_size(own)} (+{human_size(grown)})")
+                # у дочерних ru_maxrss — максимум за всё время; показываем, только если вырос
+                if after_usage[1].ru_maxrss > before_usage[1].ru_maxrss:
+                    lines.append(f"пик RSS дочерних  {human_size(after_usage[1].ru_maxrss * scale)}")
+            print('\n'.join(lines))
+        return status
+    
+    def show_stats(self, args):
+        """Реализация stats [on|off|reset]: вызовы и задержки команд"""
+        if args in (['on'], ['off']):
+            COMMAND_STATS.enabled = args[0] == 'on'
+            print(f"stats: сбор {'включён' if COMMAND_STATS.enabled else 'выключен'}")
+            return
+        if args == ['reset']:
+            COMMAND_STATS.reset()
+            return
+        if args:
+            report_error("Использование: stats [on|off|reset]")
+            return
+        rows = COMMAND_STATS.rows()
+        if not COMMAND_STATS.enabled:
+            print("stats: сбор выключен (stats on — включить)")
+        if not rows:
+            return
+        lines = [f"{'команда':<14} {'вызовов':>8} {'всего, мс':>11} {'p50, мс':>9} "
+                 f"{'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}"]
+        for name, builtin, count, total, p50, p95, p99, peak in rows:
+            label = name if builtin else name + '*'
+            lines.append(f"{label[:14]:<14} {count:>8} {total * 1000:>11.2f} {p50 * 1000:>9.3f} "
+                         f"{p95 * 1000:>9.3f} {p99 * 1000:>9.3f} {peak * 1000:>9.3f}")
+        lines.append("* — внешняя команда; перцентили по последним 1024 вызовам")
+        print('\n'.join(lines))
+    
+    def profile_command(self, args):
+        """Реализация profile [-m] [-n N] <команда>: cProfile или tracemalloc"""
+        memory = False
+        limit = 20
+        while args and args[0] in ('-m', '-n'):
+            if args[0] == '-m':
+                memory = True
+                args = args[1:]
+                continue
+            try:
+                limit = int(args[1])
+            except (IndexError, ValueError):
+                report_error("profile: -n: требуется число")
+                return
+            args = args[2:]
+        if not args:
+            report_error("Использование: profile [-m] [-n N] <команда>")
+            return
+        if memory:
+            return self.profile_memory(args, limit)
+        return self.profile_cpu(args, limit)
+    
+    def profile_cpu(self, args, limit):
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            report_error(f"profile: {e}")
+            return
+        try:
+            status = self.run_parts(args)
+        finally:
+            profiler.disable()
+            print("\nprofile: горячие точки (только поток команды; стадии конвейера "
+                  "и дочерние процессы не учитываются)")
+            stats = pstats.Stats(profiler, stream=sys.stdout)
+            stats.sort_stats('cumulative').print_stats(limit)
+        return status
+    
+    def profile_memory(self, args, limit):
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            report_error("profile: tracemalloc уже запущен")
+            return
+        tracemalloc.start()
+        try:
+            status = self.run_parts(args)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            lines = [f"\nprofile: выделено сейчас {human_size(current)}, пик {human_size(peak)}",
+                     f"{'размер':>10} {'блоков':>8}  место"]
+            for stat_line in snapshot.statistics('lineno')[:limit]:
+                frame = stat_line.traceback[0]
+                lines.append(f"{human_size(stat_line.size):>10} {stat_line.count:>8}  "
+                             f"{frame.filename}:{frame.lineno}")
+            print('\n'.join(lines))
+        return status
+    
+    def exit_terminal(self, args):
+        """Реализация команды exit [N]: код выхода N, по умолчанию — последней команды"""
+        self.running = False
+        if args:
+            try:
+                return int(args[0]) & 0xff
+            except ValueError:
+                report_error(f"exit: {args[0]}: требуется числовой аргумент")
+                return 2
+        return self.status
+    
+    def print_working_directory(self, args):
+        """Реализация команды pwd"""
+        print(self.current_dir)
+    
+    def clear_screen(self, args):
+        """Реализация команды clear (ANSI, без запуска внешней программы)"""
+        Screen().clear(scrollback=True)
+    
+    def show_username(self, args):
+        """Реализация команды whoami"""
+        print(self.username)
+    
+    def neofetch(self, args=None):
+        """Реализация neofetch - отображение системной информации (из общего ProcSampler)"""
+        info = SYSTEM_SAMPLER.static()
+        system_info = {
+            "OS": info['system'],
+            "Hostname": info['node'],
+            "Kernel": info['release'],
+            "Uptime": self.get_uptime(),
+            "Shell": os.path.basename(os.getenv('SHELL', 'doyarka-terminal')),
+            "CPU": self.get_cpu_info(),
+            "Memory": self.get_memory_info(),
+            "Terminal": "DoyarkaTerminal",
+            "User": self.username
+        }
+        # ASCII арт логотип
+        logo = [
+            "╔═══════════════════╗",
+            "║    DOYARKA OS     ║",
+            "║    ██████╗ ██████╗║",
+            "║   ██╔═══██╗╚════██║║",
+            "║   ██║   ██║ █████╔╝║",
+            "║   ██║   ██║██╔═══╝ ║",
+            "║   ╚██████╔╝███████╗║",
+            "║    ╚═════╝ ╚══════╝║",
+            "╚═══════════════════╝"
+        ]
+        
+        # Вывод информации в стиле neofetch
+        print("\033[1;36m")  # Голубой цвет
+        for i, line in enumerate(logo):
+            if i < len(logo):
+                info_line = ""
+                if i == 1:
+                    info_line = f"OS: {system_info['OS']}"
+                elif i == 2:
+                    info_line = f"Host: {system_info['Hostname']}"
+                elif i == 3:
+                    info_line = f"Kernel: {system_info['Kernel']}"
+                elif i == 4:
+                    info_line = f"Uptime: {system_info['Uptime']}"
+                elif i == 5:
+                    info_line = f"Shell: {system_info['Shell']}"
+                elif i == 6:
+                    info_line = f"CPU: {system_info['CPU']}"
+                elif i == 7:
+                    info_line = f"Memory: {system_info['Memory']}"
+                elif i == 8:
+                    info_line = f"User: {system_info['User']}"
+                
+                print(f"{line}    \033[0m{info_line}")
+        
+        print("\033[0m")  # Сброс цвета
+    
+    def get_uptime(self):
+        """Получить время работы системы"""
+        snapshot = SYSTEM_SAMPLER.sample()
+        if snapshot is None:
+            return "N/A"
+        hours = int(snapshot['uptime'] // 3600)
+        minutes = int((snapshot['uptime'] % 3600) // 60)
+        return f"{hours}h {minutes}m"
+    
+    def get_cpu_info(self):
+        """Получить информацию о CPU"""
+        return SYSTEM_SAMPLER.static()['cpu_model']
+    
+    def get_memory_info(self):
+        """Получить информацию о памяти"""
+        snapshot = SYSTEM_SAMPLER.sample()
+        if snapshot is None or not snapshot['mem_total']:
+            return "Unknown"
+        return f"{snapshot['mem_total'] / 1024 ** 3:.1f} GB"
+    
+    def top_command(self, args):
+        """Реализация top/monitor [-d секунды] [-n кадров] [-b]: загрузка системы и процессы"""
+        usage = "Использование: top [-d секунды] [-n кадров] [-b]"
+        interval = 1.0
+        frames = None
+        batch = False
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '-b':
+                batch = True
+                continue
+            if arg not in ('-d', '-n'):
+                report_error(f"top: неверный аргумент '{arg}'")
+                print(usage)
+                return
+            try:
+                value = float(args.pop(0)) if arg == '-d' else int(args.pop(0))
+                if value <= 0:
+                    raise ValueError
+            except (IndexError, ValueError):
+                report_error(f"top: {arg}: требуется положительное число")
+                return
+            if arg == '-d':
+                interval = value
+            else:
+                frames = value
+        if SYSTEM_SAMPLER.sample(processes=True, max_age=0) is None:
+            report_error("top: нет /proc — поддерживается только Linux")
+            return
+        
+        raw = termios is not None and not batch and sys.stdin.isatty() and sys.stdout.isatty()
+        if frames is None and not raw:
+            # без терминала (конвейер, скрипт, сервер) — один кадр, если не задан -n
+            frames = 1
+        screen = Screen(ansi=raw)
+        keys = RawInput() if raw else None
+        if raw:
+            keys.__enter__()
+            screen.enter()
+        try:
+            # первый кадр — вскоре после опорного снимка, дальше — с заданным интервалом
+            delay = min(interval, 0.25)
+            shown = 0
+            while frames is None or shown < frames:
+                if raw:
+                    if keys.fill(delay) and keys.read_key() in ('q', 'Q', '\x03', 'esc'):
+                        break
+                else:
+                    time.sleep(delay)
+                delay = interval
+                snapshot = SYSTEM_SAMPLER.sample(processes=True, max_age=0)
+                if snapshot is None:
+                    break
+                lines = self.top_lines(snapshot, screen.size()[1] if raw else 20)
+                if raw:
+                    lines.append("q — выход")
+                elif shown:
+                    lines.insert(0, '')
+                screen.render(lines)
+                shown += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if raw:
+                screen.leave()
+                keys.__exit__(None, None, None)
+    
+    def top_lines(self, snapshot, height):
+        """Кадр top: сводка и процессы по убыванию %CPU, не выше height строк"""
+        info = SYSTEM_SAMPLER.static()
+        uptime = int(snapshot['uptime'])
+        procs = snapshot['processes']
+        states = {}
+        for proc in procs:
+            states[proc[2]] = states.get(proc[2], 0) + 1
+        used = snapshot['mem_total'] - snapshot['mem_available']
+        swap_used = snapshot['swap_total'] - snapshot['swap_free']
+        waiting = f", в ожидании I/O {states['D']}" if states.get('D') else ''
+        lines = [
+            f"top - {time.strftime('%H:%M:%S')}, работает {uptime // 86400}д "
+            f"{uptime % 86400 // 3600}ч {uptime % 3600 // 60}м, "
+            f"нагрузка: {' '.join(f'{x:.2f}' for x in snapshot['load'])}",
+            f"Процессов: {len(procs)} (выполняются {states.get('R', 0)}, спят {states.get('S', 0)}{waiting})",
+            f"CPU: {snapshot['cpu']:5.1f}% ({info['cpus']} ядер)",
+            f"Память: {human_size(used)} из {human_size(snapshot['mem_total'])}, "
+            f"подкачка: {human_size(swap_used)} из {human_size(snapshot['swap_total'])}",
+            "",
+            f"{'PID':>7} S {'%CPU':>6} {'RSS':>7}  КОМАНДА",
+        ]
+        room = max(height - len(lines) - 1, 0)
+        top = sorted(procs, key=lambda p: (p[3], p[4]), reverse=True)[:room]
+        lines.extend(f"{pid:>7} {state} {cpu:>6.1f} {human_size(rss):>7}  {name}"
+                     for pid, name, state, cpu, rss in top)
+        return lines
+    
+    def nano_editor(self, args):
+        """Простой текстовый редактор в стиле nano (буфер — таблица кусков поверх mmap)"""
+        if not args:
+            report_error("nano: отсутствует операнд")
+            report_error("Использование: nano <filename>")
+            return
+        
+        filename = args[0]
+        filepath = os.path.join(self.current_dir, filename)
+        
+        # Проверяем, существует ли файл
+        if not os.path.exists(filepath):
+            # Создаем новый файл
+            try:
+                open(filepath, 'w').close()
+            except OSError:
+                report_error(f"Ошибка: невозможно создать файл {filename}")
+                return
+        try:
+            buffer = PieceTable(filepath)
+        except OSError:
+            report_error(f"Ошибка: невозможно прочитать файл {filename}")
+            return
+        
+        try:
+            self.nano_loop(filename, filepath, buffer)
+        finally:
+            buffer.close()
+    
+    def nano_regex(self, view, pattern):
+        """Скомпилировать шаблон поиска в регулярное выражение над байтами"""
+        try:
+            return re.compile(pattern.encode('utf-8'), re.MULTILINE)
+        except re.error as e:
+            view.notify(f"Неверное регулярное выражение: {e}")
+            return None
+    
+    def nano_save(self, view, filepath):
+        """Сохранить буфер редактора (атомарно)"""
+        try:
+            view.buffer.save(filepath)
+            return f"Сохранено: {view.filename}"
+        except Exception as e:
+            return f"Ошибка сохранения: {e}"
+    
+    def nano_loop(self, filename, filepath, buffer):
+        """Основной цикл редактора"""
+        with NanoView(filename, buffer) as view:
+            while True:
+                try:
+                    user_input = view.command()
+                except KeyboardInterrupt:
+                    # Обработка Ctrl+C как выхода с подтверждением
+                    try:
+                        confirm = view.ask("Выйти без сохранения? (y/N): ")
+                    except KeyboardInterrupt:
+                        continue
+                    if confirm.lower() == 'y':
+                        return
+                    continue
+                
+                try:
+                    if self.nano_action(view, filepath, user_input):
+                        return
+                except KeyboardInterrupt:
+                    continue
+    
+    def nano_action(self, view, filepath, user_input):
+        """Выполнить команду редактора; True — выход"""
+        buffer = view.buffer
+        
+        # Обработка специальных команд
+        if user_input == '\x18':  # Ctrl+X
+            confirm = view.ask("Сохранить изменения? (Y/n): ")
+            if confirm.lower() != 'n':
+                message = self.nano_save(view, filepath)
+                if not view.raw:
+                    print(message)
+            return True
+        
+        elif user_input == '\x13':  # Ctrl+S
+            view.notify(self.nano_save(view, filepath))
+        
+        elif user_input == '\x07':  # Ctrl+G
+            self.show_nano_help(view)
+        
+        elif user_input[:1] in ('/', '?'):  # Поиск (регулярное выражение)
+            pattern = user_input[1:] or view.last_search
+            if not pattern:
+                view.notify("Нет предыдущего поиска")
+                return False
+            regex = self.nano_regex(view, pattern)
+            if regex is None:
+                return False
+            view.last_search = pattern
+            backward = user_input[0] == '?'
+            found = buffer.find(regex, view.line, backward)
+            if found is None:
+                view.notify(f"Текст '{pattern}' не найден")
+            else:
+                view.line, wrapped = found
+                if wrapped:
+                    view.message = "Поиск продолжен с " + ("конца" if backward else "начала") + " файла"
+        
+        elif user_input.startswith(':s') and len(user_input) > 2:  # Замена во всём файле
+            parts = user_input[3:].split(user_input[2])
+            if len(parts) < 2 or not parts[0]:
+                view.notify("Использование: :s/шаблон/замена/")
+                return False
+            regex = self.nano_regex(view, parts[0])
+            if regex is None:
+                return False
+            try:
+                count = buffer.replace_all(regex, parts[1].encode('utf-8'))
+            except re.error as e:
+                view.notify(f"Неверная замена: {e}")
+                return False
+            view.last_search = parts[0]
+            view.notify(f"Замен: {count}")
+        
+        # Навигация
+        elif user_input == 'j':
+            if buffer.has_line(view.line + 1):
+                view.line += 1
+        elif user_input == 'k':
+            if view.line > 0:
+                view.line -= 1
+        elif user_input == 'g':
+            view.line = 0
+        elif user_input == 'G':
+            view.line = buffer.line_count() - 1
+        elif user_input == 'pgdn':
+            target = view.line + view.page()
+            while target > view.line and not buffer.has_line(target):
+                target -= 1
+            view.line = target
+        elif user_input == 'pgup':
+            view.line = max(0, view.line - view.page())
+        
+        # Редактирование
+        elif user_input == 'i':  # Вставка
+            new_text = view.ask("Введите текст: ")
+            buffer.set_line(view.line, new_text)
+        elif user_input == 'a':  # Добавление в конец
+            append_text = view.ask("Добавить текст: ")
+            buffer.set_line(view.line, buffer.get_line(view.line) + append_text)
+        elif user_input == 'o':  # Новая строка после
+            new_line = view.ask("Новая строка: ")
+            buffer.insert_line(view.line + 1, new_line)
+            view.line += 1
+        elif user_input == 'O':  # Новая строка перед
+            new_line = view.ask("Новая строка: ")
+            buffer.insert_line(view.line, new_line)
+            view.line += 1
+        elif user_input == 'd':  # Удалить строку
+            if buffer.has_line(1):
+                buffer.delete_line(view.line)
+                if not buffer.has_line(view.line):
+                    view.line -= 1
+            else:
+                buffer.set_line(view.line, "")
+        else:
+            # Если введен обычный текст, заменяем текущую строку
+            buffer.set_line(view.line, user_input)
+        return False
+    
+    def show_nano_help(self, view=None):
+        """Показать справку по nano"""
+        help_text = """
+┌───────────────── НАНО РЕДАКТОР ─────────────────┐
+│                 Основные команды:               │
+│                                                 │
+│  Ctrl+S    - Сохранить файл                     │
+│  Ctrl+X    - Выйти из редактора                 │
+│  Ctrl+G    - Показать эту справку               │
+│                                                 │
+│  i         - Редактировать текущую строку       │
+│  a         - Добавить текст в конец строки      │
+│  o         - Вставить строку после текущей      │
+│  O         - Вставить строку перед текущей      │
+│  d         - Удалить текущую строку             │
+│                                                 │
+│  j         - Перейти на строку вниз             │
+│  k         - Перейти на строку вверх            │
+│  g         - Перейти к первой строке            │
+│  G         - Перейти к последней строке         │
+│  ↑ ↓ Home End PgUp PgDn - то же в терминале     │
+│                                                 │
+│  /шаблон   - Поиск вперёд (регулярное выражение)│
+│  ?шаблон   - Поиск назад                        │
+│  / или ?   - Повторить последний поиск          │
+│  :s/а/б/   - Заменить а на б во всём файле      │
+│                                                 │
+│  Enter     - Подтвердить ввод                   │
+│  Ctrl+C    - Отмена/Выход                       │
+└─────────────────────────────────────────────────┘
+"""
+        if view is not None:
+            view.show_text(help_text)
+        else:
+            print(help_text)
+    
+    def list_files(self, args):
+        """Реализация команды ls (один stat на запись, вывод одним блоком)"""
+        flags, path_args = split_options(args)
+        unknown = flags - set('laSthr')
+        if unknown:
+            report_error(f"ls: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        long_format = 'l' in flags
+        show_all = 'a' in flags
+        by_size = 'S' in flags
+        by_time = 't' in flags
+        need_stat = long_format or by_size or by_time
+        
+        name = path_args[0] if path_args else '.'
+        path = os.path.join(self.current_dir, name)
+        
+        rows = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if not show_all and entry.name.startswith('.'):
+                        continue
+                    try:
+                        # Как GNU ls: символическая ссылка описывается сама, а не её цель
+                        st = entry.stat(follow_symlinks=False) if need_stat else None
+                        rows.append((entry.name, entry, st))
+                    except OSError:
+                        rows.append((entry.name, entry, None))
+        except (NotADirectoryError, FileNotFoundError) as e:
+            # Файл или ссылка (в том числе битая) выводится как одна запись
+            entry = PathEntry(path)
+            try:
+                rows.append((name, entry, entry.stat()))
+            except OSError:
+                if not isinstance(e, FileNotFoundError):
+                    raise
+                report_error(f"ls: невозможно получить доступ к '{name}': Нет такого файла или каталога")
+                return
+        except PermissionError:
+            report_error(f"ls: невозможно открыть каталог '{name}': Отказано в доступе")
+            return
+        
+        rows.sort(key=lambda row: row[0])
+        if by_size:
+            rows.sort(key=lambda row: row[2].st_size if row[2] else 0, reverse=True)
+        elif by_time:
+            rows.sort(key=lambda row: row[2].st_mtime if row[2] else 0, reverse=True)
+        if 'r' in flags:
+            rows.reverse()
+        
+        lines = []
+        if long_format:
+            human = 'h' in flags
+            mtimes = {}
+            for file, entry, st in rows:
+                if st is None:
+                    lines.append(f"?????????? {'?':>8} {'?':16} {file}")
+                    continue
+                minute = int(st.st_mtime // 60)
+                mtime = mtimes.get(minute)
+                if mtime is None:
+                    mtime = mtimes[minute] = time.strftime('%Y-%m-%d %H:%M', time.localtime(minute * 60))
+                size = human_size(st.st_size) if human else st.st_size
+                if stat.S_ISLNK(st.st_mode):
+                    try:
+                        file = f"{file} -> {os.readlink(entry.path)}"
+                    except OSError:
+                        pass
+                lines.append(f"{permission_string(st.st_mode)} {size:>8} {mtime} {file}")
+        elif not sys.stdout.isatty():
+            # В канал или файл — только имена, без цвета и лишних stat
+            lines = [file for file, entry, st in rows]
+        else:
+            for file, entry, st in rows:
+                try:
+                    if entry.is_symlink():
+                        lines.append(f"\033[96m{file}\033[0m")
+                        continue
+                    if entry.is_dir():
+                        lines.append(f"\033[94m{file}/\033[0m")
+                        continue
+                    if st is None:
+                        st = entry.stat()
+                    if st.st_mode & 0o111:
+                        lines.append(f"\033[92m{file}\033[0m")
+                    else:
+                        lines.append(file)
+                except OSError:
+                    lines.append(file)
+        
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+    
+    def get_permissions(self, path):
+        """Получить строку прав доступа в UNIX-стиле"""
+        try:
+            return permission_string(os.stat(path).st_mode)
+        except OSError:
+            return '??????????'
+    
+    def change_directory(self, args):
+        """Реализация команды cd"""
+        if not args:
+            new_dir = os.path.expanduser('~')
+        else:
+            new_dir = args[0]
+            
+        if new_dir == "~":
+            new_dir = os.path.expanduser('~')
+        elif new_dir.startswith("~/"):
+            new_dir = os.path.expanduser('~') + new_dir[1:]
+        else:
+            new_dir = os.path.join(self.current_dir, new_dir)
+            
+        name = args[0] if args else new_dir
+        try:
+            if self.owns_cwd:
+                os.chdir(new_dir)
+                self.current_dir = os.getcwd()
+            else:
+                # Сеанс сервера делит процесс с другими: меняем только свой current_dir
+                if not os.path.exists(new_dir):
+                    raise FileNotFoundError(new_dir)
+                if not os.path.isdir(new_dir):
+                    raise NotADirectoryError(new_dir)
+                if not os.access(new_dir, os.X_OK):
+                    raise PermissionError(new_dir)
+                self.current_dir = os.path.realpath(new_dir)
+        except FileNotFoundError:
+            report_error(f"cd: {name}: Нет такого файла или каталога")
+        except NotADirectoryError:
+            report_error(f"cd: {name}: Это не каталог")
+        except PermissionError:
+            report_error(f"cd: {name}: Отказано в доступе")
+    
+    def cat_file(self, args):
+        """Реализация команды cat"""
+        flags, files = split_options(args)
+        if not files:
+            if sys.stdin.isatty():
+                report_error("cat: отсутствует операнд")
+                return
+            files = ['-']
+        
+        unknown = flags - set('nA')
+        if unknown:
+            report_error(f"cat: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        
+        number = 'n' in flags
+        show_all = 'A' in flags
+        state = {'line': 1, 'line_start': True}
+        out = binary_stdout()
+        
+        for name in files:
+            try:
+                if name == '-':
+                    f = open(sys.stdin.fileno(), 'rb', closefd=False)
+                else:
+                    f = open(os.path.join(self.current_dir, name), 'rb')
+                with f:
+                    if number or show_all:
+                        for block in self.cat_format(f, number, show_all, state):
+                            out.write(block)
+                        out.flush()
+                    else:
+                        copy_stream(f, out)
+            except FileNotFoundError:
+                report_error(f"cat: {name}: Нет такого файла или каталога")
+            except IsADirectoryError:
+                report_error(f"cat: {name}: Это каталог")
+            except PermissionError:
+                report_error(f"cat: {name}: Отказано в доступе")
+    
+    def cat_format(self, f, number, show_all, state):
+        """Потоковое форматирование для cat -n/-A (состояние общее для всех файлов)"""
+        newline = b'$\n' if show_all else b'\n'
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            if show_all:
+                chunk = CAT_VISIBLE_RE.sub(lambda m: CAT_VISIBLE[m.group()], chunk)
+            if not number:
+                yield chunk.replace(b'\n', newline) if show_all else chunk
+                continue
+            
+            parts = chunk.split(b'\n')
+            out = []
+            last = len(parts) - 1
+            for i, part in enumerate(parts):
+                if i == last and not part:
+                    break
+                if state['line_start']:
+                    out.append(b'%6d\t' % state['line'])
+                    state['line'] += 1
+                out.append(part)
+                if i == last:
+                    state['line_start'] = False
+                else:
+                    out.append(newline)
+                    state['line_start'] = True
+            yield b''.join(out)
+    
+    def make_directory(self, args):
+        """Реализация команды mkdir"""
+        if not args:
+            report_error("mkdir: отсутствует операнд")
+            return
+            
+        try:
+            os.makedirs(os.path.join(self.current_dir, args[0]), exist_ok=True)
+        except PermissionError:
+            report_error(f"mkdir: невозможно создать каталог '{args[0]}': Отказано в доступе")
+    
+    def remove_file(self, args):
+        """Реализация команды rm (несколько целей, шаблоны, параллельное -r)"""
+        import glob
+        flags, file_args = split_options(args)
+        recursive = bool(flags & set('rR'))
+        force = 'f' in flags
+        verbose = 'v' in flags
+        
+        if not file_args:
+            report_error("rm: отсутствует операнд")
+            return
+        
+        targets = []
+        for name in file_args:
+            # Как в GNU rm: . и .. (в том числе foo/..) не удаляются никогда
+            if os.path.basename(name.rstrip(os.sep)) in ('.', '..'):
+                report_error(f"rm: отказ удалять '{name}': каталоги . и .. не удаляются")
+                continue
+            path = os.path.join(self.current_dir, name)
+            if any(c in name for c in '*?['):
+                # Метасимволы в имени текущего каталога — не часть шаблона
+                matches = sorted(glob.glob(os.path.join(glob.escape(self.current_dir), name)))
+                if matches:
+                    targets.extend((match, os.path.relpath(match, self.current_dir)) for match in matches)
+                    continue
+            targets.append((path, name))
+        
+        started = time.perf_counter()
+        files = dirs = 0
+        for path, name in targets:
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    if not recursive:
+                        report_error(f"rm: невозможно удалить '{name}': Это каталог")
+                        continue
+                    if os.path.abspath(path) in (os.sep, os.path.abspath(self.current_dir)):
+                        report_error(f"rm: отказ удалять '{name}'")
+                        continue
+                    f, d, errors = remove_tree(path)
+                    files += f
+                    dirs += d
+                    for error in errors[:10]:
+                        report_error(f"rm: невозможно удалить {error}")
+                    if len(errors) > 10:
+                        report_error(f"rm: ... и ещё {len(errors) - 10} ошибок")
+                else:
+                    os.remove(path)
+                    files += 1
+            except FileNotFoundError:
+                if not force:
+                    report_error(f"rm: невозможно удалить '{name}': Нет такого файла или каталога")
+            except OSError as e:
+                report_error(f"rm: невозможно удалить '{name}': {describe_error(e)}")
+        
+        if verbose:
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            print(f"rm: удалено файлов {files}, каталогов {dirs} за {elapsed:.2f} с "
+                  f"({(files + dirs) / elapsed:.0f} объектов/с)")
+    
+    def copy_file(self, args):
+        """Реализация команды cp (параллельное копирование в ядре с прогрессом)"""
+        import shutil
+        from concurrent.futures import ThreadPoolExecutor
+        flags, operands = split_options([a for a in args if a != '--resume'])
+        unknown = flags - set('rRnuv')
+        if unknown:
+            report_error(f"cp: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        if len(operands) < 2:
+            report_error("cp: отсутствует операнд")
+            return
+        
+        recursive = bool(flags & set('rR'))
+        policy = {f for f in 'nu' if f in flags}
+        if '--resume' in args:
+            policy.add('resume')
+        target = os.path.join(self.current_dir, operands[-1])
+        into_dir = os.path.isdir(target)
+        if len(operands) > 2 and not into_dir:
+            report_error(f"cp: целевой объект '{operands[-1]}' не является каталогом")
+            return
+        
+        dirs, files, links, errors = self.plan_copy(operands[:-1], target, into_dir, recursive)
+        for message in errors:
+            report_error(message)
+        
+        try:
+            for _, dst in dirs:
+                os.makedirs(dst, exist_ok=True)
+        except OSError as e:
+            report_error(f"cp: невозможно создать каталог: {describe_error(e)}")
+            return
+        for src, dst in links:
+            try:
+                if os.path.lexists(dst) and not policy:
+                    os.remove(dst)
+                if not os.path.lexists(dst):
+                    os.symlink(os.readlink(src), dst)
+            except OSError as e:
+                report_error(f"cp: невозможно создать ссылку '{dst}': {describe_error(e)}")
+        
+        total = sum(st.st_size for _, _, st in files)
+        progress = CopyProgress(total, len(files), sys.stderr.isatty())
+        try:
+            if len(files) == 1:
+                results = [copy_one(*files[0], policy, progress)]
+            else:
+                with ThreadPoolExecutor(COPY_WORKERS) as executor:
+                    results = list(executor.map(lambda f: copy_one(*f, policy, progress), files))
+        finally:
+            progress.close()
+        for message in filter(None, results):
+            report_error(message)
+        
+        # Время изменения каталогов — после того как в них появились файлы
+        for src, dst in reversed(dirs):
+            try:
+                shutil.copystat(src, dst)
+            except OSError:
+                pass
+        
+        if 'v' in flags:
+            elapsed = max(time.perf_counter() - progress.started, 1e-9)
+            copied = progress.done_bytes - progress.skipped_bytes
+            print(f"cp: файлов {progress.done_files - progress.skipped}, пропущено {progress.skipped}, "
+                  f"{human_size(copied)} за {elapsed:.2f} с ({human_size(int(copied / elapsed))}/с)")
+    
+    def plan_copy(self, sources, target, into_dir, recursive):
+        """Составить план копирования: каталоги, файлы (с stat), символические ссылки"""
+        dirs, files, links, errors = [], [], [], []
+        for name in sources:
+            src = os.path.join(self.current_dir, name)
+            dst = os.path.join(target, os.path.basename(src.rstrip(os.sep))) if into_dir else target
+            try:
+                st = os.lstat(src) if recursive else os.stat(src)
+            except OSError as e:
+                errors.append(f"cp: невозможно выполнить stat для '{name}': {describe_error(e)}")
+                continue
+            if same_file(src, dst):
+                errors.append(f"cp: '{name}' и '{os.path.relpath(dst, self.current_dir)}' — один и тот же файл")
+                continue
+            
+            if stat.S_ISLNK(st.st_mode):
+                links.append((src, dst))
+            elif not stat.S_ISDIR(st.st_mode):
+                files.append((src, dst, st))
+            elif not recursive:
+                errors.append(f"cp: не указан -r; пропускается каталог '{name}'")
+            elif os.path.realpath(dst).startswith(os.path.realpath(src) + os.sep):
+                errors.append(f"cp: невозможно скопировать каталог '{name}' в самого себя")
+            else:
+                stack = [(src, dst)]
+                while stack:
+                    src_dir, dst_dir = stack.pop()
+                    dirs.append((src_dir, dst_dir))
+                    try:
+                        with os.scandir(src_dir) as it:
+                            for entry in it:
+                                path = os.path.join(dst_dir, entry.name)
+                                if entry.is_symlink():
+                                    links.append((entry.path, path))
+                                elif entry.is_dir(follow_symlinks=False):
+                                    stack.append((entry.path, path))
+                                else:
+                                    files.append((entry.path, path, entry.stat(follow_symlinks=False)))
+                    except OSError as e:
+                        errors.append(f"cp: невозможно прочитать каталог '{src_dir}': {describe_error(e)}")
+        return dirs, files, links, errors
+    
+    def move_file(self, args):
+        """Реализация команды mv"""
+        import shutil
+        if len(args) < 2:
+            report_error("mv: отсутствует операнд")
+            return
+            
+        src = os.path.join(self.current_dir, args[0])
+        dst = os.path.join(self.current_dir, args[1])
+        
+        try:
+            shutil.move(src, dst)
+        except FileNotFoundError:
+            report_error(f"mv: невозможно выполнить stat для '{args[0]}': Нет такого файла или каталога")
+    
+    def touch_file(self, args):
+        """Реализация команды touch"""
+        if not args:
+            report_error("touch: отсутствует операнд")
+            return
+            
+        try:
+            with open(os.path.join(self.current_dir, args[0]), 'a'):
+                os.utime(os.path.join(self.current_dir, args[0]), None)
+        except PermissionError:
+            report_error(f"touch: невозможно создать файл '{args[0]}': Отказано в доступе")
+    
+    def echo_text(self, args):
+        """Реализация команды echo"""
+        print(' '.join(args))
+    
+    def show_history(self, args=None):
+        """Показать историю команд: history [N] | -s <шаблон> | --compact"""
+        args = args or []
+        if args[:1] == ['-s']:
+            if len(args) != 2:
+                report_error("Использование: history -s <шаблон>")
+                return
+            try:
+                regex = re.compile(args[1], re.MULTILINE)
+            except re.error as e:
+                report_error(f"history: неверный шаблон: {e}")
+                return
+            entries = self.history.search(regex)
+        elif args == ['--compact']:
+            if self.history.path is None:
+                report_error("history: история этого сеанса не сохраняется в файл")
+                return
+            try:
+                kept = self.history.compact()
+            except OSError as e:
+                report_error(f"history: {describe_error(e)}")
+                return
+            self.history.load()
+            print(f"history: в файле осталось команд: {kept}")
+            return
+        else:
+            try:
+                count = int(args[0]) if args else 20
+            except ValueError:
+                report_error(f"history: {args[0]}: требуется числовой аргумент")
+                return
+            entries = self.history.recent(count)
+        print(''.join(f"{i:5d}  {cmd}\n" for i, cmd in entries), end='')
+    
+    def find_files(self, args):
+        """Реализация команды find (параллельный обход на scandir)"""
+        paths = []
+        while len(paths) < len(args) and not args[len(paths)].startswith('-'):
+            paths.append(args[len(paths)])
+        tokens = args[len(paths):]
+        use_index = '-index' in tokens
+        if use_index:
+            tokens.remove('-index')
+        
+        try:
+            maxdepth = mindepth = None
+            for option in ('-maxdepth', '-mindepth'):
+                while option in tokens:
+                    i = tokens.index(option)
+                    if i + 1 >= len(tokens):
+                        raise ValueError(f"отсутствует аргумент для '{option}'")
+                    check_number(option, tokens[i + 1], signed=False)
+                    value = int(tokens[i + 1])
+                    if option == '-maxdepth':
+                        maxdepth = value
+                    else:
+                        mindepth = value
+                    del tokens[i:i + 2]
+            
+            # Идиома find: <условие> -prune -o <условие>
+            prune = None
+            if '-prune' in tokens:
+                i = tokens.index('-prune')
+                prune = find_predicates(tokens[:i])
+                tokens = tokens[i + 1:]
+                if tokens[:1] == ['-o']:
+                    tokens = tokens[1:]
+            predicates = find_predicates(tokens)
+        except ValueError as e:
+            report_error(f"find: {e}")
+            report_error("Использование: find [путь...] [-name|-iname шаблон] [-type f|d|l] "
+                         "[-size [+-]N[ckMG]] [-mtime [+-]N] [-maxdepth N] [<условие> -prune -o] [-index]")
+            return
         
-        # Настройка истории команд
-        self.history_file = os.path.join(Path.home(), '.doyarka_history')
-        self.load_history()
+        roots = [(os.path.join(self.current_dir, p), p) for p in paths or ['.']]
+        if use_index:
+            results = self.find_indexed(roots, predicates, prune, maxdepth, mindepth or 0)
+        else:
+            results = find_walk(roots, predicates, prune, maxdepth, mindepth or 0)
+        for path, error in results:
+            if error:
+                report_error(f"find: {error}")
+            else:
+                print(path)
     
-    def load_history(self):
-        """Загрузка истории команд из файла"""
+    def find_indexed(self, roots, predicates, prune, maxdepth, mindepth):
+        """find -index: кандидаты берутся из индекса locate вместо обхода диска"""
         try:
-            if os.path.exists(self.history_file):
-                readline.read_history_file(self.history_file)
-        except Exception:
-            # Резервное сохранение/загрузка истории
-            try:
-                if os.path.exists(self.history_file):
-                    with open(self.history_file, 'r', encoding='utf-8') as f:
-                        self.command_history = [line.strip() for line in f.readlines()]
-            except Exception:
-                pass
+            indexed_roots = locate_read_table(self.locate_db)['roots']
+        except (OSError, ValueError, EOFError):
+            yield None, "индекс не найден, выполните updatedb"
+            return
+        
+        for real, display in roots:
+            real = os.path.abspath(real)
+            if not any(path_within(real, root) for root in indexed_roots):
+                yield None, (f"'{display}': не покрыт индексом, выполните updatedb {display} "
+                             f"(каталог добавится к корням индекса)")
+                continue
+            prefix = real.rstrip(os.sep) + os.sep
+            pattern = re.compile(b'^' + re.escape(os.fsencode(real)) + b'(?:' +
+                                 re.escape(os.fsencode(os.sep)) + b'[^\n]*)?$', re.MULTILINE)
+            pruned = {}
+            for raw in locate_search(self.locate_db, pattern):
+                path = os.fsdecode(raw)
+                rel = path[len(prefix):] if path != real else ''
+                depth = rel.count(os.sep) + 1 if rel else 0
+                if maxdepth is not None and depth > maxdepth:
+                    continue
+                if prune is not None and self.find_index_pruned(prefix, rel, prune, pruned):
+                    continue
+                entry = PathEntry(path)
+                try:
+                    if depth >= mindepth and all(p(entry) for p in predicates):
+                        yield (display.rstrip(os.sep) + os.sep + rel if rel else display), None
+                except OSError:
+                    # Файл из индекса уже удалён с диска
+                    pass
     
-    def save_history(self):
-        """Сохранение истории команд в файл"""
-        try:
-            readline.write_history_file(self.history_file)
-        except Exception:
-            # Резервное сохранение истории
-            try:
-                with open(self.history_file, 'w', encoding='utf-8') as f:
-                    for cmd in self.command_history:
-                        f.write(cmd + '\n')
-            except Exception:
-                pass
+    def find_index_pruned(self, prefix, rel, prune, cache):
+        """Проверить, лежит ли путь внутри (или является) отсечённого каталога"""
+        parts = rel.split(os.sep) if rel else []
+        for i in range(1, len(parts) + 1):
+            sub = os.sep.join(parts[:i])
+            if sub not in cache:
+                try:
+                    cache[sub] = all(p(PathEntry(prefix + sub)) for p in prune)
+                except OSError:
+                    cache[sub] = False
+            if cache[sub]:
+                return True
+        return False
     
-    def display_prompt(self):
-        """Отображение приглашения командной строки"""
-        path = self.current_dir
-        home = str(Path.home())
-        if path.startswith(home):
-            path = "~" + path[len(home):]
-            
-        return f"\033[92m{self.username}@{self.hostname}\033[0m:\033[94m{path}\033[0m$ "
+    def update_locate_db(self, args):
+        """Реализация команды updatedb (инкрементальная перестройка индекса)
+
+        updatedb путь... добавляет пути к корням индекса и пересканирует только
+        их; -r заменяет корни заданными путями, -f перестраивает без кэша каталогов.
+        """
+        flags, paths = split_options(args)
+        if flags - {'f', 'r'}:
+            report_error(f"updatedb: неверный ключ -- '{sorted(flags - {'f', 'r'})[0]}'")
+            return
+        full = 'f' in flags
+        try:
+            table = locate_read_table(self.locate_db)
+        except (OSError, ValueError, EOFError):
+            table = {'roots': [], 'dirs': {}}
+            full = True
+        
+        if paths:
+            scan_roots = locate_merge_roots([os.path.abspath(os.path.join(self.current_dir, p))
+                                             for p in paths])
+            if 'r' in flags:
+                roots = scan_roots
+            else:
+                roots = locate_merge_roots(table['roots'] + scan_roots)
+        else:
+            roots = scan_roots = table['roots'] or [os.path.expanduser('~')]
+        
+        started = time.perf_counter()
+        dirs, rescanned = locate_update(scan_roots, {} if full else table['dirs'])
+        # Каталоги остальных корней остаются из прежнего индекса
+        for path, entry in table['dirs'].items():
+            if (path not in dirs and any(path_within(path, root) for root in roots)
+                    and not any(path_within(path, root) for root in scan_roots)):
+                dirs[path] = entry
+        count = locate_write(self.locate_db, roots, dirs)
+        elapsed = time.perf_counter() - started
+        print(f"updatedb: {count} путей, {len(dirs)} каталогов "
+              f"(пересканировано {rescanned}) за {elapsed:.2f} с")
     
-    def run_command(self, command):
-        """Обработка и выполнение команд"""
-        if not command.strip():
+    def disk_usage_command(self, args):
+        """Реализация du [-s] [-h] [-v] [--max-depth N] [-n N] [--cache] [путь...]"""
+        usage = "Использование: du [-s] [-h] [-v] [--max-depth N] [-n N] [--cache] [путь...]"
+        max_depth = top = None
+        use_cache = False
+        rest = []
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '--cache':
+                use_cache = True
+            elif arg in ('-d', '--max-depth', '-n') or arg.startswith('--max-depth='):
+                value = arg.split('=', 1)[1] if '=' in arg else (args.pop(0) if args else '')
+                try:
+                    number = int(value)
+                    if number < 0:
+                        raise ValueError
+                except ValueError:
+                    report_error(f"du: {arg.split('=')[0]}: требуется неотрицательное число")
+                    print(usage)
+                    return
+                if arg == '-n':
+                    top = number
+                else:
+                    max_depth = number
+            else:
+                rest.append(arg)
+        flags, paths = split_options(rest)
+        if flags - {'s', 'h', 'v'}:
+            report_error(f"du: неверный ключ -- '{sorted(flags - {'s', 'h', 'v'})[0]}'")
+            print(usage)
             return
-            
-        # Добавляем команду в историю
-        self.command_history.append(command)
+        if 's' in flags:
+            max_depth = 0
+        fmt = human_size if 'h' in flags else (lambda size: str(-(-size // 1024)))
         
-        parts = command.split()
-        cmd = parts[0]
-        args = parts[1:]
+        labels = {}
+        operands = []
+        for path in paths or ['.']:
+            full = os.path.normpath(os.path.join(self.current_dir, path))
+            try:
+                st = os.lstat(full)
+            except OSError as e:
+                report_error(f"du: невозможно получить доступ к '{path}': {describe_error(e)}")
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                labels.setdefault(full, path)
+                operands.append((full, None))
+            else:
+                operands.append((path, disk_usage(st)))
         
-        try:
-            if cmd == "exit":
-                self.running = False
-                
-            elif cmd == "pwd":
-                print(self.current_dir)
-                
-            elif cmd == "ls":
-                self.list_files(args)
-                
-            elif cmd == "cd":
-                self.change_directory(args)
-                
-            elif cmd == "cat":
-                self.cat_file(args)
-                
-            elif cmd == "mkdir":
-                self.make_directory(args)
-                
-            elif cmd == "rm":
-                self.remove_file(args)
-                
-            elif cmd == "cp":
-                self.copy_file(args)
-                
-            elif cmd == "mv":
-                self.move_file(args)
-                
-            elif cmd == "touch":
-                self.touch_file(args)
-                
-            elif cmd == "echo":
-                self.echo_text(args)
-                
-            elif cmd == "clear":
-                os.system('clear' if os.name == 'posix' else 'cls')
-                
-            elif cmd == "whoami":
-                print(self.username)
-                
-            elif cmd == "history":
-                self.show_history()
-                
-            elif cmd == "find":
-                self.find_files(args)
-                
-            elif cmd == "grep":
-                self.grep_text(args)
-                
-            elif cmd == "neofetch":
-                self.neofetch()
-                
-            elif cmd == "nano":
-                self.nano_editor(args)
-                
-            elif cmd == "help":
-                self.show_help()
-                
+        started = time.perf_counter()
+        cache = read_cache_table(self.du_cache) if use_cache else {}
+        # вложенные операнды обходятся в составе внешних
+        records = du_scan([root for root in labels
+                           if not any(root.startswith(os.path.join(other, ''))
+                                      for other in labels if other != root)], cache)
+        rescanned = sum(1 for r in records if r[3] is None or cache.get(r[3]) is not r[4])
+        totals = du_totals(records)
+        if use_cache:
+            try:
+                du_write_cache(self.du_cache, cache, records)
+            except OSError as e:
+                print(f"du: не удалось сохранить кэш: {describe_error(e)}", file=sys.stderr)
+        
+        children = {}
+        for path, parent, _, _, _, _, error in sorted(records, key=lambda r: r[0]):
+            if error is not None:
+                report_error(f"du: невозможно прочитать каталог '{path}': {error}", file=sys.stderr)
+            if parent is not None:
+                children.setdefault(parent, []).append(path)
+        
+        def display(path):
+            root = path
+            while root not in labels:
+                root = os.path.dirname(root)
+            if path == root:
+                return labels[root]
+            return os.path.join(labels[root], path[len(root):].lstrip(os.sep))
+        
+        # как du: операнды по порядку, каталог — после своих подкаталогов
+        lines = []
+        for root, size in operands:
+            if size is not None:
+                lines.append((size, root))
+                continue
+            stack = [(root, 0, False)]
+            while stack:
+                path, depth, expanded = stack.pop()
+                if expanded:
+                    lines.append((totals[path], display(path)))
+                    continue
+                stack.append((path, depth, True))
+                if max_depth is None or depth < max_depth:
+                    stack.extend((child, depth + 1, False) for child in reversed(children.get(path, ())))
+        if top is not None:
+            lines = sorted(lines, key=lambda line: line[0], reverse=True)[:top]
+        if lines:
+            print('\n'.join(f"{fmt(size)}\t{path}" for size, path in lines))
+        if 'v' in flags:
+            print(f"du: {len(records)} каталогов (пересканировано {rescanned}) "
+                  f"за {time.perf_counter() - started:.2f} с", file=sys.stderr)
+    
+    def sha256sum(self, args):
+        """Реализация sha256sum"""
+        self.checksum_command(args, 'sha256sum', 'sha256')
+    
+    def md5sum(self, args):
+        """Реализация md5sum"""
+        self.checksum_command(args, 'md5sum', 'md5')
+    
+    def checksum_command(self, args, command, algorithm):
+        """Общая часть sha256sum/md5sum: [-c|--check] [--quiet] [файл...], файлы — пулом потоков"""
+        import hashlib
+        factory = getattr(hashlib, algorithm)
+        check = quiet = False
+        names = []
+        for arg in args:
+            if arg in ('-c', '--check'):
+                check = True
+            elif arg == '--quiet':
+                quiet = True
+            elif arg.startswith('-') and arg != '-':
+                report_error(f"{command}: неверный ключ '{arg}'")
+                report_error(f"Использование: {command} [-c|--check] [--quiet] [файл...]")
+                return
             else:
-                self.execute_system_command(parts)
-                
-        except Exception as e:
-            print(f"Ошибка: {e}")
+                names.append(arg)
+        if check:
+            self.checksum_check(names or ['-'], command, factory, quiet)
+            return
+        names = names or ['-']
+        results = hash_files((os.path.join(self.current_dir, name) for name in names if name != '-'),
+                             factory)
+        for name in names:
+            if name == '-':
+                with open(sys.stdin.fileno(), 'rb', closefd=False) as f:
+                    digest, error = hash_stream(f, factory), None
+            else:
+                _, digest, error = next(results)
+            if error is not None:
+                report_error(f"{command}: {name}: {describe_error(error)}")
+            else:
+                print(f"{digest.hex()}  {name}")
     
-    def neofetch(self):
-        """Реализация neofetch - отображение системной информации"""
-        system_info = {
-            "OS": platform.system(),
-            "Hostname": platform.node(),
-            "Kernel": platform.release(),
-            "Uptime": self.get_uptime(),
-            "Shell": os.path.basename(os.getenv('SHELL', 'doyarka-terminal')),
-            "CPU": self.get_cpu_info(),
-            "Memory": self.get_memory_info(),
-            "Terminal": "DoyarkaTerminal",
-            "User": self.username
-        }
+    def checksum_check(self, manifests, command, factory, quiet):
+        """Проверка по спискам «хэш  имя» (как sha256sum -c)"""
+        width = factory().digest_size * 2
+        expected = []
+        malformed = 0
+        for manifest in manifests:
+            try:
+                if manifest == '-':
+                    with open(sys.stdin.fileno(), 'rb', closefd=False) as f:
+                        text = f.read()
+                else:
+                    with open(os.path.join(self.current_dir, manifest), 'rb') as f:
+                        text = f.read()
+            except OSError as e:
+                report_error(f"{command}: {manifest}: {describe_error(e)}")
+                continue
+            for line in text.decode('utf-8', 'surrogateescape').splitlines():
+                match = re.match(r'([0-9a-fA-F]+) [ *](.+)$', line)
+                if match is None or len(match.group(1)) != width:
+                    malformed += line.strip() != ''
+                    continue
+                expected.append((match.group(2), match.group(1).lower()))
         
-        # ASCII арт логотип
-        logo = [
-            "╔═══════════════════╗",
-            "║    DOYARKA OS     ║",
-            "║    ██████╗ ██████╗║",
-            "║   ██╔═══██╗╚════██║║",
-            "║   ██║   ██║ █████╔╝║",
-            "║   ██║   ██║██╔═══╝ ║",
-            "║   ╚██████╔╝███████╗║",
-            "║    ╚═════╝ ╚══════╝║",
-            "╚═══════════════════╝"
-        ]
+        failed = unreadable = 0
+        results = hash_files((os.path.join(self.current_dir, name) for name, _ in expected), factory)
+        for (name, digest), (_, actual, error) in zip(expected, results):
+            if error is not None:
+                unreadable += 1
+                print(f"{name}: ошибка чтения ({describe_error(error)})")
+            elif actual.hex() != digest:
+                failed += 1
+                print(f"{name}: НЕ СОВПАДАЕТ")
+            elif not quiet:
+                print(f"{name}: OK")
+        if malformed:
+            report_error(f"{command}: ВНИМАНИЕ: строк в неверном формате: {malformed}")
+        if unreadable:
+            report_error(f"{command}: ВНИМАНИЕ: не удалось прочитать файлов: {unreadable}")
+        if failed:
+            report_error(f"{command}: ВНИМАНИЕ: не совпали контрольные суммы: {failed}")
+    
+    def treehash_command(self, args):
+        """Реализация treehash [-l] [-v] [--no-cache] <путь...> | --diff <A> <B>: Merkle-хэш деревьев"""
+        usage = "Использование: treehash [-l] [-v] [--no-cache] <путь...> | treehash --diff <A> <B>"
+        diff = '--diff' in args
+        use_cache = '--no-cache' not in args
+        flags, paths = split_options([a for a in args if a not in ('--diff', '--no-cache')])
+        if flags - {'l', 'v'}:
+            report_error(f"treehash: неверный ключ -- '{sorted(flags - {'l', 'v'})[0]}'")
+            print(usage)
+            return
+        if not paths or (diff and len(paths) != 2):
+            print(usage)
+            return
         
-        # Вывод информации в стиле neofetch
-        print("\033[1;36m")  # Голубой цвет
-        for i, line in enumerate(logo):
-            if i < len(logo):
-                info_line = ""
-                if i == 1:
-                    info_line = f"OS: {system_info['OS']}"
-                elif i == 2:
-                    info_line = f"Host: {system_info['Hostname']}"
-                elif i == 3:
-                    info_line = f"Kernel: {system_info['Kernel']}"
-                elif i == 4:
-                    info_line = f"Uptime: {system_info['Uptime']}"
-                elif i == 5:
-                    info_line = f"Shell: {system_info['Shell']}"
-                elif i == 6:
-                    info_line = f"CPU: {system_info['CPU']}"
-                elif i == 7:
-                    info_line = f"Memory: {system_info['Memory']}"
-                elif i == 8:
-                    info_line = f"User: {system_info['User']}"
-                
-                print(f"{line}    \033[0m{info_line}")
+        cache = read_cache_table(self.treehash_cache) if use_cache else {}
+        fresh = {}
+        results = []
+        for path in paths:
+            started = time.perf_counter()
+            result = tree_hash(os.path.join(self.current_dir, path), cache)
+            fresh.update(result['fresh'])
+            for rel, error in result['errors']:
+                report_error(f"treehash: {os.path.join(path, rel) if rel else path}: {describe_error(error)}",
+                             file=sys.stderr)
+            if 'v' in flags:
+                print(f"treehash: {path}: хэшировано {result['hashed']} файлов "
+                      f"({human_size(result['bytes'])}), из кэша {result['cached']} "
+                      f"за {time.perf_counter() - started:.2f} с", file=sys.stderr)
+            results.append(result)
+        if use_cache and fresh:
+            try:
+                write_cache_table(self.treehash_cache, cache, fresh, TREEHASH_CACHE_LIMIT)
+            except OSError as e:
+                print(f"treehash: не удалось сохранить кэш: {describe_error(e)}", file=sys.stderr)
         
-        print("\033[0m")  # Сброс цвета
+        if diff:
+            self.treehash_diff(*results)
+            return
+        lines = []
+        for path, result in zip(paths, results):
+            digests = result['digests']
+            if '' not in digests:
+                continue
+            if 'l' in flags:
+                for rel in sorted(digests):
+                    if rel:
+                        suffix = os.sep if rel in result['dirs'] else ''
+                        lines.append(f"{digests[rel].hex()}  {os.path.join(path, rel)}{suffix}")
+            lines.append(f"{digests[''].hex()}  {path}")
+        if lines:
+            print('\n'.join(lines))
     
-    def get_uptime(self):
-        """Получить время работы системы"""
-        try:
-            if os.name == 'posix':
-                with open('/proc/uptime', 'r') as f:
-                    uptime_seconds = float(f.readline().split()[0])
-                
-                hours = int(uptime_seconds // 3600)
-                minutes = int((uptime_seconds % 3600) // 60)
-                return f"{hours}h {minutes}m"
+    def treehash_diff(self, first, second):
+        """Различия двух деревьев: спуск только в поддеревья с разными хэшами"""
+        lines = []
+        stack = ['']
+        while stack:
+            rel = stack.pop()
+            a = first['digests'].get(rel)
+            b = second['digests'].get(rel)
+            if a == b:
+                continue
+            if rel in first['dirs'] and rel in second['dirs']:
+                stack.extend(sorted(set(first['dirs'][rel]) | set(second['dirs'][rel]), reverse=True))
+            elif a is None:
+                lines.append(f"+ {rel}")
+            elif b is None:
+                lines.append(f"- {rel}")
             else:
-                return "N/A"
-        except:
-            return "N/A"
+                lines.append(f"M {rel or '.'}")
+        print('\n'.join(lines) if lines else "treehash: деревья совпадают")
     
-    def get_cpu_info(self):
-        """Получить информацию о CPU"""
+    def locate_files(self, args):
+        """Реализация команды locate (поиск по индексу updatedb)"""
+        limit = None
+        if '-l' in args:
+            i = args.index('-l')
+            try:
+                limit = int(args[i + 1])
+            except (IndexError, ValueError):
+                report_error("locate: -l требует число")
+                return
+            args = args[:i] + args[i + 2:]
+        flags, patterns = split_options(args)
+        if not patterns:
+            report_error("Использование: locate [-i] [-r] [-c] [-l N] <шаблон...>")
+            return
+        
+        sources = []
+        for p in patterns:
+            if 'r' in flags:
+                sources.append(p)
+            elif any(c in p for c in '*?['):
+                sources.append('^' + glob_to_regex(p) + '$')
+            else:
+                sources.append(re.escape(p))
         try:
-            if os.name == 'posix':
-                with open('/proc/cpuinfo', 'r') as f:
-                    for line in f:
-                        if 'model name' in line:
-                            return line.split(':')[1].strip()
-            return platform.processor()
-        except:
-            return "Unknown"
-    
-    def get_memory_info(self):
-        """Получить информацию о памяти"""
+            pattern = re.compile(os.fsencode('|'.join(f'(?:{src})' for src in sources)),
+                                 re.MULTILINE | (re.IGNORECASE if 'i' in flags else 0))
+        except re.error as e:
+            report_error(f"locate: неверное регулярное выражение: {e}")
+            return
+        
+        count = 0
+        out = binary_stdout()
         try:
-            if os.name == 'posix':
-                with open('/proc/meminfo', 'r') as f:
-                    for line in f:
-                        if 'MemTotal' in line:
-                            mem_kb = int(line.split()[1])
-                            mem_gb = mem_kb / 1024 / 1024
-                            return f"{mem_gb:.1f} GB"
-            return "Unknown"
-        except:
-            return "Unknown"
+            for path in locate_search(self.locate_db, pattern):
+                count += 1
+                if 'c' not in flags:
+                    out.write(path + b'\n')
+                if limit is not None and count >= limit:
+                    break
+        except (OSError, ValueError):
+            report_error("locate: индекс не найден, выполните updatedb")
+            return
+        finally:
+            out.flush()
+        if 'c' in flags:
+            print(count)
     
-    def nano_editor(self, args):
-        """Простой текстовый редактор в стиле nano"""
-        if not args:
-            print("nano: отсутствует операнд")
-            print("Использование: nano <filename>")
+    def open_input(self, name):
+        """Открыть файл-операнд в двоичном режиме; '-' — текущий stdin (не закрывается)"""
+        if name == '-':
+            return open(sys.stdin.fileno(), 'rb', closefd=False)
+        return open(os.path.join(self.current_dir, name), 'rb')
+    
+    def count_options(self, command, args, extra=''):
+        """Ключи head/tail: -n N, -nN, -N, -c N (+N — начиная с N-й), флаги из extra
+
+        Возвращает (режим 'n' или 'c', число, с_начала, флаги, файлы) или None при ошибке.
+        """
+        mode, number, plus = 'n', 10, False
+        flags = set()
+        files = []
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '--':
+                files.extend(args)
+                break
+            if arg == '-' or not arg.startswith('-'):
+                files.append(arg)
+                continue
+            body = arg[1:]
+            if body.isdigit():
+                mode, value = 'n', body
+            elif body[0] in 'nc':
+                mode, value = body[0], body[1:] or (args.pop(0) if args else '')
+            elif set(body) <= set(extra):
+                flags.update(body)
+                continue
+            else:
+                report_error(f"{command}: неверный ключ -- '{(set(body) - set(extra + 'nc')).pop()}'")
+                return None
+            plus = value.startswith('+')
+            try:
+                number = int(value[plus:])
+                if number < 0:
+                    raise ValueError
+            except ValueError:
+                report_error(f"{command}: неверное число: '{value}'")
+                return None
+        return mode, number, plus, flags, files
+    
+    def head_command(self, args):
+        """Реализация head [-n N | -c N] [файл...]: начало файлов потоком, без чтения остального"""
+        parsed = self.count_options('head', args)
+        if parsed is None:
             return
-        
-        filename = args[0]
-        filepath = os.path.join(self.current_dir, filename)
-        
-        # Проверяем, существует ли файл
-        content = ""
-        if os.path.exists(filepath):
+        mode, number, _, _, files = parsed
+        if not files:
+            if sys.stdin.isatty():
+                report_error("head: отсутствует операнд")
+                return
+            files = ['-']
+        out = binary_stdout()
+        for i, name in enumerate(files):
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except:
-                print(f"Ошибка: невозможно прочитать файл {filename}")
+                with self.open_input(name) as f:
+                    if len(files) > 1:
+                        out.write(b'%s==> %s <==\n' % (b'\n' if i else b'', os.fsencode(name)))
+                    if mode == 'n':
+                        head_copy(f, out, lines=number)
+                    else:
+                        head_copy(f, out, count=number)
+            except OSError as e:
+                out.flush()
+                report_error(f"head: {name}: {describe_error(e)}")
+        out.flush()
+    
+    def tail_command(self, args):
+        """Реализация tail [-n N | -c N] [-f] [файл...]
+
+        Обычный файл читается блоками с конца, поток (канал) — с начала с
+        ограниченным буфером. -f следит за дописыванием через inotify, а без
+        него — опросом с растущим интервалом.
+        """
+        parsed = self.count_options('tail', args, extra='f')
+        if parsed is None:
+            return
+        mode, number, plus, flags, files = parsed
+        if not files:
+            if sys.stdin.isatty():
+                report_error("tail: отсутствует операнд")
                 return
+            files = ['-']
+        out = binary_stdout()
+        followed = []
+        try:
+            for i, name in enumerate(files):
+                try:
+                    f = self.open_input(name)
+                except OSError as e:
+                    out.flush()
+                    report_error(f"tail: {name}: {describe_error(e)}")
+                    continue
+                keep = False
+                try:
+                    if len(files) > 1:
+                        out.write(b'%s==> %s <==\n' % (b'\n' if i else b'', os.fsencode(name)))
+                    self.tail_file(f, out, mode, number, plus)
+                    # за каналом не следим (как tail -f для stdin-конвейера)
+                    keep = 'f' in flags and name != '-' and f.seekable()
+                    if keep:
+                        followed.append((name, f))
+                except OSError as e:
+                    out.flush()
+                    report_error(f"tail: {name}: {describe_error(e)}")
+                finally:
+                    if not keep:
+                        f.close()
+            out.flush()
+            if followed:
+                self.tail_follow(followed, out)
+        finally:
+            for _, f in followed:
+                f.close()
+    
+    def tail_file(self, f, out, mode, number, plus):
+        """Вывести хвост одного файла; позиция f остаётся в конце выведенного"""
+        if plus:
+            # -n +N / -c +N: всё, начиная с N-й строки (байта)
+            if mode == 'n':
+                head_copy(f, out, lines=max(number - 1, 0), skip=True)
+            else:
+                head_copy(f, out, count=max(number - 1, 0), skip=True)
+            return
+        st = os.fstat(f.fileno())
+        if f.seekable() and stat.S_ISREG(st.st_mode):
+            if mode == 'c':
+                start = max(st.st_size - number, 0)
+            else:
+                def read_block(pos, n):
+                    f.seek(pos)
+                    return f.read(n)
+                start = tail_start(read_block, st.st_size, number)
+            f.seek(start)
+            copy_stream(f, out)
+        elif mode == 'n':
+            out.write(tail_stream(f, lines=number))
         else:
-            # Создаем новый файл
+            out.write(tail_stream(f, count=number))
+    
+    def tail_follow(self, followed, out):
+        """tail -f: дописывать новые данные файлов до Ctrl+C или закрытия канала вывода"""
+        watcher = open_inotify([os.path.join(self.current_dir, name) for name, _ in followed])
+        current = followed[-1][0]
+        delay = TAIL_POLL_MIN
+        try:
+            while True:
+                got = False
+                for name, f in followed:
+                    if os.fstat(f.fileno()).st_size < f.tell():
+                        out.flush()
+                        print(f"tail: {name}: файл усечён", file=sys.stderr)
+                        f.seek(0)
+                    while True:
+                        chunk = f.read1(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if len(followed) > 1 and name != current:
+                            out.write(b'\n==> %s <==\n' % os.fsencode(name))
+                            current = name
+                        out.write(chunk)
+                        got = True
+                if got:
+                    out.flush()
+                    delay = TAIL_POLL_MIN
+                elif output_closed(out):
+                    return
+                if watcher is not None:
+                    watcher.wait(TAIL_POLL_MAX)
+                else:
+                    time.sleep(delay)
+                    delay = min(delay * 2, TAIL_POLL_MAX)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if watcher is not None:
+                watcher.close()
+    
+    def wc_command(self, args):
+        """Реализация wc [-l] [-w] [-c] [файл...]: строки, слова и байты"""
+        flags, files = split_options(args)
+        unknown = flags - set('lwc')
+        if unknown:
+            report_error(f"wc: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        shown = [i for i, key in enumerate('lwc') if key in flags] or [0, 1, 2]
+        if not files:
+            if sys.stdin.isatty():
+                report_error("wc: отсутствует операнд")
+                return
+            files = ['-']
+        rows = []
+        totals = [0, 0, 0]
+        # ширина колонок как у GNU wc: по суммарному размеру обычных файлов, не меньше 7 для каналов
+        regular_size = 0
+        min_width = 1
+        for name in files:
             try:
-                open(filepath, 'w').close()
-            except:
-                print(f"Ошибка: невозможно создать файл {filename}")
+                with self.open_input(name) as f:
+                    st = os.fstat(f.fileno())
+                    if stat.S_ISREG(st.st_mode):
+                        regular_size += st.st_size
+                    else:
+                        min_width = 7
+                    if shown == [2] and stat.S_ISREG(st.st_mode):
+                        # только байты: размер из fstat, без чтения
+                        counts = (0, 0, st.st_size - f.tell())
+                    else:
+                        counts = count_stream(f, words=1 in shown)
+            except OSError as e:
+                report_error(f"wc: {name}: {describe_error(e)}")
+                continue
+            rows.append((counts, '' if name == '-' else f" {name}"))
+            totals = [a + b for a, b in zip(totals, counts)]
+        if len(rows) > 1:
+            rows.append((totals, " итого"))
+        if not rows:
+            return
+        width = 1 if len(files) == 1 and len(shown) == 1 else max(len(str(regular_size)), min_width)
+        print('\n'.join(' '.join(f"{counts[i]:>{width}}" for i in shown) + label
+                        for counts, label in rows))
+    
+    def sort_options(self, args):
+        """Ключи sort: -n -r -u, -k N[,M], -t разделитель, -S размер, -T каталог, --parallel N
+
+        Возвращает (флаги, поля, разделитель, память, каталог, процессы, файлы) или None.
+        """
+        flags = set()
+        fields = separator = tmpdir = None
+        memory = SORT_MEMORY
+        parallel = 1
+        files = []
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '--':
+                files.extend(args)
+                break
+            if arg == '--parallel' or arg.startswith('--parallel='):
+                value = arg.partition('=')[2] if '=' in arg else (args.pop(0) if args else '')
+                if not value.isdigit() or int(value) < 1:
+                    report_error(f"sort: неверное число процессов: '{value}'")
+                    return None
+                parallel = int(value)
+                continue
+            if arg == '-' or not arg.startswith('-'):
+                files.append(arg)
+                continue
+            if arg.startswith('--'):
+                report_error(f"sort: неизвестный ключ '{arg}'")
+                return None
+            for i, letter in enumerate(arg[1:], 1):
+                if letter in 'nru':
+                    flags.add(letter)
+                    continue
+                if letter not in 'ktST':
+                    report_error(f"sort: неверный ключ -- '{letter}'")
+                    return None
+                value = arg[i + 1:] or (args.pop(0) if args else '')
+                try:
+                    if letter == 'k':
+                        # -k2,2n: буквы после номеров полей действуют на всю сортировку
+                        options = re.sub(r'[\d,]', '', value)
+                        if not set(options) <= set('nr'):
+                            raise ValueError
+                        flags.update(options)
+                        start, _, end = re.sub(r'[nr]', '', value).partition(',')
+                        fields = (int(start), int(end) if end else None)
+                        if fields[0] < 1 or (fields[1] is not None and fields[1] < fields[0]):
+                            raise ValueError
+                    elif letter == 't':
+                        if len(value) != 1:
+                            raise ValueError
+                        separator = os.fsencode(value)
+                    elif letter == 'S':
+                        memory = parse_size(value)
+                    else:
+                        tmpdir = os.path.join(self.current_dir, value)
+                        if not os.path.isdir(tmpdir):
+                            report_error(f"sort: {value}: каталог для временных файлов не существует")
+                            return None
+                except ValueError:
+                    report_error(f"sort: неверный аргумент -{letter}: '{value}'")
+                    return None
+                break
+        return flags, fields, separator, memory, tmpdir, parallel, files
+    
+    def sort_command(self, args):
+        """Реализация sort [-nru] [-k N[,M]] [-t c] [-S размер] [-T каталог] [--parallel N] [файл...]
+
+        Ввод читается прогонами не больше -S байт памяти (по умолчанию
+        DSH_SORT_MEMORY или 256M); если он не уместился в один прогон,
+        отсортированные прогоны сбрасываются во временные файлы (-T, иначе
+        TMPDIR) и сливаются потоком. --parallel N сортирует прогоны в N
+        процессах, деля между ними тот же объём памяти. Сравнение — побайтовое,
+        как в LC_ALL=C sort.
+        """
+        parsed = self.sort_options(args)
+        if parsed is None:
+            return
+        flags, fields, separator, memory, tmpdir, parallel, files = parsed
+        if not files:
+            if sys.stdin.isatty():
+                report_error("sort: отсутствует операнд")
                 return
+            files = ['-']
         
-        print(f"\nРедактирование файла: {filename}")
-        print("Команды: Ctrl+S - Сохранить, Ctrl+X - Выход, Ctrl+G - Помощь")
-        print("─" * 50)
+        def streams():
+            for name in files:
+                try:
+                    with self.open_input(name) as f:
+                        yield f
+                except OSError as e:
+                    report_error(f"sort: {name}: {describe_error(e)}")
         
-        # Отображаем текущее содержимое
-        lines = content.split('\n') if content else [""]
-        current_line = 0
+        # на время сортировки прогона в процессе в памяти ещё и следующий прогон
+        limit = memory // (parallel + 1) if parallel > 1 else memory
+        spec = (fields, separator, 'n' in flags)
+        lines = external_sort(read_line_runs(streams(), limit), spec, reverse='r' in flags,
+                              unique='u' in flags, tmpdir=tmpdir, parallel=parallel)
+        out = binary_stdout()
+        try:
+            write_lines(out, lines)
+        except OSError as e:
+            report_error(f"sort: {describe_error(e)}")
+        finally:
+            lines.close()
+            out.flush()
+    
+    def uniq_command(self, args):
+        """Реализация uniq [-c] [-d] [-u] [-i] [файл]: схлопнуть подряд идущие одинаковые строки
+
+        Работает потоком — в памяти только текущая строка, поэтому подходит
+        для вывода sort любого размера (sort | uniq -c).
+        """
+        flags, files = split_options(args)
+        unknown = flags - set('cdui')
+        if unknown:
+            report_error(f"uniq: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        if len(files) > 1:
+            report_error(f"uniq: лишний операнд '{files[1]}'")
+            return
+        if not files and sys.stdin.isatty():
+            report_error("uniq: отсутствует операнд")
+            return
+        name = files[0] if files else '-'
+        counted, only_repeated, only_unique = 'c' in flags, 'd' in flags, 'u' in flags
+        out = binary_stdout()
+        batch = []
         
-        while True:
-            # Очищаем экран и показываем содержимое
-            os.system('clear' if os.name == 'posix' else 'cls')
-            
-            print(f"DOYARKA NANO - {filename}")
-            print("Команды: Ctrl+S - Сохранить, Ctrl+X - Выход, Ctrl+G - Помощь")
-            print("─" * 50)
-            
-            # Показываем содержимое вокруг текущей строки
-            start = max(0, current_line - 5)
-            end = min(len(lines), current_line + 10)
-            
-            for i in range(start, end):
-                marker = ">" if i == current_line else " "
-                print(f"{marker} {i+1:3d}: {lines[i]}")
-            
-            print("─" * 50)
-            print(f"Строка {current_line + 1}/{len(lines)}")
-            
-            try:
-                user_input = input("Введите текст или команду: ")
-            except KeyboardInterrupt:
-                # Обработка Ctrl+C как выхода с подтверждением
-                confirm = input("\nВыйти без сохранения? (y/N): ")
-                if confirm.lower() == 'y':
-                    return
-                continue
-            
-            # Обработка специальных команд
-            if user_input == '\x18':  # Ctrl+X
-                confirm = input("Сохранить изменения? (Y/n): ")
-                if confirm.lower() != 'n':
-                    try:
-                        with open(filepath, 'w', encoding='utf-8') as f:
-                            f.write('\n'.join(lines))
-                        print(f"Сохранено: {filename}")
-                    except Exception as e:
-                        print(f"Ошибка сохранения: {e}")
+        def emit(line, count):
+            if (only_repeated and count == 1) or (only_unique and count > 1):
                 return
-            
-            elif user_input == '\x13':  # Ctrl+S
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write('\n'.join(lines))
-                    print(f"Сохранено: {filename}")
-                except Exception as e:
-                    print(f"Ошибка сохранения: {e}")
-                input("Нажмите Enter для продолжения...")
-                continue
-            
-            elif user_input == '\x07':  # Ctrl+G
-                self.show_nano_help()
-                input("Нажмите Enter для продолжения...")
+            batch.append(b'%7d %s' % (count, line) if counted else line)
+            if len(batch) >= SORT_WRITE_BATCH:
+                out.write(b''.join(batch))
+                batch.clear()
+        
+        try:
+            with self.open_input(name) as f:
+                previous = key = None
+                count = 0
+                for line in f:
+                    if line[-1:] != b'\n':
+                        line += b'\n'
+                    current = line.lower() if 'i' in flags else line
+                    if current == key:
+                        count += 1
+                        continue
+                    if count:
+                        emit(previous, count)
+                    previous, key, count = line, current, 1
+                if count:
+                    emit(previous, count)
+        except OSError as e:
+            out.write(b''.join(batch))
+            out.flush()
+            report_error(f"uniq: {name}: {describe_error(e)}")
+            return
+        out.write(b''.join(batch))
+        out.flush()
+    
+    def gzip_command(self, args, command='gzip'):
+        """Реализация gzip [-dckfv] [-1..-9] [-p N] [файл...] и gunzip
+
+        Сжатие — ParallelGzipWriter в N потоках (-p, по умолчанию по числу
+        CPU). Файл заменяется на файл.gz с теми же правами и временем
+        изменения (-k — оставить исходный, -c — вывести в stdout), без файлов
+        сжимается stdin. Распаковка (-d, gunzip) идёт потоком в одном потоке:
+        поток deflate не делится на независимые части.
+        """
+        import zlib
+        flags = set('d') if command == 'gunzip' else set()
+        level = GZIP_LEVEL
+        workers = GZIP_WORKERS
+        files = []
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg == '--':
+                files.extend(args)
+                break
+            if arg == '-' or not arg.startswith('-'):
+                files.append(arg)
                 continue
-            
-            elif user_input.startswith('/'):  # Поиск
-                search_term = user_input[1:]
-                found = False
-                for i in range(current_line + 1, len(lines)):
-                    if search_term in lines[i]:
-                        current_line = i
-                        found = True
+            for i, letter in enumerate(arg[1:], 1):
+                if letter.isdigit() and letter != '0':
+                    level = int(letter)
+                elif letter in 'dckfv':
+                    flags.add(letter)
+                elif letter == 'p':
+                    value = arg[i + 1:] or (args.pop(0) if args else '')
+                    if not value.isdigit() or int(value) < 1:
+                        report_error(f"{command}: неверное число потоков: '{value}'")
+                        return
+                    workers = int(value)
+                    break
+                else:
+                    report_error(f"{command}: неверный ключ -- '{letter}'")
+                    return
+        if not files:
+            if sys.stdin.isatty():
+                report_error(f"{command}: отсутствует операнд")
+                return
+            files = ['-']
+        decompress = 'd' in flags
+        to_stdout = 'c' in flags or files == ['-']
+        if to_stdout and not decompress and sys.stdout.isatty() and 'f' not in flags:
+            report_error(f"{command}: сжатые данные не выводятся на терминал (-f — всё равно вывести)")
+            return
+        
+        def process(src, dst, name, mtime):
+            if decompress:
+                gunzip_stream(src, dst)
+                return
+            with ParallelGzipWriter(dst, level, workers, name=name, mtime=mtime) as writer:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
                         break
-                if not found:
-                    print(f"Текст '{search_term}' не найден")
-                    input("Нажмите Enter для продолжения...")
+                    writer.write(chunk)
+        
+        for name in files:
+            try:
+                if name == '-' or to_stdout:
+                    out = binary_stdout()
+                    with self.open_input(name) as src:
+                        mtime = os.fstat(src.fileno()).st_mtime if name != '-' else time.time()
+                        process(src, out, '' if name == '-' else name, mtime)
+                    out.flush()
+                    continue
+                self.gzip_file(command, name, process, decompress, flags)
+            except OSError as e:
+                report_error(f"{command}: {name}: {describe_error(e)}")
+            except zlib.error as e:
+                report_error(f"{command}: {name}: повреждённые сжатые данные ({e})")
+    
+    def gunzip_command(self, args):
+        self.gzip_command(args, command='gunzip')
+    
+    def gzip_file(self, command, name, process, decompress, flags):
+        """Сжать/распаковать файл рядом с исходным (file <-> file.gz), перенеся права и время"""
+        path = os.path.join(self.current_dir, name)
+        if decompress:
+            suffix = next(((old, new) for old, new in GZIP_SUFFIXES if name.lower().endswith(old)), None)
+            if suffix is None:
+                report_error(f"{command}: {name}: неизвестный суффикс — пропущено")
+                return
+            target = path[:-len(suffix[0])] + suffix[1]
+        elif name.lower().endswith('.gz') and 'f' not in flags:
+            report_error(f"{command}: {name} уже имеет суффикс .gz — пропущено")
+            return
+        else:
+            target = path + '.gz'
+        with open(path, 'rb') as src:
+            st = os.fstat(src.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                report_error(f"{command}: {name}: не обычный файл — пропущено")
+                return
+            if os.path.lexists(target) and 'f' not in flags:
+                report_error(f"{command}: {os.path.relpath(target, self.current_dir)} уже существует")
+                return
+            try:
+                with open(target, 'wb') as dst:
+                    process(src, dst, name, st.st_mtime)
+                os.chmod(target, stat.S_IMODE(st.st_mode))
+                os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+            except BaseException:
+                # недописанный результат не оставляем, исходный файл не трогаем
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+                raise
+        if 'k' not in flags:
+            os.remove(path)
+        if 'v' in flags:
+            size = os.path.getsize(target)
+            small, big = (st.st_size, size) if decompress else (size, st.st_size)
+            saved = 100 * (1 - small / big) if big else 0
+            print(f"{name}:\t{saved:5.1f}% -- {'создан' if 'k' in flags else 'заменён на'} "
+                  f"{os.path.relpath(target, self.current_dir)}")
+    
+    def tar_command(self, args):
+        """Реализация tar -c|-x|-t [-zv] [-f архив] [-C каталог] [файл...]
+
+        Архив пишется и читается потоком: без -f — в stdout и из stdin, так что
+        tar -c можно сразу отправить в канал. -z (или имя .tar.gz/.tgz) сжимает
+        через ParallelGzipWriter; при чтении сжатие (gzip, bzip2, xz)
+        определяется по содержимому. -t выводит содержимое без распаковки на
+        диск, -x извлекает с фильтром 'data': абсолютные пути и выход за
+        каталог отбрасываются.
+        """
+        args = list(args)
+        if args and args[0] and set(args[0]) <= set('cxtzvf'):
+            args[0] = '-' + args[0]  # tar czf архив.tgz ... — ключи без дефиса
+        mode = None
+        flags = set()
+        archive = '-'
+        directory = self.current_dir
+        files = []
+        while args:
+            arg = args.pop(0)
+            if arg == '--':
+                files.extend(args)
+                break
+            if arg == '-' or not arg.startswith('-'):
+                files.append(arg)
                 continue
-            
-            # Навигация
-            elif user_input == 'j' and current_line < len(lines) - 1:
-                current_line += 1
-            elif user_input == 'k' and current_line > 0:
-                current_line -= 1
-            elif user_input == 'g':
-                current_line = 0
-            elif user_input == 'G':
-                current_line = len(lines) - 1
-            
-            # Редактирование
-            elif user_input == 'i':  # Вставка
-                new_text = input("Введите текст: ")
-                lines[current_line] = new_text
-            elif user_input == 'a':  # Добавление в конец
-                append_text = input("Добавить текст: ")
-                lines[current_line] += append_text
-            elif user_input == 'o':  # Новая строка после
-                new_line = input("Новая строка: ")
-                lines.insert(current_line + 1, new_line)
-                current_line += 1
-            elif user_input == 'O':  # Новая строка перед
-                new_line = input("Новая строка: ")
-                lines.insert(current_line, new_line)
-                current_line += 1
-            elif user_input == 'd':  # Удалить строку
-                if len(lines) > 1:
-                    lines.pop(current_line)
-                    if current_line >= len(lines):
-                        current_line = len(lines) - 1
+            for i, letter in enumerate(arg[1:], 1):
+                if letter in 'cxt':
+                    if mode not in (None, letter):
+                        report_error("tar: можно указать только один из ключей -c, -x, -t")
+                        return
+                    mode = letter
+                elif letter in 'zv':
+                    flags.add(letter)
+                elif letter in 'fC':
+                    value = arg[i + 1:] or (args.pop(0) if args else '')
+                    if not value:
+                        report_error(f"tar: ключ -{letter} требует аргумент")
+                        return
+                    if letter == 'f':
+                        archive = value
+                    else:
+                        directory = os.path.join(self.current_dir, value)
+                    break
                 else:
-                    lines[current_line] = ""
+                    report_error(f"tar: неверный ключ -- '{letter}'")
+                    return
+        if mode is None:
+            report_error("tar: нужно указать один из ключей -c, -x, -t")
+            return
+        try:
+            if mode == 'c':
+                self.tar_create(archive, directory, files, flags)
             else:
-                # Если введен обычный текст, заменяем текущую строку
-                lines[current_line] = user_input
+                self.tar_read(archive, directory, files, flags, extract=mode == 'x')
+        except OSError as e:
+            report_error(f"tar: {archive}: {describe_error(e)}")
     
-    def show_nano_help(self):
-        """Показать справку по nano"""
-        help_text = """
-┌───────────────── НАНО РЕДАКТОР ─────────────────┐
-│                 Основные команды:               │
-│                                                 │
-│  Ctrl+S    - Сохранить файл                     │
-│  Ctrl+X    - Выйти из редактора                 │
-│  Ctrl+G    - Показать эту справку               │
-│                                                 │
-│  i         - Редактировать текущую строку       │
-│  a         - Добавить текст в конец строки      │
-│  o         - Вставить строку после текущей      │
-│  O         - Вставить строку перед текущей      │
-│  d         - Удалить текущую строку             │
-│                                                 │
-│  j         - Перейти на строку вниз             │
-│  k         - Перейти на строку вверх            │
-│  g         - Перейти к первой строке            │
-│  G         - Перейти к последней строке         │
-│                                                 │
-│  /текст    - Поиск текста                       │
-│                                                 │
-│  Enter     - Подтвердить ввод                   │
-│  Ctrl+C    - Отмена/Выход                       │
-└─────────────────────────────────────────────────┘
-"""
-        print(help_text)
+    def tar_create(self, archive, directory, files, flags):
+        import tarfile
+        if not files:
+            report_error("tar: пустой архив не создаётся")
+            return
+        if archive == '-' and sys.stdout.isatty():
+            report_error("tar: архив не выводится на терминал (укажите -f)")
+            return
+        compress = 'z' in flags or archive.endswith(('.tar.gz', '.tgz'))
+        out = binary_stdout() if archive == '-' else open(os.path.join(self.current_dir, archive), 'wb')
+        # при выводе архива в stdout список -v идёт в stderr
+        report = sys.stderr if archive == '-' else sys.stdout
+        try:
+            skip = None
+            if archive != '-':
+                st = os.fstat(out.fileno())
+                skip = (st.st_dev, st.st_ino)
+            writer = ParallelGzipWriter(out, mtime=time.time()) if compress else nullcontext(out)
+            with writer as target:
+                with tarfile.open(fileobj=target, mode='w|', bufsize=CHUNK_SIZE) as tar:
+                    for name in files:
+                        for arcname, error in tar_add_tree(tar, os.path.join(directory, name), name, skip):
+                            if error is not None:
+                                report_error(f"tar: {arcname}: {describe_error(error)}", file=sys.stderr)
+                            elif 'v' in flags:
+                                print(arcname, file=report)
+        finally:
+            if archive == '-':
+                out.flush()
+            else:
+                out.close()
     
-    def list_files(self, args):
-        """Реализация команды ls"""
-        long_format = '-l' in args
-        show_all = '-a' in args
+    def tar_read(self, archive, directory, files, flags, extract):
+        """tar -t/-x: из файла — с пропуском данных через seek, из stdin — потоком"""
+        import tarfile
+        if archive == '-' and sys.stdin.isatty():
+            report_error("tar: архив не читается с терминала (укажите -f)")
+            return
         
-        path_args = [arg for arg in args if not arg.startswith('-')]
+        prefixes = [name.rstrip('/') for name in files]
         
-        path = self.current_dir
-        if path_args:
-            path = os.path.join(self.current_dir, path_args[0])
-            
-        try:
-            files = os.listdir(path)
-            if not show_all:
-                files = [f for f in files if not f.startswith('.')]
-                
-            for file in files:
-                file_path = os.path.join(path, file)
-                if long_format:
-                    stat = os.stat(file_path)
-                    size = stat.st_size
-                    mtime = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
-                    permissions = self.get_permissions(file_path)
-                    print(f"{permissions} {size:8d} {mtime} {file}")
-                else:
-                    if os.path.isdir(file_path):
-                        print(f"\033[94m{file}/\033[0m")
-                    elif os.access(file_path, os.X_OK):
-                        print(f"\033[92m{file}\033[0m")
+        def selected(tar):
+            for member in tar:
+                if prefixes and not any(member.name == prefix or member.name.startswith(prefix + '/')
+                                        for prefix in prefixes):
+                    continue
+                if 'v' in flags or not extract:
+                    print(tar_listing(member) if 'v' in flags and not extract else member.name)
+                yield member
+        
+        def data_filter(member, path):
+            try:
+                member = tarfile.data_filter(member, path)
+            except tarfile.FilterError as e:
+                report_error(f"tar: {member.name}: пропущено ({e})", file=sys.stderr)
+                return None
+            target = os.path.join(path, member.name)
+            if member.islnk() and os.path.lexists(target) and not os.path.isdir(target):
+                # tarfile не заменяет файл жёсткой ссылкой, а в потоке не может вернуться за копией
+                os.unlink(target)
+            return member
+        
+        with self.open_input(archive) as src:
+            try:
+                with tarfile.open(fileobj=src, mode='r|*' if archive == '-' else 'r:*',
+                                  bufsize=CHUNK_SIZE) as tar:
+                    if not extract:
+                        for _ in selected(tar):
+                            pass
+                    elif hasattr(tarfile, 'data_filter'):
+                        tar.extractall(directory, members=selected(tar), filter=data_filter)
                     else:
-                        print(file)
-        except FileNotFoundError:
-            print(f"ls: невозможно получить доступ к '{args[0]}': Нет такого файла или каталога")
+                        tar.extractall(directory, members=selected(tar))
+            except tarfile.ReadError as e:
+                report_error(f"tar: {archive}: не архив tar или повреждён ({str(e).splitlines()[0].rstrip(':')})")
+            except (tarfile.TarError, EOFError) as e:
+                report_error(f"tar: {archive}: повреждённый архив ({e})")
     
-    def get_permissions(self, path):
-        """Получить строку прав доступа в UNIX-стиле"""
+    def grep_text(self, args):
+        """Реализация команды grep (-r рекурсивно, -E регулярные выражения, -i, -l, -c)"""
+        flags, operands = split_options(args)
+        from_stdin = len(operands) == 1 and 'r' not in flags and not sys.stdin.isatty()
+        if len(operands) < 2 and not (operands and ('r' in flags or from_stdin)):
+            report_error("Использование: grep [-rEilc] <шаблон> <файл...>")
+            return
+        
+        unknown = flags - set('rEilc')
+        if unknown:
+            report_error(f"grep: неверный ключ -- '{sorted(unknown)[0]}'")
+            return
+        
+        source = operands[0]
+        if 'i' not in flags or source.isascii():
+            # Поиск по сырым байтам; для bytes IGNORECASE сравнивает регистр только
+            # у ASCII, поэтому -i с не-ASCII шаблоном ищет по декодированному тексту
+            source = source.encode('utf-8', 'surrogateescape')
+        if 'E' not in flags:
+            source = re.escape(source)
+        re_flags = re.MULTILINE | (re.IGNORECASE if 'i' in flags else 0)
         try:
-            stat = os.stat(path)
-            permissions = []
-            
-            if os.path.isdir(path):
-                permissions.append('d')
+            re.compile(source, re_flags)
+        except re.error as e:
+            report_error(f"grep: неверное регулярное выражение: {e}")
+            return
+        mode = 'l' if 'l' in flags else 'c' if 'c' in flags else 'n'
+        
+        # код завершения как у GNU grep: 0 — есть совпадения, 1 — нет, 2 — ошибка;
+        # -c печатает и нулевые счётчики, совпадение — только ненулевой
+        out = binary_stdout()
+        matched = errors = False
+        if from_stdin:
+            with open(sys.stdin.fileno(), 'rb', closefd=False) as f:
+                for chunk in grep_stream(f, re.compile(source, re_flags), mode):
+                    out.write(chunk)
+                    matched = matched or mode != 'c' or chunk != b'0\n'
+            out.flush()
+            return 0 if matched else 1
+        for chunk in self.grep_parallel(self.grep_targets(operands[1:] or ['.'], 'r' in flags),
+                                        source, re_flags, mode):
+            if isinstance(chunk, str):
+                out.flush()
+                report_error(chunk)
+                sys.stdout.flush()
+                errors = True
             else:
-                permissions.append('-')
-            
-            permissions.append('r' if stat.st_mode & 0o400 else '-')
-            permissions.append('w' if stat.st_mode & 0o200 else '-')
-            permissions.append('x' if stat.st_mode & 0o100 else '-')
-            permissions.append('r' if stat.st_mode & 0o040 else '-')
-            permissions.append('w' if stat.st_mode & 0o020 else '-')
-            permissions.append('x' if stat.st_mode & 0o010 else '-')
-            permissions.append('r' if stat.st_mode & 0o004 else '-')
-            permissions.append('w' if stat.st_mode & 0o002 else '-')
-            permissions.append('x' if stat.st_mode & 0o001 else '-')
-            
-            return ''.join(permissions)
-        except:
-            return '??????????'
+                out.write(chunk)
+                matched = matched or mode != 'c' or not chunk.endswith(b':0\n')
+        out.flush()
+        return 2 if errors else 0 if matched else 1
     
-    def change_directory(self, args):
-        """Реализация команды cd"""
-        if not args:
-            new_dir = str(Path.home())
-        else:
-            new_dir = args[0]
-            
-        if new_dir == "~":
-            new_dir = str(Path.home())
-        elif new_dir.startswith("~/"):
-            new_dir = str(Path.home()) + new_dir[1:]
-        else:
-            new_dir = os.path.join(self.current_dir, new_dir)
+    def grep_targets(self, names, recursive):
+        """Перечислить файлы для grep в виде пар (путь, отображаемое имя)"""
+        for name in names:
+            path = os.path.join(self.current_dir, name)
+            if recursive and os.path.isdir(path):
+                prefix_len = len(path) - len(name)
+                for file_path in walk_files(path):
+                    yield file_path, file_path[prefix_len:]
+            else:
+                yield path, name
+    
+    def grep_parallel(self, targets, source, re_flags, mode):
+        """Раздать файлы пачками пулу процессов, сохраняя порядок вывода
+
+        Рабочие запускаются через forkserver, как в spill_runs: при fork они
+        унаследовали бы концы каналов конвейера.
+        """
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        batch = []
+        pending = deque()
+        executor = None
+        window = (os.cpu_count() or 1) * 4
+        try:
+            for target in targets:
+                batch.append(target)
+                if len(batch) < GREP_BATCH_SIZE:
+                    continue
+                if executor is None:
+                    executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('forkserver'))
+                pending.append(executor.submit(grep_batch, batch, source, re_flags, mode))
+                batch = []
+                # Ограниченное окно: вывод идёт по мере готовности, порядок сохраняется
+                while len(pending) > window or (pending and pending[0].done()):
+                    yield from pending.popleft().result()
             
+            if batch:
+                if executor is None:
+                    yield from grep_batch(batch, source, re_flags, mode)
+                else:
+                    pending.append(executor.submit(grep_batch, batch, source, re_flags, mode))
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            if executor is not None:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown()
+    
+    def execute_system_command(self, parts):
+        """Выполнение системных команд (вывод идёт напрямую, без буферизации); вернуть код завершения"""
+        proc = self.spawn_process(parts)
+        if proc is None:
+            return 127
+        self.wait_processes([proc])
+        return exit_status(proc.returncode)
+    
+    def spawn_process(self, parts, stdin=None, stdout=None, process_group=None):
+        """Запустить внешний процесс; stdin/stdout=None — текущие потоки потока выполнения
+
+        Путь берётся из таблицы hash, поэтому Popen не перебирает PATH сам.
+        process_group — группа процессов (0 — новая), по умолчанию группа оболочки.
+        """
+        import subprocess
+        if stdin is None:
+            stdin = stdin_target()
+        if stdout is None:
+            stdout = stdout_target()
+        executable = COMMAND_HASH.lookup(parts[0], self.current_dir)
+        if executable is None:
+            report_error(f"{parts[0]}: команда не найдена")
+            return None
         try:
-            os.chdir(new_dir)
-            self.current_dir = os.getcwd()
+            return subprocess.Popen(parts, executable=executable, cwd=self.current_dir,
+                                    stdin=stdin, stdout=stdout, stderr=stderr_target(),
+                                    **process_group_options(process_group))
         except FileNotFoundError:
-            print(f"cd: {args[0]}: Нет такого файла или каталога")
+            COMMAND_HASH.forget(parts[0])
+            report_error(f"{parts[0]}: команда не найдена")
         except PermissionError:
-            print(f"cd: {args[0]}: Отказано в доступе")
+            report_error(f"{parts[0]}: Отказано в доступе")
+        except OSError as e:
+            report_error(f"{parts[0]}: {describe_error(e)}")
+        return None
     
-    def cat_file(self, args):
-        """Реализация команды cat"""
-        if not args:
-            print("cat: отсутствует операнд")
+    def hash_command(self, args):
+        """Реализация hash: [-r] [имя...] — таблица путей внешних команд"""
+        flags, names = split_options(args)
+        if flags - {'r'}:
+            report_error(f"hash: неверный ключ -- '{sorted(flags - {'r'})[0]}'")
             return
-            
-        try:
-            with open(os.path.join(self.current_dir, args[0]), 'r', encoding='utf-8') as f:
-                print(f.read())
-        except FileNotFoundError:
-            print(f"cat: {args[0]}: Нет такого файла или каталога")
-        except IsADirectoryError:
-            print(f"cat: {args[0]}: Это каталог")
-        except UnicodeDecodeError:
-            print(f"cat: {args[0]}: Невозможно прочитать файл (возможно, бинарный)")
-    
-    def make_directory(self, args):
-        """Реализация команды mkdir"""
-        if not args:
-            print("mkdir: отсутствует операнд")
+        if 'r' in flags:
+            COMMAND_HASH.forget()
+        for name in names:
+            if COMMAND_HASH.lookup(name, self.current_dir) is None:
+                report_error(f"hash: {name}: не найдено")
+        if flags or names:
             return
-            
+        entries = COMMAND_HASH.entries()
+        if not entries:
+            print("hash: таблица пуста")
+            return
+        lines = [f"{'попаданий':>9}  команда"]
+        lines.extend(f"{hits:>9}  {path}" for _, hits, path in entries)
+        print('\n'.join(lines))
+    
+    def wait_processes(self, procs):
+        """Дождаться процессов, перекачивая вывод тех, что пишут в канал"""
         try:
-            os.makedirs(os.path.join(self.current_dir, args[0]), exist_ok=True)
-        except PermissionError:
-            print(f"mkdir: невозможно создать каталог '{args[0]}': Отказано в доступе")
+            for proc in procs:
+                if proc.stdout is not None:
+                    out = binary_stdout()
+                    copy_stream(proc.stdout, out)
+                    proc.stdout.close()
+                proc.wait()
+        except KeyboardInterrupt:
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.terminate()
+            for proc in procs:
+                proc.wait()
+            raise
     
-    def remove_file(self, args):
-        """Реализация команды rm"""
-        if not args:
-            print("rm: отсутствует операнд")
-            return
-            
-        recursive = '-r' in args
-        force = '-f' in args
-        
-        file_args = [arg for arg in args if not arg.startswith('-')]
+    def run_pipeline(self, stages, redirects, job=None, background=False):
+        """Выполнить конвейер и дождаться всех его стадий; код завершения — последней стадии"""
+        started = self.start_pipeline(stages, redirects, job, background)
+        if started is None:
+            return 1
+        return self.finish_pipeline(*started)
+    
+    def start_pipeline(self, stages, redirects, job=None, background=False):
+        """Запустить конвейер: стадии соединены каналами ядра
+
+        Внешние команды получают концы каналов напрямую, встроенные работают
+        в отдельных потоках со своими stdin/stdout, данные между стадиями не
+        собираются в памяти целиком. Процессы регистрируются в задании job.
+        Возвращает (процессы, потоки, последняя встроенная стадия в текущем
+        потоке, последняя стадия — процесс или поток) или None.
+        """
+        sys.stdout.flush()
+        in_fd = out_final = None
+        try:
+            if '<' in redirects:
+                in_fd = os.open(os.path.join(self.current_dir, redirects['<']), os.O_RDONLY)
+            elif background:
+                # Фоновые задания не читают с терминала
+                in_fd = os.open(os.devnull, os.O_RDONLY)
+            target = redirects.get('>') or redirects.get('>>')
+            if target is not None:
+                mode = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if '>>' in redirects else os.O_TRUNC)
+                out_final = os.open(os.path.join(self.current_dir, target), mode, 0o666)
+        except OSError as e:
+            name = redirects.get('<') if in_fd is None and '<' in redirects else target
+            print(f"{name}: {describe_error(e)}")
+            if in_fd is not None:
+                os.close(in_fd)
+            return None
         
-        if not file_args:
-            print("rm: отсутствует операнд")
-            return
+        threads = []
+        procs = []
+        foreground = last = None
+        for i, argv in enumerate(stages):
+            next_in = None
+            if i == len(stages) - 1:
+                out_fd = out_final
+            else:
+                next_in, out_fd = os.pipe()
             
-        path = os.path.join(self.current_dir, file_args[0])
-        try:
-            if os.path.isdir(path):
-                if recursive:
-                    shutil.rmtree(path)
+            if argv[0] in self.commands:
+                if out_fd is None:
+                    # Последняя встроенная стадия выполняется в текущем потоке
+                    foreground = (argv, in_fd)
                 else:
-                    print(f"rm: невозможно удалить '{file_args[0]}': Это каталог")
+                    thread = threading.Thread(target=self.run_stage_thread, args=(argv, in_fd, out_fd),
+                                              daemon=True)
+                    thread.start()
+                    threads.append(thread)
+                    last = thread
             else:
-                os.remove(path)
-        except FileNotFoundError:
-            if not force:
-                print(f"rm: невозможно удалить '{file_args[0]}': Нет такого файла или каталога")
-        except PermissionError:
-            print(f"rm: невозможно удалить '{file_args[0]}': Отказано в доступе")
+                # фоновое задание — своя группа процессов (первая стадия создаёт её)
+                group = (job.pgid or 0) if background and job is not None else None
+                proc = last = self.spawn_process(argv, in_fd, out_fd, group)
+                if proc is not None:
+                    procs.append(proc)
+                    if job is not None:
+                        job.procs.append(proc)
+                        if group == 0:
+                            job.pgid = proc.pid
+                for fd in (in_fd, out_fd):
+                    if fd is not None:
+                        os.close(fd)
+            in_fd = next_in
+        return procs, threads, foreground, last
     
-    def copy_file(self, args):
-        """Реализация команды cp"""
-        if len(args) < 2:
-            print("cp: отсутствует операнд")
-            return
-            
-        src = os.path.join(self.current_dir, args[0])
-        dst = os.path.join(self.current_dir, args[1])
-        
+    def finish_pipeline(self, procs, threads, foreground, last):
+        """Выполнить последнюю встроенную стадию и дождаться остальных; вернуть код последней стадии"""
+        status = None
+        if foreground is not None:
+            status = self.run_stage(*foreground)
+        self.wait_processes(procs)
+        for thread in threads:
+            thread.join()
+        if status is not None:
+            return status
+        if last is None:
+            return 127
+        if isinstance(last, threading.Thread):
+            return getattr(last, 'status', 1)
+        return exit_status(last.returncode)
+    
+    def run_stage_thread(self, argv, in_fd, out_fd):
+        """run_stage в отдельном потоке: код завершения сохраняется в объекте потока"""
+        threading.current_thread().status = self.run_stage(argv, in_fd, out_fd)
+    
+    def run_stage(self, argv, in_fd, out_fd=None):
+        """Выполнить встроенную команду как стадию конвейера (закрывает переданные дескрипторы)
+
+        Возвращает код завершения команды.
+        """
+        stdin = os.fdopen(in_fd, 'r', encoding='utf-8', errors='surrogateescape') if in_fd is not None else None
+        stdout = os.fdopen(out_fd, 'w', encoding='utf-8') if out_fd is not None else None
         try:
-            if os.path.isdir(src):
-                shutil.copytree(src, dst)
-            else:
-                shutil.copy2(src, dst)
-        except FileNotFoundError:
-            print(f"cp: невозможно выполнить stat для '{args[0]}': Нет такого файла или каталога")
+            with redirect_stdio(stdin, stdout):
+                try:
+                    status = self.execute(argv)
+                except BrokenPipeError:
+                    status = 128 + signal.SIGPIPE
+                except Exception as e:
+                    print(f"Ошибка: {e}")
+                    status = 1
+        finally:
+            for stream in (stdout, stdin):
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except BrokenPipeError:
+                        pass
+        return status
     
-    def move_file(self, args):
-        """Реализация команды mv"""
-        if len(args) < 2:
-            print("mv: отсутствует операнд")
-            return
-            
-        src = os.path.join(self.current_dir, args[0])
-        dst = os.path.join(self.current_dir, args[1])
+    def start_job(self, command, stages, redirects):
+        """Запустить конвейер в фоне (команда с & в конце)
+
+        Чисто внешние конвейеры запускаются как асинхронные процессы без
+        ожидания; конвейеры со встроенными командами выполняются в пуле потоков.
+        Вывод задания идёт через канал и печатается только целыми строками.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        if not self.jobs:
+            self.job_counter = 0
+        self.job_counter += 1
+        job = Job(self.job_counter, command)
+        read_fd, write_fd = os.pipe()
+        target = sys.stdout.current() if isinstance(sys.stdout, ThreadLocalStream) else sys.stdout
+        job.pump = threading.Thread(target=pump_lines, args=(read_fd, target), daemon=True)
+        job.pump.start()
         
+        if any(argv[0] in self.commands for argv in stages):
+            if self.job_executor is None:
+                self.job_executor = ThreadPoolExecutor(32, thread_name_prefix='dsh-job')
+            job.future = self.job_executor.submit(self.run_job, stages, redirects, job, write_fd)
+            print(f"[{job.number}]")
+        else:
+            stdout = os.fdopen(write_fd, 'w', encoding='utf-8')
+            try:
+                with redirect_stdio(stdout=stdout):
+                    self.start_pipeline(stages, redirects, job, background=True)
+            finally:
+                stdout.close()
+            print(f"[{job.number}] {' '.join(str(p.pid) for p in job.procs)}")
+        self.jobs[job.number] = job
+    
+    def run_job(self, stages, redirects, job, write_fd):
+        """Выполнить фоновый конвейер в потоке пула"""
+        stdout = os.fdopen(write_fd, 'w', encoding='utf-8')
         try:
-            shutil.move(src, dst)
-        except FileNotFoundError:
-            print(f"mv: невозможно выполнить stat для '{args[0]}': Нет такого файла или каталога")
+            with redirect_stdio(stdout=stdout):
+                try:
+                    self.run_pipeline(stages, redirects, job, background=True)
+                except BrokenPipeError:
+                    pass
+                except Exception as e:
+                    report_error(f"Ошибка: {e}")
+        finally:
+            try:
+                stdout.close()
+            except BrokenPipeError:
+                pass
     
-    def touch_file(self, args):
-        """Реализация команды touch"""
-        if not args:
-            print("touch: отсутствует операнд")
-            return
-            
+    def find_job(self, spec, command):
+        """Найти задание по %n, %% или %+ (по умолчанию — последнее)"""
+        if not self.jobs:
+            report_error(f"{command}: нет текущего задания")
+            return None
+        if spec in (None, '%', '%%', '%+'):
+            return self.jobs[max(self.jobs)]
         try:
-            with open(os.path.join(self.current_dir, args[0]), 'a'):
-                os.utime(os.path.join(self.current_dir, args[0]), None)
-        except PermissionError:
-            print(f"touch: невозможно создать файл '{args[0]}': Отказано в доступе")
+            job = self.jobs.get(int(spec.lstrip('%')))
+        except ValueError:
+            job = None
+        if job is None:
+            report_error(f"{command}: {spec}: нет такого задания")
+        return job
     
-    def echo_text(self, args):
-        """Реализация команды echo"""
-        print(' '.join(args))
+    def report_jobs(self):
+        """Сообщить о завершившихся фоновых заданиях (перед приглашением)"""
+        for number in sorted(self.jobs):
+            job = self.jobs[number]
+            if job.done():
+                with OUTPUT_LOCK:
+                    print(f"[{number}]+  {job.status():<12} {job.command}")
+                del self.jobs[number]
     
-    def show_history(self):
-        """Показать историю команд"""
-        for i, cmd in enumerate(self.command_history[-20:], 1):
-            print(f"{i:4d}  {cmd}")
+    def show_jobs(self, args):
+        """Реализация команды jobs"""
+        latest = max(self.jobs) if self.jobs else None
+        for number in sorted(self.jobs):
+            job = self.jobs[number]
+            marker = '+' if number == latest else ' '
+            pids = f" {' '.join(str(p.pid) for p in job.procs)}" if '-l' in args and job.procs else ''
+            print(f"[{number}]{marker}{pids} {job.status():<12} {job.command}")
     
-    def find_files(self, args):
-        """Простая реализация команды find"""
-        if len(args) < 2:
-            print("Использование: find <путь> -name <шаблон>")
+    def wait_jobs(self, args):
+        """Реализация команды wait: дождаться заданий (по умолчанию — всех)"""
+        if args:
+            jobs = [self.find_job(spec, 'wait') for spec in args]
+        else:
+            jobs = [self.jobs[n] for n in sorted(self.jobs)]
+        for job in jobs:
+            if job is not None:
+                job.wait()
+        self.report_jobs()
+    
+    def foreground_job(self, args):
+        """Реализация команды fg: дождаться задания на переднем плане"""
+        job = self.find_job(args[0] if args else None, 'fg')
+        if job is None:
             return
-            
-        path = args[0]
-        pattern = args[2] if '-name' in args else '*'
-        
+        print(job.command)
         try:
-            for root, dirs, files in os.walk(os.path.join(self.current_dir, path)):
-                for file in files:
-                    if pattern in file or pattern == '*':
-                        print(os.path.join(root, file))
-        except FileNotFoundError:
-            print(f"find: '{path}': Нет такого файла или каталога")
+            with terminal_foreground(job.pgid):
+                job.wait()
+        except KeyboardInterrupt:
+            job.signal(signal.SIGINT)
+            if job.future is not None and not job.future.done():
+                print("fg: встроенные команды задания завершатся самостоятельно")
+            raise
+        self.jobs.pop(job.number, None)
     
-    def grep_text(self, args):
-        """Простая реализация команды grep"""
-        if len(args) < 2:
-            print("Использование: grep <шаблон> <файл>")
+    def kill_job(self, args):
+        """Реализация команды kill: сигнал заданию (%n) или процессу (pid)"""
+        sig = signal.SIGTERM
+        targets = []
+        args = iter(args)
+        for arg in args:
+            if arg == '-s':
+                arg = '-' + next(args, '')
+            if arg.startswith('-') and len(arg) > 1:
+                name = arg[1:].upper()
+                try:
+                    sig = signal.Signals(int(name)) if name.isdigit() else signal.Signals[
+                        name if name.startswith('SIG') else 'SIG' + name]
+                except (KeyError, ValueError):
+                    report_error(f"kill: {arg[1:]}: неверная спецификация сигнала")
+                    return
+            else:
+                targets.append(arg)
+        if not targets:
+            report_error("Использование: kill [-s сигнал | -сигнал] %задание | pid ...")
             return
-            
-        pattern = args[0]
-        filename = args[1]
         
-        try:
-            with open(os.path.join(self.current_dir, filename), 'r') as f:
-                for i, line in enumerate(f, 1):
-                    if pattern in line:
-                        print(f"{filename}:{i}: {line.strip()}")
-        except FileNotFoundError:
-            print(f"grep: {filename}: Нет такого файла или каталога")
-    
-    def execute_system_command(self, parts):
-        """Выполнение системных команд"""
-        try:
-            result = subprocess.run(parts, cwd=self.current_dir, capture_output=True, text=True)
-            if result.stdout:
-                print(result.stdout)
-            if result.stderr:
-                print(result.stderr, file=sys.stderr)
-        except FileNotFoundError:
-            print(f"{parts[0]}: команда не найдена")
+        for target in targets:
+            if target.startswith('%'):
+                job = self.find_job(target, 'kill')
+                if job is None:
+                    continue
+                if not job.signal(sig) and job.future is not None:
+                    report_error(f"kill: {target}: встроенные команды нельзя прервать сигналом")
+                continue
+            try:
+                os.kill(int(target), sig)
+            except ValueError:
+                report_error(f"kill: {target}: аргументы должны быть идентификаторами процессов или заданий")
+            except ProcessLookupError:
+                report_error(f"kill: ({target}) - Нет такого процесса")
+            except PermissionError:
+                report_error(f"kill: ({target}) - Операция не позволена")
     
-    def show_help(self):
+    def show_help(self, args=None):
         """Показать справку по командам"""
         help_text = """
 Доступные команды:
-  ls [опции] [dir] - список файлов (опции: -l подробно, -a все файлы)
+  ls [опции] [dir] - список файлов (опции: -l подробно, -a все файлы, -S по размеру,
+                   -t по времени, -r обратный порядок, -h размеры в K/M/G)
   cd [dir]         - сменить директорию
   pwd              - показать текущую директорию
-  cat <file>       - показать содержимое файла
+  cat [-nA] <file...> - показать содержимое файлов (-n номера строк, -A показать непечатаемые)
+  head [-n N] [-c N] [file...] - первые N строк (байт) файлов или ввода
+  tail [-n N] [-c N] [-f] [file...] - последние N строк (-n +N — начиная с N-й, -f — следить)
+  wc [-lwc] [file...] - число строк, слов и байт
+  sort [-nru] [-k N[,M]] [-t c] [-S размер] [-T dir] [--parallel N] [file...] - сортировка
+                   строк; не уместившееся в память (-S) — слиянием через временные файлы
+  uniq [-cdui] [file] - убрать подряд идущие повторы (-c число повторов, -d только
+                   повторяющиеся, -u только уникальные, -i без учёта регистра)
+  gzip [-dckfv] [-1..-9] [-p N] [file...] - сжать в N потоках (file -> file.gz; -d или
+                   gunzip — распаковать, -c в stdout, -k оставить исходный)
+  tar -c|-x|-t [-zv] [-f архив] [-C dir] [file...] - создать, распаковать, показать архив
+                   (-z gzip в несколько потоков; без -f — stdout/stdin, потоком)
   mkdir <dir>      - создать директорию
-  rm [опции] <file> - удалить файл (опции: -r рекурсивно, -f принудительно)
-  cp <src> <dst>   - копировать файл/директорию
+  rm [опции] <file...> - удалить файлы, поддерживаются шаблоны *?[] (опции: -r рекурсивно,
+                   -f принудительно, -v статистика)
+  cp [-r] [-n] [-u] [-v] [--resume] <src...> <dst> - копировать файлы/каталоги
+                   (-n не перезаписывать, -u только новее, --resume пропускать одинаковые)
   mv <src> <dst>   - переместить файл/директорию
   touch <file>     - создать файл
   echo <text>      - вывести текст
   clear            - очистить экран
   whoami           - показать имя пользователя
-  history          - показать историю команд
-  find <path> -name <pattern> - найти файлы
-  grep <pattern> <file> - поиск текста в файле
+  history [N] [-s шаблон] [--compact] - последние N команд, поиск по regex, уплотнение файла
+  find [path...] [выражение] - найти файлы (-name/-iname, -type, -size, -mtime,
+                   -maxdepth, <условие> -prune -o <условие>, -index — по индексу locate)
+  updatedb [-f] [-r] [path...] - обновить индекс имён (path добавляется к корням,
+                   -r — заменить корни, -f — полная перестройка)
+  locate [-i] [-r] [-c] [-l N] <pattern> - найти файлы по индексу
+  du [-shv] [--max-depth N] [-n N] [--cache] [путь...] - занятое место (-s только итог,
+                   -h в K/M/G, -n N крупнейших, --cache — кэш каталогов по inode и mtime)
+  sha256sum, md5sum [-c] [--quiet] [файл...] - контрольные суммы (-c — проверить по списку)
+  treehash [-l] [--no-cache] <путь...> - Merkle-хэш дерева (-l — хэши всех записей);
+                   treehash --diff A B — различающиеся пути (M изменён, - только в A, + только в B)
+  grep [-rEilc] <pattern> <file...> - поиск текста (-r рекурсивно, -E regex, -i без регистра,
+                   -l только имена, -c количество)
   neofetch         - показать информацию о системе
+  top [-d сек] [-n кадров] [-b] - загрузка CPU, память и процессы (monitor — то же)
   nano <file>      - текстовый редактор
   exit             - выйти из терминала
   help             - показать эту справку
+  <команда> &      - выполнить в фоне
+  jobs [-l]        - список фоновых заданий
+  wait [%n...]     - дождаться заданий
+  fg [%n]          - дождаться задания на переднем плане
+  kill [-сигнал] %n|pid - послать сигнал заданию или процессу
+  hash [-r] [имя...] - кэш путей внешних команд (-r — очистить)
+  time <команда>   - время выполнения: реальное, CPU, пиковый RSS
+  stats [on|off|reset] - вызовы и задержки (p50/p95/p99) по командам
+  profile [-m] [-n N] <команда> - горячие точки cProfile (-m — память, tracemalloc)
   
-Также поддерживаются системные команды (python, pip, etc.)
+Также поддерживаются системные команды (python, pip, etc.),
+конвейеры и перенаправления: cmd1 | cmd2, cmd > file, cmd >> file, cmd < file
 """
         print(help_text)
     
+    def run_batch(self, lines):
+        """Пакетный режим: команды из скрипта, -c или stdin без приглашения и readline
+
+        Возвращает код завершения последней команды (или заданный exit N).
+        """
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            self.run_command(line)
+            if not self.running:
+                break
+        # Пакетный режим дожидается фоновых заданий перед выходом
+        status = self.status
+        self.wait_jobs([])
+        sys.stdout.flush()
+        return status
+    
     def run(self):
         """Основной цикл терминала"""
+        # readline нужен с первого приглашения (редактирование строки, стрелки, Ctrl+R, Tab)
+        load_readline()
+        self.load_history()
+        Completer(self).install(readline)
         print("Добро пожаловать в DoyarkaTerminal!")
         print("Введите 'help' для списка команд, 'exit' для выхода\n")
         
         while self.running:
             try:
+                self.report_jobs()
                 command = input(self.display_prompt())
+                self.trim_readline_history()
                 self.run_command(command)
             except KeyboardInterrupt:
                 print("\nИспользуйте 'exit' для выхода")
             except EOFError:
                 print("\nВыход...")
                 break
+    
+    # Таблица встроенных команд: имя -> функция(терминал, аргументы).
+    # Плагины расширяют её через register_command.
+    commands = {
+        "exit": exit_terminal,
+        "pwd": print_working_directory,
+        "ls": list_files,
+        "cd": change_directory,
+        "cat": cat_file,
+        "mkdir": make_directory,
+        "rm": remove_file,
+        "cp": copy_file,
+        "mv": move_file,
+        "touch": touch_file,
+        "echo": echo_text,
+        "clear": clear_screen,
+        "whoami": show_username,
+        "history": show_history,
+        "find": find_files,
+        "updatedb": update_locate_db,
+        "locate": locate_files,
+        "grep": grep_text,
+        "neofetch": neofetch,
+        "nano": nano_editor,
+        "help": show_help,
+        "jobs": show_jobs,
+        "wait": wait_jobs,
+        "fg": foreground_job,
+        "kill": kill_job,
+        "time": time_command,
+        "stats": show_stats,
+        "profile": profile_command,
+        "hash": hash_command,
+        "du": disk_usage_command,
+        "top": top_command,
+        "monitor": top_command,
+        "sha256sum": sha256sum,
+        "md5sum": md5sum,
+        "treehash": treehash_command,
+        "head": head_command,
+        "tail": tail_command,
+        "wc": wc_command,
+        "sort": sort_command,
+        "uniq": uniq_command,
+        "gzip": gzip_command,
+        "gunzip": gunzip_command,
+        "tar": tar_command,
+    }
+
+
+def register_command(name):
+    """Декоратор для регистрации новой встроенной команды (для плагинов)
+
+    Функция получает экземпляр терминала и список аргументов:
+
+        @register_command("hello")
+        def hello(terminal, args):
+            print("Привет,", terminal.username)
+    """
+    def decorator(func):
+        DoyarkaTerminal.commands[name] = func
+        return func
+    return decorator
+
+
+# Протокол сервера: кадр = тип (1 байт) + длина (4 байта, big-endian) + данные.
+# Клиент шлёт H (приветствие, JSON), C (команда), S (запрос статистики);
+# сервер отвечает O (вывод команды), E (её stderr), D (команда завершена:
+# JSON с кодом завершения status и признаком running — сеанс не закрыт exit),
+# S (статистика, JSON).
+FRAME_HEADER = struct.Struct('>cI')
+
+
+def fallback_socket_dir():
+    """Личный каталог сокета (0700) в /tmp, когда нет XDG_RUNTIME_DIR"""
+    return os.path.join('/tmp', f"dsh-{os.getuid()}")
+
+
+def default_socket_path():
+    """Путь к сокету сервера по умолчанию"""
+    if os.environ.get('DSH_SOCKET'):
+        return os.environ['DSH_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"dsh-{os.getuid()}.sock")
+    return os.path.join(fallback_socket_dir(), 'dsh.sock')
+
+
+def prepare_socket_path(path):
+    """Подготовить путь сокета к bind; вернуть текст ошибки или None
+
+    Отвечающий сервер не подменяется; файл удаляется, только если это
+    сокет, к которому никто не подключён (остался от упавшего сервера).
+    Каталог /tmp/dsh-<uid> создаётся с правами 0700 и должен быть своим.
+    """
+    import socket
+    directory = os.path.dirname(path)
+    if directory == fallback_socket_dir():
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            return f"{directory}: {describe_error(e)}"
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            return f"{directory}: небезопасный каталог (нужен свой каталог с правами 0700)"
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISSOCK(st.st_mode):
+        return f"{path}: файл существует и не является сокетом"
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(1)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return None
+    except OSError as e:
+        return f"{path}: {describe_error(e)}"
+    finally:
+        probe.close()
+    return f"сервер уже запущен на {path}"
+
+
+def encode_frame(kind, payload=b''):
+    """Упаковать кадр протокола"""
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+class ServerStats:
+    """Счётчики сервера: соединения, команды, объём вывода и задержки"""
+    
+    def __init__(self):
+        self.started = time.time()
+        self.connections = 0
+        self.active = 0
+        self.commands = 0
+        self.bytes_out = 0
+        self.latencies = deque(maxlen=10000)
+        self.recent = deque()
+    
+    def record(self, latency, size):
+        now = time.time()
+        self.commands += 1
+        self.bytes_out += size
+        self.latencies.append(latency)
+        self.recent.append(now)
+        while self.recent and self.recent[0] < now - 60:
+            self.recent.popleft()
+    
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+        uptime = time.time() - self.started
+        return {
+            'uptime_s': round(uptime, 1),
+            'connections_total': self.connections,
+            'connections_active': self.active,
+            'commands_total': self.commands,
+            'bytes_out': self.bytes_out,
+            'commands_per_s_1m': round(len(self.recent) / min(60.0, max(uptime, 1e-9)), 2),
+            'latency_ms': {'p50': round(percentile(ordered, 0.50) * 1000, 3),
+                           'p95': round(percentile(ordered, 0.95) * 1000, 3),
+                           'p99': round(percentile(ordered, 0.99) * 1000, 3),
+                           'max': round(ordered[-1] * 1000, 3) if ordered else 0.0},
+        }
+
+
+class DshServer:
+    """Сервер с тёплыми сеансами DoyarkaTerminal за Unix-сокетом
+
+    Каждое соединение получает свой сеанс (или именованный сеанс, который
+    переживает соединение); команды выполняются в пуле потоков, их вывод
+    идёт через канал и пересылается клиенту кадрами по мере появления.
+    """
+    
+    def __init__(self, socket_path, workers=32):
+        from concurrent.futures import ThreadPoolExecutor
+        self.socket_path = socket_path
+        self.executor = ThreadPoolExecutor(workers)
+        self.sessions = {}
+        self.stats = ServerStats()
+        self.bound = False
+    
+    def serve(self):
+        """Запустить сервер до прерывания; вернуть код завершения"""
+        import asyncio
+        error = prepare_socket_path(self.socket_path)
+        if error:
+            print(f"dsh: {error}", file=sys.stderr)
+            self.executor.shutdown(wait=False)
+            return 1
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=False)
+            # Удаляется только свой сокет, а не сокет другого сервера
+            if self.bound and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        return 0
+    
+    async def serve_forever(self):
+        import asyncio
+        # Сокет создаётся сразу с правами 0600: без окна между bind и chmod
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        finally:
+            os.umask(umask)
+        self.bound = True
+        print(f"dsh: сервер слушает {self.socket_path}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    
+    def open_session(self, hello):
+        """Создать сеанс или вернуть именованный: (терминал, блокировка, имя)"""
+        import asyncio
+        name = hello.get('session')
+        if name and name in self.sessions:
+            return self.sessions[name] + (name,)
+        terminal = DoyarkaTerminal(interactive=False)
+        terminal.owns_cwd = False
+        cwd = hello.get('cwd')
+        if cwd and os.path.isdir(cwd):
+            terminal.current_dir = cwd
+        session = (terminal, asyncio.Lock())
+        if name:
+            self.sessions[name] = session
+        return session + (name,)
+    
+    async def handle_client(self, reader, writer):
+        import asyncio
+        import json
+        self.stats.connections += 1
+        self.stats.active += 1
+        session = None
+        try:
+            while True:
+                try:
+                    kind, size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                    payload = await reader.readexactly(size)
+                except asyncio.IncompleteReadError:
+                    break
+                if kind == b'H':
+                    session = self.open_session(json.loads(payload))
+                elif kind == b'C':
+                    if session is None:
+                        session = self.open_session({})
+                    terminal, lock, name = session
+                    async with lock:
+                        await self.run_command(terminal, payload.decode('utf-8', 'surrogateescape'), writer)
+                    if not terminal.running and name:
+                        self.sessions.pop(name, None)
+                elif kind == b'S':
+                    writer.write(encode_frame(b'S', json.dumps(self.stats.snapshot()).encode()))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.stats.active -= 1
+            writer.close()
+    
+    async def run_command(self, terminal, command, writer):
+        """Выполнить команду в пуле и переслать её вывод и stderr клиенту"""
+        import asyncio
+        import json
+        loop = asyncio.get_running_loop()
+        lock = asyncio.Lock()
+        
+        async def forward(read_fd, kind):
+            # Кадры O и E идут в один сокет: запись и drain под общей блокировкой
+            pipe_reader = asyncio.StreamReader()
+            transport, _ = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(pipe_reader), os.fdopen(read_fd, 'rb', 0))
+            size = 0
+            try:
+                while True:
+                    data = await pipe_reader.read(CHUNK_SIZE)
+                    if not data:
+                        return size
+                    size += len(data)
+                    async with lock:
+                        writer.write(encode_frame(kind, data))
+                        await writer.drain()
+            finally:
+                # Закрытие канала снимает блокировку пишущего потока, если клиент ушёл
+                transport.close()
         
-        self.save_history()
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        started = time.perf_counter()
+        task = loop.run_in_executor(self.executor, self.execute, terminal, command, out_write, err_write)
+        forwarders = [asyncio.ensure_future(forward(out_read, b'O')),
+                      asyncio.ensure_future(forward(err_read, b'E'))]
+        try:
+            sizes = await asyncio.gather(*forwarders)
+        finally:
+            for forwarder in forwarders:
+                forwarder.cancel()
+            status = await task
+        self.stats.record(time.perf_counter() - started, sum(sizes))
+        done = {'status': status, 'running': terminal.running}
+        writer.write(encode_frame(b'D', json.dumps(done).encode()))
+        await writer.drain()
+    
+    @staticmethod
+    def execute(terminal, command, write_fd, err_fd):
+        """Выполнить команду сеанса; внешние программы получают /dev/null на stdin
 
-if __name__ == "__main__":
+        Возвращает код завершения команды.
+        """
+        stdout = os.fdopen(write_fd, 'w', encoding='utf-8')
+        stderr = os.fdopen(err_fd, 'w', encoding='utf-8', errors='surrogateescape')
+        stdin = open(os.devnull, 'r')
+        try:
+            with redirect_stdio(stdin, stdout, stderr):
+                terminal.run_command(command)
+            return terminal.status
+        except BrokenPipeError:
+            return 128 + signal.SIGPIPE
+        finally:
+            stdin.close()
+            for stream in (stdout, stderr):
+                try:
+                    stream.close()
+                except BrokenPipeError:
+                    pass
+
+
+def run_client(socket_path, commands, session=None, show_stats=False):
+    """Тонкий клиент: переслать команды серверу и вывести поток ответа"""
+    import json
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        print(f"dsh: не удалось подключиться к {socket_path}: {describe_error(e)}", file=sys.stderr)
+        return 1
+    
+    with sock, sock.makefile('rb') as stream:
+        def read_frame():
+            header = stream.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                raise ConnectionError("сервер закрыл соединение")
+            kind, size = FRAME_HEADER.unpack(header)
+            return kind, stream.read(size)
+        
+        hello = {'cwd': os.getcwd(), 'session': session}
+        sock.sendall(encode_frame(b'H', json.dumps(hello).encode()))
+        if show_stats:
+            sock.sendall(encode_frame(b'S'))
+            print(json.dumps(json.loads(read_frame()[1]), indent=2, ensure_ascii=False))
+            return 0
+        
+        out = sys.stdout.buffer
+        err = sys.stderr.buffer
+        status = 0
+        for command in commands:
+            command = command.rstrip('\n')
+            if not command.strip():
+                continue
+            sock.sendall(encode_frame(b'C', command.encode('utf-8', 'surrogateescape')))
+            while True:
+                kind, payload = read_frame()
+                if kind == b'D':
+                    break
+                if kind == b'E':
+                    out.flush()
+                    err.write(payload)
+                    err.flush()
+                else:
+                    out.write(payload)
+            out.flush()
+            # Код последней команды — как в локальном -c; exit завершает сеанс
+            done = json.loads(payload) if payload else {}
+            status = done.get('status', 0)
+            if not done.get('running', True):
+                break
+    return status
+
+
+STARTUP_PROBE = r'''
+import json, sys, time
+marks = [time.perf_counter()]
+sys.path.insert(0, {root!r})
+import dsh
+marks.append(time.perf_counter())
+terminal = dsh.DoyarkaTerminal()
+marks.append(time.perf_counter())
+dsh.load_readline()
+marks.append(time.perf_counter())
+terminal.load_history()
+marks.append(time.perf_counter())
+terminal.display_prompt()
+marks.append(time.perf_counter())
+print(json.dumps(marks))
+'''
+STARTUP_PHASES = ("import dsh", "DoyarkaTerminal()", "import readline", "история readline", "приглашение")
+
+
+def parse_importtime(text):
+    """Разобрать вывод python -X importtime: [(глубина, имя, собственное, накопленное) в мкс]"""
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        stripped = name.lstrip(' ')
+        entries.append(((len(name) - len(stripped) - 1) // 2, stripped, int(own), int(cumulative)))
+    return entries
+
+
+def startup_profile():
+    """dsh --startup-profile: время запуска по этапам и самые дорогие импорты"""
+    import json
+    import subprocess
+    probe = STARTUP_PROBE.format(root=os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                            capture_output=True, text=True)
+    total = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr, end='')
+        return 1
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    phases = [(name, marks[i + 1] - marks[i]) for i, name in enumerate(STARTUP_PHASES)]
+    
+    print("Этапы запуска, мс:")
+    print(f"  {'интерпретатор, site и выход':<30} {(total - (marks[-1] - marks[0])) * 1000:>8.1f}")
+    for name, elapsed in phases:
+        print(f"  {name:<30} {elapsed * 1000:>8.1f}")
+    print(f"  {'всего':<30} {total * 1000:>8.1f}")
+    
+    # Запускаемый скрипт Python не кэширует в __pycache__: python dsh.py
+    # каждый раз компилирует весь файл, python -m dsh берёт готовый байткод
+    with open(__file__, 'rb') as f:
+        source = f.read()
+    started = time.perf_counter()
+    compile(source, __file__, 'exec')
+    print(f"  {'+ компиляция при python dsh.py':<30} {(time.perf_counter() - started) * 1000:>8.1f}"
+          "  (python -m dsh — без неё)")
+    
+    # importtime печатает модуль после всех его зависимостей: прямые импорты
+    # dsh — записи глубины 1 между предыдущей записью глубины 0 и самим dsh
+    entries = parse_importtime(result.stderr)
+    position = next(i for i, entry in enumerate(entries) if entry[:2] == (0, 'dsh'))
+    start = position
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    direct = [entry for entry in entries[start:position] if entry[0] == 1]
+    later = [entry for entry in entries[position + 1:] if entry[0] == 0]
+    print("\nИмпорты при загрузке dsh (накопленное время, мс):")
+    for _, name, _, cumulative in sorted(direct, key=lambda entry: -entry[3])[:15]:
+        print(f"  {name:<30} {cumulative / 1000:>8.1f}")
+    print(f"  {'dsh (собственное)':<30} {entries[position][2] / 1000:>8.1f}")
+    if later:
+        print("\nИмпорты после загрузки dsh, мс:")
+        for _, name, _, cumulative in later:
+            print(f"  {name:<30} {cumulative / 1000:>8.1f}")
+    return 0
+
+
+def main(argv=None):
+    """Точка входа: интерактивный режим, -c <команды>, файл скрипта, stdin, сервер или клиент"""
+    argv = sys.argv[1:] if argv is None else argv
+    options = {}
+    operands = []
+    args = iter(argv)
+    for arg in args:
+        if arg in ('--server', '--client', '--stats', '--startup-profile'):
+            options[arg] = True
+        elif arg in ('-c', '--socket', '--session'):
+            options[arg] = next(args, None)
+            if options[arg] is None:
+                print(f"dsh: {arg}: требуется аргумент", file=sys.stderr)
+                return 2
+        else:
+            operands.append(arg)
+    
+    if '--startup-profile' in options:
+        return startup_profile()
+    
+    # Плагины импортируют dsh; при запуске как скрипта это должен быть тот же модуль
+    sys.modules.setdefault('dsh', sys.modules[__name__])
+    for module in filter(None, os.environ.get('DSH_PLUGINS', '').split(',')):
+        __import__(module.strip())
+    
+    socket_path = options.get('--socket') or default_socket_path()
+    if '--server' in options:
+        return DshServer(socket_path).serve()
+    if '--client' in options:
+        if '-c' in options:
+            commands = options['-c'].splitlines()
+        else:
+            commands = sys.stdin
+        return run_client(socket_path, commands, options.get('--session'), '--stats' in options)
+    
+    if '-c' in options:
+        return DoyarkaTerminal(interactive=False).run_batch(options['-c'].splitlines())
+    if operands:
+        try:
+            f = open(operands[0], 'r', encoding='utf-8')
+        except OSError as e:
+            print(f"dsh: {operands[0]}: {describe_error(e)}", file=sys.stderr)
+            return 127 if isinstance(e, FileNotFoundError) else 126
+        with f:
+            return DoyarkaTerminal(interactive=False).run_batch(f)
+    if not sys.stdin.isatty():
+        return DoyarkaTerminal(interactive=False).run_batch(sys.stdin)
     terminal = DoyarkaTerminal()
     terminal.run()
+    return terminal.status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Пакетный режим: -c, файл скрипта, stdin, код возврата последней команды, плагины.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+
+
+def run(command):
+    return subprocess.run([sys.executable, DSH, '-c', command],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+
+class ExitStatusTest(unittest.TestCase):
+    def test_external_returncode(self):
+        self.assertEqual(run('true'), 0)
+        self.assertEqual(run('false'), 1)
+        self.assertEqual(run('sh -c "exit 7"'), 7)
+    
+    def test_builtin_error(self):
+        self.assertEqual(run('cat /nonexistent/file'), 1)
+        self.assertEqual(run('cd /'), 0)
+    
+    def test_last_command_wins(self):
+        self.assertEqual(run('false\ntrue'), 0)
+        self.assertEqual(run('true\nfalse'), 1)
+    
+    def test_missing_command_and_exit(self):
+        self.assertEqual(run('nosuchcommand_dsh_test'), 127)
+        self.assertEqual(run('exit 3'), 3)
+
+
+class BatchInputTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def dsh(self, *args, stdin=None, env=None):
+        return subprocess.run([sys.executable, DSH, *args], input=stdin, capture_output=True,
+                              cwd=self.tmp.name, env=env, timeout=30)
+    
+    def test_script_and_stdin(self):
+        script = os.path.join(self.tmp.name, 'script.dsh')
+        with open(script, 'w') as f:
+            f.write('# комментарий\necho one\n\necho two\n')
+        self.assertEqual(self.dsh(script).stdout, b'one\ntwo\n')
+        self.assertEqual(self.dsh(stdin=b'echo three\n').stdout, b'three\n')
+        self.assertEqual(self.dsh('missing.dsh').returncode, 127)
+    
+    def test_plugin_command(self):
+        with open(os.path.join(self.tmp.name, 'dsh_hello.py'), 'w') as f:
+            f.write('import dsh\n\n'
+                    '@dsh.register_command("hello")\n'
+                    'def hello(terminal, args):\n'
+                    '    print("hello", *args)\n')
+        env = dict(os.environ, DSH_PLUGINS='dsh_hello', PYTHONPATH=self.tmp.name)
+        self.assertEqual(self.dsh('-c', 'hello world', env=env).stdout, b'hello world\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
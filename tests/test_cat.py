@@ -0,0 +1,66 @@
+"""cat: двоичные данные без изменений, -n/-A, несколько файлов, ошибки.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+def capture(func, *args):
+    """Вывод встроенной команды; stdout — настоящий файл, как у терминала"""
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as out:
+        with contextlib.redirect_stdout(out):
+            func(list(args))
+        out.flush()
+        out.seek(0)
+        return out.buffer.read()
+
+
+class CatTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.write('a.txt', b'one\ntwo\n')
+        self.write('b.txt', b'three\tx\x01\n')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, name, data):
+        with open(os.path.join(self.tmp.name, name), 'wb') as f:
+            f.write(data)
+    
+    def cat(self, *args):
+        return capture(self.terminal.cat_file, *args)
+    
+    def test_binary_unchanged(self):
+        data = bytes(range(256)) * 5000 + b'\xff\xfe\x00'
+        self.write('bin', data)
+        self.assertEqual(self.cat('bin'), data)
+    
+    def test_multiple_files(self):
+        self.assertEqual(self.cat('a.txt', 'b.txt'), b'one\ntwo\nthree\tx\x01\n')
+    
+    def test_number_lines_across_files(self):
+        self.assertEqual(self.cat('-n', 'a.txt', 'b.txt'),
+                         b'     1\tone\n     2\ttwo\n     3\tthree\tx\x01\n')
+    
+    def test_show_all(self):
+        self.assertEqual(self.cat('-A', 'b.txt'), b'three^Ix^A$\n')
+    
+    def test_missing_file_does_not_stop_others(self):
+        output = self.cat('missing', 'a.txt')
+        self.assertIn('cat: missing: Нет такого файла или каталога'.encode(), output)
+        self.assertIn(b'one\ntwo\n', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""sha256sum/md5sum (в том числе -c) и treehash: сверка с hashlib и системными утилитами
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dsh
+from dsh import DoyarkaTerminal, hash_file, hash_files, tree_hash
+
+
+class ChecksumTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.work = self.tmp.name
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.work
+        self.terminal.treehash_cache = os.path.join(self.work, 'treehash.cache')
+        self.contents = {f'file{i}.bin': os.urandom(i * 997) for i in range(40)}
+        for name, data in self.contents.items():
+            self.write(name, data)
+    
+    def write(self, name, data):
+        path = os.path.join(self.work, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    
+    def run_builtin(self, method, *args):
+        """Вывод встроенной команды и признак ошибки"""
+        dsh.BUILTIN_STATUS.failed = False
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            method(list(args))
+        return out.getvalue(), dsh.BUILTIN_STATUS.failed
+    
+    def test_hash_file_mmap_slices(self):
+        path = self.write('big.bin', os.urandom(300000))
+        with open(path, 'rb') as f:
+            expected = hashlib.sha256(f.read()).digest()
+        # через mmap срезами по 64 КБ
+        with mock.patch.multiple(dsh, HASH_MMAP_THRESHOLD=1000, HASH_MMAP_STEP=65536):
+            self.assertEqual(hash_file(path, hashlib.sha256), expected)
+        self.assertEqual(hash_file(path, hashlib.sha256), expected)
+    
+    def test_hash_files_keeps_order(self):
+        names = sorted(self.contents) + ['missing']
+        results = list(hash_files((os.path.join(self.work, n) for n in names), hashlib.md5, workers=3))
+        self.assertEqual([os.path.basename(path) for path, _, _ in results], names)
+        for name, (_, digest, error) in zip(names[:-1], results):
+            self.assertIsNone(error)
+            self.assertEqual(digest, hashlib.md5(self.contents[name]).digest())
+        self.assertIsInstance(results[-1][2], FileNotFoundError)
+    
+    def test_sha256sum_and_md5sum(self):
+        names = sorted(self.contents)
+        output, failed = self.run_builtin(self.terminal.sha256sum, *names)
+        self.assertFalse(failed)
+        self.assertEqual(output, ''.join(f"{hashlib.sha256(self.contents[n]).hexdigest()}  {n}\n"
+                                         for n in names))
+        output, failed = self.run_builtin(self.terminal.md5sum, names[1], 'missing')
+        self.assertTrue(failed)
+        self.assertIn(f"{hashlib.md5(self.contents[names[1]]).hexdigest()}  {names[1]}", output)
+        self.assertIn('md5sum: missing:', output)
+    
+    @unittest.skipUnless(shutil.which('sha256sum'), 'нет системного sha256sum')
+    def test_matches_system_sha256sum(self):
+        names = sorted(self.contents)
+        output, _ = self.run_builtin(self.terminal.sha256sum, *names)
+        result = subprocess.run(['sha256sum', *names], cwd=self.work, capture_output=True, text=True)
+        self.assertEqual(output, result.stdout)
+    
+    def test_check(self):
+        names = sorted(self.contents)[:3]
+        manifest, _ = self.run_builtin(self.terminal.sha256sum, *names)
+        self.write('SUMS', manifest.encode() + b'not a checksum line\n')
+        output, failed = self.run_builtin(self.terminal.sha256sum, '-c', 'SUMS')
+        self.assertEqual(output.split('\n')[:3], [f'{n}: OK' for n in names])
+        self.assertIn('строк в неверном формате: 1', output)
+        self.assertTrue(failed)
+        
+        self.write('SUMS', manifest.encode())
+        self.write(names[1], b'changed')
+        os.remove(os.path.join(self.work, names[2]))
+        output, failed = self.run_builtin(self.terminal.sha256sum, '--check', '--quiet', 'SUMS')
+        self.assertTrue(failed)
+        self.assertNotIn(f'{names[0]}: OK', output)
+        self.assertIn(f'{names[1]}: НЕ СОВПАДАЕТ', output)
+        self.assertIn(f'{names[2]}: ошибка чтения', output)
+
+
+class TreeHashTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.terminal.treehash_cache = os.path.join(self.tmp.name, 'treehash.cache')
+        for tree in ('a', 'b'):
+            self.make_tree(os.path.join(self.tmp.name, tree))
+    
+    def make_tree(self, root):
+        for name, data in (('x.txt', b'x'), ('sub/y.txt', b'y'), ('sub/deep/z.txt', b'z')):
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        os.symlink('x.txt', os.path.join(root, 'link'))
+    
+    def digest(self, tree):
+        return tree_hash(os.path.join(self.tmp.name, tree))['digests']['']
+    
+    def test_same_content_same_hash(self):
+        self.assertEqual(self.digest('a'), self.digest('b'))
+        result = tree_hash(os.path.join(self.tmp.name, 'a'))
+        self.assertEqual(sorted(result['digests']),
+                         ['', 'link', 'sub', 'sub/deep', 'sub/deep/z.txt', 'sub/y.txt', 'x.txt'])
+        self.assertEqual(result['errors'], [])
+    
+    def test_changes_change_hash(self):
+        before = self.digest('b')
+        changes = [lambda root: os.chmod(os.path.join(root, 'x.txt'), 0o755),
+                   lambda root: os.rename(os.path.join(root, 'x.txt'), os.path.join(root, 'w.txt')),
+                   lambda root: os.mkdir(os.path.join(root, 'sub', 'deep', 'new'))]
+        for change in changes:
+            change(os.path.join(self.tmp.name, 'b'))
+            after = self.digest('b')
+            self.assertNotEqual(after, before)
+            before = after
+    
+    def test_diff(self):
+        with open(os.path.join(self.tmp.name, 'b', 'sub', 'deep', 'z.txt'), 'wb') as f:
+            f.write(b'changed')
+        os.remove(os.path.join(self.tmp.name, 'b', 'x.txt'))
+        open(os.path.join(self.tmp.name, 'b', 'sub', 'new.txt'), 'w').close()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            self.terminal.treehash_command(['--diff', 'a', 'b'])
+        self.assertEqual(sorted(out.getvalue().splitlines()),
+                         ['+ sub/new.txt', '- x.txt', 'M sub/deep/z.txt'])
+    
+    def test_cache_skips_unchanged_files(self):
+        root = os.path.join(self.tmp.name, 'a')
+        with mock.patch.object(dsh, 'TREEHASH_RACY_WINDOW', 0):
+            first = tree_hash(root, {})
+            self.assertEqual((first['hashed'], first['cached']), (3, 0))
+            second = tree_hash(root, first['fresh'])
+            self.assertEqual((second['hashed'], second['cached']), (0, 3))
+            self.assertEqual(second['digests'], first['digests'])
+        # только что изменённый файл в кэш не попадает
+        self.assertEqual(tree_hash(root, {})['fresh'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Автодополнение: команды и пути, кэш содержимого каталогов с проверкой по mtime
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import Completer, DirectoryListings, DoyarkaTerminal
+
+
+def touch(path, mode=0o644):
+    with open(path, 'w'):
+        pass
+    os.chmod(path, mode)
+
+
+def bump_mtime(directory):
+    """Сдвинуть mtime каталога заведомо (грубые отметки времени ФС не мешают)"""
+    st = os.stat(directory)
+    os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+class DirectoryListingsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name in ('alpha', 'alpine', 'beta'):
+            touch(os.path.join(self.tmp.name, name))
+        os.mkdir(os.path.join(self.tmp.name, 'album'))
+    
+    def test_prefix_and_directories(self):
+        listings = DirectoryListings()
+        self.assertEqual(listings.complete(self.tmp.name, 'al'),
+                         [('album', True), ('alpha', False), ('alpine', False)])
+        self.assertEqual(listings.complete(self.tmp.name, 'x'), [])
+        self.assertEqual(listings.complete(os.path.join(self.tmp.name, 'missing'), ''), [])
+    
+    def test_revalidated_by_mtime(self):
+        listings = DirectoryListings()
+        listings.complete(self.tmp.name, 'b')
+        touch(os.path.join(self.tmp.name, 'bravo'))
+        bump_mtime(self.tmp.name)
+        self.assertEqual(listings.complete(self.tmp.name, 'b'), [('beta', False), ('bravo', False)])
+    
+    def test_bounded(self):
+        listings = DirectoryListings()
+        listings.MAX_DIRS = 2
+        dirs = [tempfile.mkdtemp(dir=self.tmp.name) for _ in range(4)]
+        for directory in dirs:
+            listings.complete(directory, '')
+        self.assertEqual(list(listings.entries), dirs[2:])
+        listings.MAX_NAMES = 3
+        listings.complete(self.tmp.name, '')
+        self.assertEqual(list(listings.entries), [self.tmp.name])
+        self.assertEqual(listings.names, len(os.listdir(self.tmp.name)))
+
+
+class CompleterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bin = os.path.join(self.tmp.name, 'bin')
+        self.work = os.path.join(self.tmp.name, 'work')
+        os.mkdir(self.bin)
+        os.makedirs(os.path.join(self.work, 'src', 'main'))
+        touch(os.path.join(self.bin, 'catalyst'), 0o755)
+        touch(os.path.join(self.bin, 'catnap'))
+        touch(os.path.join(self.work, 'src', 'main.py'))
+        touch(os.path.join(self.work, '.hidden'))
+        touch(os.path.join(self.work, 'notes.txt'))
+        patcher = mock.patch.dict(os.environ, {'PATH': self.bin})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        terminal = DoyarkaTerminal()
+        terminal.current_dir = self.work
+        self.completer = Completer(terminal, DirectoryListings())
+    
+    def test_command_names(self):
+        self.assertEqual(self.completer.candidates('cat', ''), ['cat', 'catalyst'])
+        self.assertEqual(self.completer.candidates('catal', 'ls | '), ['catalyst '])
+        self.assertEqual(self.completer.candidates('catal', 'time '), ['catalyst '])
+    
+    def test_paths(self):
+        self.assertEqual(self.completer.candidates('src/ma', 'ls '), ['src/main/', 'src/main.py'])
+        self.assertEqual(self.completer.candidates('no', 'cat '), ['notes.txt '])
+        self.assertEqual(self.completer.candidates('', 'ls '), ['notes.txt', 'src/'])
+        self.assertEqual(self.completer.candidates('.h', 'ls '), ['.hidden '])
+        self.assertEqual(self.completer.candidates('./no', ''), ['./notes.txt '])
+
+
+if __name__ == '__main__':
+    unittest.main()
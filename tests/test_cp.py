@@ -0,0 +1,101 @@
+"""cp: файлы, каталоги, -r/-n/-u, отказ копировать файл сам на себя
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dsh
+from dsh import DoyarkaTerminal
+
+
+class CopyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.work = self.tmp.name
+        self.write('a.txt', 'alpha\n')
+        self.write('tree/one', '1')
+        self.write('tree/sub/two', '22')
+        os.symlink('one', os.path.join(self.work, 'tree', 'link'))
+        self.terminal = DoyarkaTerminal(interactive=False)
+        self.terminal.owns_cwd = False
+        self.terminal.current_dir = self.work
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, name, text):
+        path = os.path.join(self.work, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+    
+    def read(self, name):
+        with open(os.path.join(self.work, name)) as f:
+            return f.read()
+    
+    def cp(self, *args):
+        """Выполнить cp; вернуть (вывод, была ли ошибка)"""
+        dsh.BUILTIN_STATUS.failed = False
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.terminal.copy_file(list(args))
+        return out.getvalue(), dsh.BUILTIN_STATUS.failed
+    
+    def test_copy_file_and_into_directory(self):
+        self.assertEqual(self.cp('a.txt', 'b.txt'), ('', False))
+        self.assertEqual(self.read('b.txt'), 'alpha\n')
+        os.mkdir(os.path.join(self.work, 'dir'))
+        self.assertEqual(self.cp('a.txt', 'b.txt', 'dir'), ('', False))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.work, 'dir'))), ['a.txt', 'b.txt'])
+    
+    def test_recursive_copy_keeps_tree_and_symlinks(self):
+        output, failed = self.cp('tree', 'copy')
+        self.assertIn("не указан -r", output)
+        self.assertTrue(failed)
+        self.assertFalse(os.path.exists(os.path.join(self.work, 'copy')))
+        
+        self.assertEqual(self.cp('-r', 'tree', 'copy'), ('', False))
+        self.assertEqual(self.read('copy/one'), '1')
+        self.assertEqual(self.read('copy/sub/two'), '22')
+        self.assertEqual(os.readlink(os.path.join(self.work, 'copy', 'link')), 'one')
+    
+    def test_no_clobber_and_update(self):
+        self.write('old.txt', 'old\n')
+        self.cp('-n', 'a.txt', 'old.txt')
+        self.assertEqual(self.read('old.txt'), 'old\n')
+        
+        # -u: приёмник новее источника — не перезаписывается
+        os.utime(os.path.join(self.work, 'a.txt'), (1000, 1000))
+        self.cp('-u', 'a.txt', 'old.txt')
+        self.assertEqual(self.read('old.txt'), 'old\n')
+        os.utime(os.path.join(self.work, 'old.txt'), (500, 500))
+        self.cp('-u', 'a.txt', 'old.txt')
+        self.assertEqual(self.read('old.txt'), 'alpha\n')
+    
+    def test_same_file_refused(self):
+        os.link(os.path.join(self.work, 'a.txt'), os.path.join(self.work, 'hard.txt'))
+        for args in (('a.txt', 'a.txt'), ('a.txt', '.'), ('a.txt', 'hard.txt')):
+            output, failed = self.cp(*args)
+            self.assertIn('один и тот же файл', output)
+            self.assertTrue(failed)
+        self.assertEqual(self.read('a.txt'), 'alpha\n')
+    
+    def test_errors(self):
+        output, failed = self.cp('a.txt', 'tree/one', 'missing-dir')
+        self.assertIn('не является каталогом', output)
+        self.assertTrue(failed)
+        output, failed = self.cp('nope', 'a.txt', 'tree')
+        self.assertIn("невозможно выполнить stat для 'nope'", output)
+        self.assertTrue(failed)
+        self.assertEqual(self.read('tree/a.txt'), 'alpha\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""du: размеры поддеревьев, жёсткие ссылки, --max-depth/-s/-n, кэш, сверка с du
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal, disk_usage, du_scan, du_totals
+
+
+class DiskUsageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, 'root')
+        for directory in ('a/deep', 'b', 'empty'):
+            os.makedirs(os.path.join(self.root, directory))
+        self.write('a/one', 5000)
+        self.write('a/deep/two', 70000)
+        self.write('b/three', 1)
+        os.link(os.path.join(self.root, 'a', 'one'), os.path.join(self.root, 'b', 'one-link'))
+        os.symlink('three', os.path.join(self.root, 'b', 'link'))
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.terminal.du_cache = os.path.join(self.tmp.name, 'du.cache')
+    
+    def write(self, name, size):
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(os.urandom(size))
+    
+    def du(self, *args):
+        """Вывод du: [(размер, путь)] и текст stderr"""
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            self.terminal.disk_usage_command(list(args))
+        lines = [line.split('\t') for line in out.getvalue().splitlines()]
+        return [(size, path) for size, path in lines], err.getvalue()
+    
+    def usage(self, *names):
+        return sum(disk_usage(os.lstat(os.path.join(self.root, name))) for name in names)
+    
+    def test_totals_count_hard_links_once(self):
+        totals = du_totals(du_scan([self.root]))
+        self.assertEqual(totals[os.path.join(self.root, 'a', 'deep')], self.usage('a/deep', 'a/deep/two'))
+        self.assertEqual(totals[self.root], self.usage(
+            '.', 'a', 'a/deep', 'b', 'empty', 'a/one', 'a/deep/two', 'b/three', 'b/link'))
+    
+    def test_post_order_and_depth(self):
+        lines, _ = self.du('root')
+        self.assertEqual([path for _, path in lines],
+                         ['root/a/deep', 'root/a', 'root/b', 'root/empty', 'root'])
+        self.assertEqual([path for _, path in self.du('-d', '1', 'root')[0]],
+                         ['root/a', 'root/b', 'root/empty', 'root'])
+        self.assertEqual([path for _, path in self.du('-s', 'root', 'root/a/one')[0]],
+                         ['root', 'root/a/one'])
+        self.assertEqual([path for _, path in self.du('-n', '2', 'root')[0]], ['root', 'root/a'])
+    
+    def test_errors(self):
+        for args, message in ((['--max-depth', 'x', 'root'], 'du: --max-depth: требуется неотрицательное число'),
+                              (['-q', 'root'], "du: неверный ключ -- 'q'"),
+                              (['missing'], "du: невозможно получить доступ к 'missing'")):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.terminal.disk_usage_command(args)
+            self.assertIn(message, out.getvalue())
+    
+    def test_cache_skips_unchanged_directories(self):
+        first, err = self.du('-v', '--cache', 'root')
+        self.assertIn('пересканировано 5', err)
+        second, err = self.du('-v', '--cache', 'root')
+        self.assertIn('пересканировано 0', err)
+        self.assertEqual(first, second)
+        
+        self.write('b/new', 9000)
+        third, err = self.du('-v', '--cache', 'root')
+        self.assertIn('пересканировано 1', err)
+        self.assertEqual(dict((p, s) for s, p in third)['root/b'],
+                         str(-(-self.usage('b', 'b/three', 'b/link', 'b/new') // 1024)))
+    
+    @unittest.skipUnless(shutil.which('du'), 'нет системного du')
+    def test_matches_system_du(self):
+        def system_du(*args):
+            result = subprocess.run(['du', *args], cwd=self.tmp.name, capture_output=True, text=True)
+            return sorted(tuple(line.split('\t')) for line in result.stdout.splitlines())
+        
+        self.assertEqual(self.du('-s', 'root')[0], system_du('-s', 'root'))
+        # какому каталогу достанется файл с двумя ссылками, зависит от порядка обхода
+        os.remove(os.path.join(self.root, 'b', 'one-link'))
+        self.assertEqual(sorted(self.du('root')[0]), system_du('root'))
+
+
+if __name__ == '__main__':
+    unittest.main()
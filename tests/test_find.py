@@ -0,0 +1,83 @@
+"""find: предикаты -name/-iname/-type/-size/-mtime, глубина, -prune -o, ошибки разбора.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+class FindTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.write('a.py', b'x' * 10)
+        self.write('B.PY', b'x' * 3000)
+        self.write('src/c.py', b'')
+        self.write('src/deep/d.txt', b'x' * 600)
+        self.write('.git/objects/e.py', b'')
+        os.symlink('a.py', os.path.join(self.tmp.name, 'link.py'))
+        old = time.time() - 10 * 86400
+        os.utime(os.path.join(self.tmp.name, 'src', 'c.py'), (old, old))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    
+    def find(self, *args):
+        """Строки вывода find (порядок параллельного обхода не задан)"""
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.terminal.find_files(list(args))
+        return sorted(out.getvalue().splitlines())
+    
+    def test_name_and_iname(self):
+        self.assertEqual(self.find('.', '-name', '*.py'),
+                         ['./.git/objects/e.py', './a.py', './link.py', './src/c.py'])
+        self.assertEqual(self.find('.', '-iname', '*.py', '-maxdepth', '1'),
+                         ['./B.PY', './a.py', './link.py'])
+    
+    def test_type(self):
+        self.assertEqual(self.find('src', '-type', 'd'), ['src', 'src/deep'])
+        self.assertEqual(self.find('.', '-type', 'l'), ['./link.py'])
+        self.assertEqual(self.find('src', '-type', 'f'), ['src/c.py', 'src/deep/d.txt'])
+    
+    def test_size_and_mtime(self):
+        self.assertEqual(self.find('.', '-type', 'f', '-size', '+1k'), ['./B.PY'])
+        self.assertEqual(self.find('.', '-type', 'f', '-size', '-2', '-name', '*.txt'), [])
+        self.assertEqual(self.find('.', '-type', 'f', '-size', '2', '-name', '*.txt'), ['./src/deep/d.txt'])
+        self.assertEqual(self.find('.', '-type', 'f', '-size', '10c'), ['./a.py'])
+        self.assertEqual(self.find('.', '-type', 'f', '-mtime', '+5'), ['./src/c.py'])
+    
+    def test_depth(self):
+        self.assertEqual(self.find('src', '-maxdepth', '1'), ['src', 'src/c.py', 'src/deep'])
+        self.assertEqual(self.find('src', '-mindepth', '2'), ['src/deep/d.txt'])
+    
+    def test_prune(self):
+        self.assertEqual(self.find('.', '-name', '.git', '-prune', '-o', '-name', '*.py'),
+                         ['./a.py', './link.py', './src/c.py'])
+    
+    def test_bad_arguments(self):
+        for args in (['-size', ''], ['-size', '+'], ['-size', 'k'], ['-mtime', 'x'],
+                     ['-maxdepth', '-1'], ['-type', 'q'], ['-bogus', '1'], ['-name']):
+            output = self.find('.', *args)
+            self.assertTrue(output[0].startswith('find: '), args)
+            self.assertFalse(any(line.startswith('./') for line in output), args)
+
+
+if __name__ == '__main__':
+    unittest.main()
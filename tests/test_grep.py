@@ -0,0 +1,91 @@
+"""grep: -r/-E/-i/-l/-c по файлам, порядок вывода при пуле процессов, регистр не-ASCII букв.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import GREP_BATCH_SIZE, DoyarkaTerminal, grep_windows
+
+
+def capture(func, *args):
+    """Вывод встроенной команды; stdout — настоящий файл, как у терминала"""
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as out:
+        with contextlib.redirect_stdout(out):
+            func(list(args))
+        out.flush()
+        out.seek(0)
+        return out.buffer.read()
+
+
+class GrepTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.write('a.txt', 'alpha\nbeta\nAlpha beta\n'.encode())
+        self.write('sub/b.txt', b'gamma\nalphabet\n')
+        self.write('sub/bin.dat', b'alpha\0binary\n')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    
+    def grep(self, *args):
+        return capture(self.terminal.grep_text, *args)
+    
+    def test_files_with_line_numbers(self):
+        self.assertEqual(self.grep('alpha', 'a.txt', 'sub/b.txt'),
+                         b'a.txt:1: alpha\nsub/b.txt:2: alphabet\n')
+    
+    def test_recursive_skips_binary(self):
+        self.assertEqual(self.grep('-r', 'alpha', '.'),
+                         b'./a.txt:1: alpha\n./sub/b.txt:2: alphabet\n')
+    
+    def test_flags(self):
+        self.assertEqual(self.grep('-i', 'ALPHA', 'a.txt'), b'a.txt:1: alpha\na.txt:3: Alpha beta\n')
+        self.assertEqual(self.grep('-E', '^(beta|gamma)$', 'a.txt', 'sub/b.txt'),
+                         b'a.txt:2: beta\nsub/b.txt:1: gamma\n')
+        self.assertEqual(self.grep('-c', 'beta', 'a.txt', 'sub/b.txt'), b'a.txt:2\nsub/b.txt:0\n')
+        self.assertEqual(self.grep('-rl', 'gamma', '.'), b'./sub/b.txt\n')
+    
+    def test_literal_without_E(self):
+        self.write('re.txt', b'a.c\nabc\n')
+        self.assertEqual(self.grep('a.c', 're.txt'), b're.txt:1: a.c\n')
+    
+    def test_many_files_keep_order(self):
+        # больше одной пачки: файлы уходят в пул процессов
+        count = GREP_BATCH_SIZE * 2 + 7
+        for i in range(count):
+            self.write(f'many/{i:04d}.txt', b'x\nneedle %d\n' % i)
+        expected = b''.join(b'many/%04d.txt:2: needle %d\n' % (i, i) for i in range(count))
+        self.assertEqual(self.grep('-r', 'needle', 'many'), expected)
+    
+    def test_ignore_case_non_ascii(self):
+        self.write('ru.txt', 'привет\nПРИВЕТ\nhello\n'.encode() + b'\xff' + 'ПрИвЕт\n'.encode())
+        self.assertEqual(self.grep('-i', 'привет', 'ru.txt'),
+                         'ru.txt:1: привет\nru.txt:2: ПРИВЕТ\n'.encode() +
+                         b'ru.txt:4: \xff' + 'ПрИвЕт\n'.encode())
+        self.assertEqual(self.grep('привет', 'ru.txt'), 'ru.txt:1: привет\n'.encode())
+        self.assertEqual(self.grep('-ic', 'ПрИвЕт', 'ru.txt'), b'ru.txt:3\n')
+    
+    def test_windows_split_on_lines(self):
+        data = 'раз\nдва три\n'.encode() + b'x' * 40 + '\nчетыре'.encode()
+        windows = list(grep_windows(data, size=8))
+        self.assertEqual(''.join(windows), data.decode())
+        self.assertTrue(all(window.endswith('\n') for window in windows[:-1]))
+        self.assertIn('x' * 40 + '\n', windows)
+
+
+if __name__ == '__main__':
+    unittest.main()
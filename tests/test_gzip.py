@@ -0,0 +1,224 @@
+"""gzip/gunzip и tar: параллельное сжатие блоками, распаковка потоком, совместимость с gzip и tar
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import gzip
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+import dsh
+from dsh import ParallelGzipWriter, gunzip_stream
+
+
+def sample(size):
+    # сжимаемые данные с примесью случайных байт
+    text = b''.join(b'line %d of sample data\n' % i for i in range(size // 20 + 1))
+    return bytes(a ^ b for a, b in zip(text[:size], os.urandom(size))) if size % 2 else text[:size]
+
+
+class GzipStreamTest(unittest.TestCase):
+    def compress(self, data, **options):
+        out = io.BytesIO()
+        with ParallelGzipWriter(out, **options) as writer:
+            for start in range(0, len(data), 777):
+                writer.write(data[start:start + 777])
+        return out.getvalue()
+    
+    def test_round_trip_across_blocks(self):
+        with mock.patch.object(dsh, 'GZIP_BLOCK', 1000):
+            for size in (0, 1, 999, 1000, 1001, 5500, 20000):
+                data = sample(size)
+                for workers in (1, 3):
+                    for level in (1, 6, 9):
+                        packed = self.compress(data, level=level, workers=workers)
+                        self.assertEqual(gzip.decompress(packed), data, (size, workers, level))
+                        self.assertEqual(packed[-8:], zlib.crc32(data).to_bytes(4, 'little')
+                                         + size.to_bytes(4, 'little'))
+    
+    def test_ratio_close_to_gzip(self):
+        data = sample(400000)
+        packed = self.compress(data, workers=2)
+        self.assertLess(len(packed), len(gzip.compress(data, 6)) * 1.02)
+    
+    def test_header(self):
+        packed = self.compress(b'data', name='/some/dir/file.txt', mtime=1234567890)
+        with gzip.GzipFile(fileobj=io.BytesIO(packed)) as f:
+            self.assertEqual(f.read(), b'data')
+            self.assertEqual(f.mtime, 1234567890)
+        self.assertEqual(packed[10:19], b'file.txt\0')
+    
+    def test_gunzip_stream(self):
+        data = sample(50000)
+        members = gzip.compress(data[:20000]) + self.compress(data[20000:]) + b'\0' * 10
+        out = io.BytesIO()
+        with mock.patch.object(dsh, 'CHUNK_SIZE', 100):
+            self.assertEqual(gunzip_stream(io.BufferedReader(io.BytesIO(members)), out), len(data))
+        self.assertEqual(out.getvalue(), data)
+        for broken in (b'', members[:len(members) // 2], b'not gzip'):
+            with self.assertRaises(zlib.error):
+                gunzip_stream(io.BufferedReader(io.BytesIO(broken)), io.BytesIO())
+
+
+class CommandTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.work = self.tmp.name
+        self.data = sample(300001)
+        self.write('file.txt', self.data)
+        os.chmod(self.path('file.txt'), 0o640)
+        os.utime(self.path('file.txt'), (1000000000, 1000000000))
+        self.env = dict(os.environ, HOME=self.work)
+    
+    def path(self, name):
+        return os.path.join(self.work, name)
+    
+    def write(self, name, data):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+    
+    def read(self, name):
+        with open(self.path(name), 'rb') as f:
+            return f.read()
+    
+    def run_dsh(self, script, **options):
+        return subprocess.run([sys.executable, DSH, '-c', script], cwd=self.work,
+                              capture_output=True, env=self.env, **options)
+    
+    def test_gzip_replaces_file(self):
+        self.assertEqual(self.run_dsh('gzip -p 3 file.txt').returncode, 0)
+        self.assertFalse(os.path.exists(self.path('file.txt')))
+        self.assertEqual(gzip.decompress(self.read('file.txt.gz')), self.data)
+        st = os.stat(self.path('file.txt.gz'))
+        self.assertEqual((st.st_mode & 0o777, st.st_mtime), (0o640, 1000000000))
+        
+        self.assertEqual(self.run_dsh('gunzip file.txt.gz').returncode, 0)
+        self.assertEqual(self.read('file.txt'), self.data)
+        self.assertFalse(os.path.exists(self.path('file.txt.gz')))
+        self.assertEqual(os.stat(self.path('file.txt')).st_mtime, 1000000000)
+    
+    def test_keep_stdout_and_errors(self):
+        self.assertEqual(self.run_dsh('gzip -k -9 file.txt').returncode, 0)
+        self.assertEqual(self.read('file.txt'), self.data)
+        # файл.gz уже есть, суффикс .gz, нет файла, неизвестный суффикс, битые данные
+        self.write('broken.gz', b'\x1f\x8b junk')
+        for script in ('gzip -k file.txt', 'gzip file.txt.gz', 'gzip missing', 'gunzip file.txt',
+                       'gunzip broken.gz', 'gzip -p 0 file.txt', 'gzip -x file.txt'):
+            self.assertEqual(self.run_dsh(script).returncode, 1, script)
+        self.assertEqual(gzip.decompress(self.read('file.txt.gz')), self.data)
+        self.assertTrue(os.path.exists(self.path('broken.gz')))
+        
+        self.assertEqual(gzip.decompress(self.run_dsh('gzip -c file.txt').stdout), self.data)
+        self.assertEqual(self.run_dsh('gunzip -c file.txt.gz').stdout, self.data)
+        self.assertEqual(self.run_dsh('cat file.txt | gzip | gunzip').stdout, self.data)
+    
+    @unittest.skipUnless(shutil.which('gzip'), 'нет системного gzip')
+    def test_system_gzip(self):
+        self.run_dsh('gzip -k file.txt')
+        self.assertEqual(subprocess.run(['gzip', '-t', 'file.txt.gz'], cwd=self.work).returncode, 0)
+        self.assertEqual(subprocess.run(['gzip', '-dc', 'file.txt.gz'], cwd=self.work,
+                                        capture_output=True).stdout, self.data)
+        # файл из нескольких членов, сжатый системным gzip
+        packed = b''.join(subprocess.run(['gzip', '-c'], input=part, capture_output=True).stdout
+                          for part in (self.data[:1000], self.data[1000:]))
+        self.write('multi.gz', packed)
+        self.assertEqual(self.run_dsh('gunzip -c multi.gz').stdout, self.data)
+
+
+class TarTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.work = self.tmp.name
+        self.tree = {'src/a.txt': b'a' * 1000, 'src/sub/b.bin': os.urandom(200000), 'src/empty': b''}
+        for name, data in self.tree.items():
+            path = os.path.join(self.work, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        os.symlink('a.txt', os.path.join(self.work, 'src', 'link'))
+        os.link(os.path.join(self.work, 'src', 'a.txt'), os.path.join(self.work, 'src', 'sub', 'hard'))
+        self.env = dict(os.environ, HOME=self.work)
+    
+    def run_dsh(self, script):
+        return subprocess.run([sys.executable, DSH, '-c', script], cwd=self.work,
+                              capture_output=True, text=True, env=self.env)
+    
+    def check_tree(self, root):
+        for name, data in self.tree.items():
+            with open(os.path.join(root, name), 'rb') as f:
+                self.assertEqual(f.read(), data, name)
+        self.assertEqual(os.readlink(os.path.join(root, 'src', 'link')), 'a.txt')
+        self.assertTrue(os.path.samefile(os.path.join(root, 'src', 'a.txt'),
+                                         os.path.join(root, 'src', 'sub', 'hard')))
+    
+    def test_create_list_extract(self):
+        self.assertEqual(self.run_dsh('tar -czf out.tgz src').returncode, 0)
+        listing = self.run_dsh('tar -tf out.tgz').stdout.splitlines()
+        self.assertEqual(sorted(listing), ['src', 'src/a.txt', 'src/empty', 'src/link', 'src/sub',
+                                           'src/sub/b.bin', 'src/sub/hard'])
+        self.assertIn('src/link -> a.txt', self.run_dsh('tar tvf out.tgz').stdout)
+        os.mkdir(os.path.join(self.work, 'copy'))
+        self.assertEqual(self.run_dsh('tar xzf out.tgz -C copy').returncode, 0)
+        self.check_tree(os.path.join(self.work, 'copy'))
+        # повторная распаковка поверх уже извлечённого
+        self.assertEqual(self.run_dsh('tar -xf out.tgz -C copy').returncode, 0)
+        self.check_tree(os.path.join(self.work, 'copy'))
+    
+    def test_stream_through_pipe(self):
+        os.mkdir(os.path.join(self.work, 'copy'))
+        self.assertEqual(self.run_dsh('tar -cz src | tar -x -C copy').returncode, 0)
+        self.check_tree(os.path.join(self.work, 'copy'))
+        self.assertEqual(self.run_dsh('tar -cf - src | tar -t').stdout.count('\n'), 7)
+    
+    def test_archive_not_included_in_itself(self):
+        result = self.run_dsh('tar -cf src/self.tar src')
+        self.assertEqual(result.returncode, 0)
+        with tarfile.open(os.path.join(self.work, 'src', 'self.tar')) as tar:
+            self.assertNotIn('src/self.tar', tar.getnames())
+    
+    def test_unsafe_members_skipped(self):
+        with tarfile.open(os.path.join(self.work, 'evil.tar'), 'w') as tar:
+            for name in ('../escape', 'ok'):
+                info = tarfile.TarInfo(name)
+                info.size = 2
+                tar.addfile(info, io.BytesIO(b'hi'))
+        os.mkdir(os.path.join(self.work, 'out'))
+        result = self.run_dsh('tar -xf evil.tar -C out')
+        self.assertEqual(result.returncode, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.work, 'out', 'ok')))
+        self.assertFalse(os.path.exists(os.path.join(self.work, 'escape')))
+    
+    def test_errors(self):
+        for script in ('tar -f x.tar', 'tar -ct -f x.tar src', 'tar -cf x.tar', 'tar -tf missing.tar',
+                       'tar -tf src/a.txt', 'tar -q'):
+            self.assertEqual(self.run_dsh(script).returncode, 1, script)
+    
+    @unittest.skipUnless(shutil.which('tar') and shutil.which('gzip'), 'нет системного tar')
+    def test_system_tar(self):
+        self.run_dsh('tar -czf ours.tgz src')
+        os.mkdir(os.path.join(self.work, 'a'))
+        subprocess.run(['tar', '-xzf', 'ours.tgz', '-C', 'a'], cwd=self.work, check=True)
+        self.check_tree(os.path.join(self.work, 'a'))
+        
+        subprocess.run(['tar', '-czf', 'theirs.tgz', 'src'], cwd=self.work, check=True)
+        os.mkdir(os.path.join(self.work, 'b'))
+        self.assertEqual(self.run_dsh('tar -xf theirs.tgz -C b').returncode, 0)
+        self.check_tree(os.path.join(self.work, 'b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Таблица путей внешних команд: попадания, проверка по mtime каталогов PATH, hash
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+from dsh import CommandHash
+
+
+class CommandHashTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.first = os.path.join(self.tmp.name, 'first')
+        self.second = os.path.join(self.tmp.name, 'second')
+        for directory in (self.first, self.second):
+            os.mkdir(directory)
+        self.tool = self.executable(self.second, 'tool')
+        patcher = mock.patch.dict(os.environ, {'PATH': os.pathsep.join([self.first, self.second])})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.hash = CommandHash()
+    
+    def executable(self, directory, name, mode=0o755):
+        path = os.path.join(directory, name)
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(path, mode)
+        # mtime каталога меняется заведомо (грубые отметки времени ФС не мешают)
+        st = os.stat(directory)
+        os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        return path
+    
+    def test_hits_counted(self):
+        for _ in range(3):
+            self.assertEqual(self.hash.lookup('tool', '/'), self.tool)
+        self.assertEqual(self.hash.entries(), [('tool', 3, self.tool)])
+        self.assertIsNone(self.hash.lookup('missing', '/'))
+    
+    def test_new_file_earlier_in_path_wins(self):
+        self.hash.lookup('tool', '/')
+        shadow = self.executable(self.first, 'tool')
+        self.assertEqual(self.hash.lookup('tool', '/'), shadow)
+        os.remove(shadow)
+        st = os.stat(self.first)
+        os.utime(self.first, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.hash.lookup('tool', '/'), self.tool)
+    
+    def test_non_executable_skipped(self):
+        self.executable(self.first, 'tool', mode=0o644)
+        self.assertEqual(self.hash.lookup('tool', '/'), self.tool)
+    
+    def test_path_change_and_forget(self):
+        self.hash.lookup('tool', '/')
+        os.environ['PATH'] = self.first
+        self.assertIsNone(self.hash.lookup('tool', '/'))
+        self.assertEqual(self.hash.entries(), [])
+        os.environ['PATH'] = self.second
+        self.hash.lookup('tool', '/')
+        self.hash.forget('tool')
+        self.assertEqual(self.hash.entries(), [])
+    
+    def test_relative_path_entries_not_cached(self):
+        os.environ['PATH'] = 'second'
+        self.assertEqual(self.hash.lookup('tool', self.tmp.name), self.tool)
+        self.assertEqual(self.hash.entries(), [])
+        self.assertEqual(self.hash.lookup('./second/tool', self.tmp.name),
+                         os.path.join(self.tmp.name, './second/tool'))
+
+
+class HashCommandTest(unittest.TestCase):
+    def run_dsh(self, command):
+        with tempfile.TemporaryDirectory() as home:
+            return subprocess.run([sys.executable, DSH, '-c', command], capture_output=True,
+                                  text=True, env=dict(os.environ, HOME=home))
+    
+    def test_hash_builtin(self):
+        result = self.run_dsh('hash\ntrue\ntrue\nhash')
+        self.assertIn('hash: таблица пуста', result.stdout)
+        self.assertRegex(result.stdout, r'\n\s+2  /\S+/true\n')
+        self.assertIn('hash: таблица пуста', self.run_dsh('true\nhash -r\nhash').stdout)
+        self.assertEqual(self.run_dsh('hash no_such_command_dsh').returncode, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""head, tail (в том числе -f) и wc: поблочные функции и сверка с coreutils
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import io
+import os
+import random
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+import dsh
+from dsh import count_stream, head_copy, tail_start, tail_stream
+
+SAMPLES = [b'', b'\n', b'one', b'one\n', b'\n\n\n', b'a\nb\nc', b'a\nb\nc\n',
+           b''.join(b'line %d\n' % i for i in range(300)),
+           b'x' * 500 + b'\n' + b'y' * 500]
+
+
+def reference_tail(data, lines):
+    parts = data.splitlines(keepends=True)
+    return b''.join(parts[max(len(parts) - lines, 0):]) if lines else b''
+
+
+def reference_words(data):
+    return len(data.split())
+
+
+class StreamFunctionsTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(dsh, TAIL_BLOCK=7, CHUNK_SIZE=5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_tail_start(self):
+        for data in SAMPLES:
+            for lines in (0, 1, 2, 3, 299, 1000):
+                start = tail_start(lambda pos, n: data[pos:pos + n], len(data), lines)
+                self.assertEqual(data[start:], reference_tail(data, lines), (data[:20], lines))
+    
+    def test_tail_stream(self):
+        for data in SAMPLES:
+            for lines in (0, 1, 3, 1000):
+                self.assertEqual(tail_stream(io.BytesIO(data), lines=lines), reference_tail(data, lines))
+            for count in (0, 1, 6, 10000):
+                self.assertEqual(tail_stream(io.BytesIO(data), count=count),
+                                 data[max(len(data) - count, 0):])
+    
+    def test_head_copy(self):
+        for data in SAMPLES:
+            parts = data.splitlines(keepends=True)
+            for lines in (1, 2, 5, 1000):
+                out = io.BytesIO()
+                head_copy(io.BytesIO(data), out, lines=lines)
+                self.assertEqual(out.getvalue(), b''.join(parts[:lines]))
+                out = io.BytesIO()
+                head_copy(io.BytesIO(data), out, lines=lines, skip=True)
+                self.assertEqual(out.getvalue(), b''.join(parts[lines:]))
+            out = io.BytesIO()
+            head_copy(io.BytesIO(data), out, count=6)
+            self.assertEqual(out.getvalue(), data[:6])
+    
+    def test_count_stream(self):
+        rng = random.Random(3)
+        samples = SAMPLES + [bytes(rng.choice(b'ab \n\t') for _ in range(1000)) for _ in range(20)]
+        for data in samples:
+            self.assertEqual(count_stream(io.BytesIO(data)),
+                             (data.count(b'\n'), reference_words(data), len(data)), data[:20])
+        self.assertEqual(count_stream(io.BytesIO(b'a b\n'), words=False), (1, 0, 4))
+
+
+class CoreutilsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        rng = random.Random(5)
+        self.files = []
+        for i, size in enumerate((0, 10, 70000, 300000)):
+            path = os.path.join(self.tmp.name, f'f{i}')
+            with open(path, 'wb') as f:
+                f.write(''.join(rng.choice('abc  \n\tж') for _ in range(size)).encode('utf-8'))
+            self.files.append(f'f{i}')
+        # wc считает словом всё, что не пробельный байт; так же считает GNU wc в UTF-8
+        self.env = dict(os.environ, HOME=self.tmp.name, LC_ALL='C.UTF-8')
+    
+    def run_dsh(self, command):
+        return subprocess.run([sys.executable, DSH, '-c', command], cwd=self.tmp.name,
+                              capture_output=True, env=self.env)
+    
+    def check(self, commands):
+        """Вывод команд в dsh и в sh с coreutils совпадает (итого вместо total)"""
+        script = '\n'.join(commands)
+        ours = self.run_dsh(script)
+        theirs = subprocess.run(['sh', '-c', script], cwd=self.tmp.name, capture_output=True, env=self.env)
+        self.assertEqual(ours.stdout.replace('итого'.encode(), b'total').split(b'\n'),
+                         theirs.stdout.split(b'\n'))
+    
+    @unittest.skipUnless(shutil.which('head') and shutil.which('tail') and shutil.which('wc'),
+                         'нет coreutils')
+    def test_matches_coreutils(self):
+        commands = [f'{command} {name}' for name in self.files
+                    for command in ('head', 'head -n 1', 'head -c 100', 'tail', 'tail -n 3', 'tail -n 0',
+                                    'tail -c 9', 'tail -n +5', 'wc', 'wc -l', 'wc -w', 'wc -c')]
+        files = ' '.join(self.files)
+        commands += [f'{command} {files}' for command in ('head -n 2', 'tail -n 2', 'wc', 'wc -lw')]
+        self.check(commands)
+        self.check([f'cat {self.files[2]} | wc', f'cat {self.files[3]} | tail -n 7'])
+    
+    def test_pipeline_input(self):
+        result = self.run_dsh(f'cat {self.files[3]} | tail -n 4 | head -n 2 | wc -l')
+        self.assertEqual(result.stdout.split(), [b'2'])
+        self.assertEqual(self.run_dsh('head missing').returncode, 1)
+    
+    def test_follow(self):
+        path = os.path.join(self.tmp.name, 'log')
+        with open(path, 'w') as f:
+            f.write('old 1\nold 2\n')
+        proc = subprocess.Popen([sys.executable, DSH, '-c', 'tail -n 1 -f log'], cwd=self.tmp.name,
+                                stdout=subprocess.PIPE, env=self.env)
+        try:
+            self.assertEqual(self.read_until(proc, b'old 2\n'), b'old 2\n')
+            with open(path, 'a') as f:
+                f.write('new 1\n')
+            self.assertEqual(self.read_until(proc, b'new 1\n'), b'new 1\n')
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+    
+    def read_until(self, proc, expected):
+        data = b''
+        deadline = time.monotonic() + 10
+        while not data.endswith(expected) and time.monotonic() < deadline:
+            if select.select([proc.stdout], [], [], 0.1)[0]:
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk:
+                    break
+                data += chunk
+        return data
+
+
+if __name__ == '__main__':
+    unittest.main()
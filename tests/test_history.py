@@ -0,0 +1,81 @@
+"""История команд: дозапись, ограничение размера, повторы, поиск, несколько сеансов
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import HistoryStore
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'history')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def file_lines(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read().split('\n')[:-1]
+    
+    def test_appends_survive_reload(self):
+        store = HistoryStore(self.path, limit=100)
+        for command in ('ls', 'ls', 'cd /tmp', 'echo "a\nb"'):
+            store.append(command)
+        self.assertEqual(self.file_lines(), ['ls', 'cd /tmp', 'echo "a b"'])
+        
+        reloaded = HistoryStore(self.path, limit=100)
+        reloaded.load()
+        self.assertEqual(len(reloaded), 3)
+        self.assertEqual(reloaded.recent(2), [(2, 'cd /tmp'), (3, 'echo "a b"')])
+    
+    def test_file_stays_bounded(self):
+        store = HistoryStore(self.path, limit=10)
+        for i in range(100):
+            store.append(f'command {i}')
+            self.assertLessEqual(len(self.file_lines()), 15)
+        self.assertLessEqual(len(store), 15)
+        self.assertEqual(store.last(), 'command 99')
+        self.assertEqual(store.compact(), 10)
+        self.assertEqual(self.file_lines(), [f'command {i}' for i in range(90, 100)])
+    
+    def test_dedupe_keeps_last_occurrence(self):
+        store = HistoryStore(self.path, limit=3, dedupe=True)
+        for command in ('a', 'b', 'a', 'c', 'b'):
+            store.append(command)
+        self.assertEqual(store.compact(), 3)
+        self.assertEqual(self.file_lines(), ['a', 'c', 'b'])
+    
+    def test_search(self):
+        with open(self.path, 'w') as f:
+            f.write('git status\nls -l\ngit commit\n')
+        store = HistoryStore(self.path)
+        store.load()
+        store.append('git push')
+        store.append('make')
+        self.assertEqual(store.search(re.compile('^git', re.MULTILINE)),
+                         [(1, 'git status'), (3, 'git commit'), (4, 'git push')])
+        self.assertEqual(store.search(re.compile('l$', re.MULTILINE)), [(2, 'ls -l')])
+        self.assertEqual(store.search(re.compile('нет такого')), [])
+    
+    def test_sessions_share_file(self):
+        first, second = HistoryStore(self.path, limit=20), HistoryStore(self.path, limit=20)
+        for i in range(200):
+            first.append(f'a {i}')
+            # второй сеанс пишет строки длиннее: его дозаписи видны первому по размеру файла
+            second.append(f'b {i} ' + 'x' * 50)
+            self.assertLessEqual(len(self.file_lines()), 30)
+        lines = self.file_lines()
+        self.assertEqual(lines[-2:], ['a 199', 'b 199 ' + 'x' * 50])
+        self.assertEqual(len(set(lines)), len(lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Фоновые задания: &, jobs, wait, kill %n, своя группа процессов.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+DSH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dsh.py')
+# Лидер своей группы процессов? (True — запущен в отдельной группе)
+LEADER = f'{sys.executable} -c "import os; print(os.getpgrp() == os.getpid())"'
+
+
+class JobsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def dsh(self, command):
+        return subprocess.run([sys.executable, DSH, '-c', command], capture_output=True,
+                              cwd=self.tmp.name, timeout=30).stdout.decode()
+    
+    def test_jobs_run_concurrently(self):
+        started = time.monotonic()
+        output = self.dsh('sleep 0.6 &\nsleep 0.6 &\njobs\nwait')
+        self.assertLess(time.monotonic() - started, 1.1)
+        self.assertIn('[1]', output)
+        self.assertIn('[2]+', output)
+        self.assertIn('Выполняется', output)
+        self.assertIn('Завершено', output)
+    
+    def test_builtin_job_output(self):
+        with open(os.path.join(self.tmp.name, 'f.txt'), 'w') as f:
+            f.write('line one\nline two\n')
+        output = self.dsh('cat f.txt | grep two &\nwait')
+        self.assertIn('line two\n', output)
+        self.assertNotIn('line one', output)
+    
+    def test_kill_job(self):
+        output = self.dsh('sleep 10 &\nkill %1\nwait\njobs')
+        self.assertIn('Прервано (SIGTERM)', output)
+        output = self.dsh('kill %3')
+        self.assertIn('kill: нет текущего задания', output)
+    
+    def test_background_job_has_own_process_group(self):
+        lines = self.dsh(f'{LEADER} &\nwait').splitlines()
+        self.assertIn('True', lines)
+        self.assertEqual(self.dsh(LEADER).strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""updatedb/locate: поиск по индексу, инкрементальное обновление, корни индекса, find -index.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal, locate_merge_roots, locate_read_table
+
+
+def capture(func, *args):
+    """Вывод встроенной команды; stdout — настоящий файл, как у терминала"""
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as out:
+        with contextlib.redirect_stdout(out):
+            func(list(args))
+        out.flush()
+        out.seek(0)
+        return out.buffer.read().decode()
+
+
+class MergeRootsTest(unittest.TestCase):
+    def test_nested_and_repeated_roots(self):
+        self.assertEqual(locate_merge_roots(['/a', '/b', '/a/x', '/a']), ['/a', '/b'])
+        self.assertEqual(locate_merge_roots(['/a/x', '/b', '/a']), ['/b', '/a'])
+        self.assertEqual(locate_merge_roots(['/ab', '/a']), ['/ab', '/a'])
+
+
+class LocateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        for name in ('a', 'b', 'c'):
+            os.mkdir(os.path.join(self.root, name))
+            open(os.path.join(self.root, name, 'file_' + name), 'w').close()
+        open(os.path.join(self.root, 'a', 'Notes.TXT'), 'w').close()
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.root
+        self.terminal.locate_db = os.path.join(self.root, 'locate.db')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def updatedb(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.terminal.update_locate_db(list(args))
+        return sorted(os.path.relpath(root, self.root)
+                      for root in locate_read_table(self.terminal.locate_db)['roots'])
+    
+    def locate(self, *args):
+        return capture(self.terminal.locate_files, *args).splitlines()
+    
+    def test_search(self):
+        self.updatedb('a', 'b')
+        self.assertEqual(self.locate('file_'), [os.path.join(self.root, 'a', 'file_a'),
+                                                os.path.join(self.root, 'b', 'file_b')])
+        self.assertEqual(self.locate('*.txt'), [])
+        self.assertEqual(self.locate('-i', '*.txt'), [os.path.join(self.root, 'a', 'Notes.TXT')])
+        self.assertEqual(self.locate('-c', 'file_'), ['2'])
+        self.assertEqual(self.locate('-l', '1', 'file_'), [os.path.join(self.root, 'a', 'file_a')])
+        self.assertEqual(self.locate('-r', r'file_[b-z]$'), [os.path.join(self.root, 'b', 'file_b')])
+    
+    def test_incremental_update_sees_changes(self):
+        self.updatedb('a')
+        os.remove(os.path.join(self.root, 'a', 'file_a'))
+        open(os.path.join(self.root, 'a', 'new_file'), 'w').close()
+        self.updatedb()
+        self.assertEqual(self.locate('file'), [os.path.join(self.root, 'a', 'new_file')])
+    
+    def test_paths_are_added(self):
+        self.assertEqual(self.updatedb('a'), ['a'])
+        self.assertEqual(self.updatedb('b'), ['a', 'b'])
+        self.assertEqual(self.updatedb('a'), ['a', 'b'])
+        dirs = locate_read_table(self.terminal.locate_db)['dirs']
+        self.assertIn(os.path.join(self.root, 'a'), dirs)
+        self.assertIn(os.path.join(self.root, 'b'), dirs)
+    
+    def test_reset_roots(self):
+        self.updatedb('a')
+        self.updatedb('b')
+        self.assertEqual(self.updatedb('-r', 'c'), ['c'])
+        self.assertEqual(list(locate_read_table(self.terminal.locate_db)['dirs']),
+                         [os.path.join(self.root, 'c')])
+    
+    def test_find_index(self):
+        self.updatedb('a')
+        self.assertEqual(sorted(capture(self.terminal.find_files, 'a', '-index', '-name', 'file_*').splitlines()),
+                         ['a/file_a'])
+        output = capture(self.terminal.find_files, 'b', '-index')
+        self.assertIn("'b': не покрыт индексом, выполните updatedb b", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""ls: сортировка и ключи, -l для ссылок (в том числе битых), файл и отсутствующий путь.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+class LsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        for name, size, mtime in (('b.txt', 300, 1000), ('a.txt', 10, 3000), ('.hidden', 1, 2000)):
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+            os.utime(path, (mtime, mtime))
+        os.mkdir(os.path.join(self.tmp.name, 'dir'))
+        os.utime(os.path.join(self.tmp.name, 'dir'), (500, 500))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def ls(self, *args):
+        """Строки вывода ls без цветовых кодов и / после каталогов"""
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.terminal.list_files(list(args))
+        return [re.sub(r'\033\[\d+m', '', line).rstrip('/') for line in out.getvalue().splitlines()]
+    
+    def test_names_and_order(self):
+        self.assertEqual(self.ls(), ['a.txt', 'b.txt', 'dir'])
+        self.assertEqual(self.ls('-a'), ['.hidden', 'a.txt', 'b.txt', 'dir'])
+        self.assertEqual(self.ls('-r'), ['dir', 'b.txt', 'a.txt'])
+        self.assertEqual(self.ls('-t'), ['a.txt', 'b.txt', 'dir'])
+        self.assertEqual(self.ls('-S', 'dir'), [])
+    
+    def test_long_format(self):
+        lines = self.ls('-l')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('-'))
+        self.assertTrue(lines[0].endswith(' a.txt'))
+        self.assertIn(' 300 ', lines[1])
+        self.assertTrue(lines[2].startswith('d'))
+    
+    def test_long_format_symlinks(self):
+        os.symlink('a.txt', os.path.join(self.tmp.name, 'good'))
+        os.symlink('missing', os.path.join(self.tmp.name, 'bad'))
+        lines = self.ls('-l')
+        links = [line for line in lines if line.startswith('l')]
+        self.assertEqual(len(links), 2)
+        self.assertTrue(links[0].endswith(' bad -> missing'))
+        self.assertTrue(links[1].endswith(' good -> a.txt'))
+        self.assertFalse(any(line.startswith('?') for line in lines))
+        self.assertTrue(self.ls('-l', 'bad')[0].startswith('l'))
+    
+    def test_file_and_missing(self):
+        self.assertEqual(self.ls('a.txt'), ['a.txt'])
+        self.assertEqual(self.ls('missing'),
+                         ["ls: невозможно получить доступ к 'missing': Нет такого файла или каталога"])
+
+
+if __name__ == '__main__':
+    unittest.main()
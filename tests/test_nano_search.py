@@ -0,0 +1,80 @@
+"""Поиск и замена в буфере nano: совпадения по mmap, переход через край, замена по строкам
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import PieceTable
+
+
+class NanoSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'text.txt')
+        self.lines = [('error' if i % 7 == 3 else 'ok') + f' {i}' + (' ошибка' if i % 11 == 0 else '')
+                      for i in range(200)]
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.lines))
+        self.table = PieceTable(self.path)
+    
+    def tearDown(self):
+        self.table.close()
+        self.tmp.cleanup()
+    
+    def regex(self, pattern):
+        return re.compile(pattern.encode('utf-8'), re.MULTILINE)
+    
+    def expected(self, pattern, lines):
+        regex = re.compile(pattern)
+        return [i for i, line in enumerate(lines) if regex.search(line)]
+    
+    def buffer(self):
+        return [self.table.get_line(i) for i in range(self.table.line_count())]
+    
+    def test_match_lines(self):
+        for pattern in ('error', '^ok 1', 'ошибка$', r'\d{3}', 'нет такого'):
+            self.assertEqual(self.table.match_lines(self.regex(pattern)),
+                             self.expected(pattern, self.lines), pattern)
+    
+    def test_find_wraps_around(self):
+        regex = self.regex('error')
+        matches = self.expected('error', self.lines)
+        self.assertEqual(self.table.find(regex, 0), (matches[0], False))
+        self.assertEqual(self.table.find(regex, matches[0]), (matches[1], False))
+        self.assertEqual(self.table.find(regex, matches[-1]), (matches[0], True))
+        self.assertEqual(self.table.find(regex, matches[1], backward=True), (matches[0], False))
+        self.assertEqual(self.table.find(regex, matches[0], backward=True), (matches[-1], True))
+        self.assertIsNone(self.table.find(self.regex('нет такого'), 0))
+    
+    def test_search_follows_edits(self):
+        regex = self.regex('error')
+        self.table.match_lines(regex)
+        self.table.insert_line(0, 'error inserted')
+        self.table.delete_line(4)
+        self.table.set_line(10, 'error edited')
+        self.assertEqual(self.table.match_lines(regex), self.expected('error', self.buffer()))
+    
+    def test_replace_all(self):
+        self.table.set_line(1, 'error in added line, error again')
+        model = self.buffer()
+        count = self.table.replace_all(self.regex('error'), b'warning')
+        self.assertEqual(count, sum(line.count('error') for line in model))
+        self.assertEqual(self.buffer(), [line.replace('error', 'warning') for line in model])
+        self.assertEqual(self.table.match_lines(self.regex('error')), [])
+        # нетронутые диапазоны остаются ссылками на исходный файл
+        self.assertIn('o', {source for source, _, _ in self.table.pieces})
+        
+        self.assertEqual(self.table.replace_all(self.regex('нет такого'), b'x'), 0)
+        self.table.save()
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), '\n'.join(line.replace('error', 'warning') for line in model))
+
+
+if __name__ == '__main__':
+    unittest.main()
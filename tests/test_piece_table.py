@@ -0,0 +1,113 @@
+"""Буфер nano: ленивый индекс строк, правки таблицы кусков, атомарное сохранение
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import LineIndex, PieceTable
+
+
+class LineIndexTest(unittest.TestCase):
+    def test_offsets_across_blocks(self):
+        data = b''.join(b'line %d\n' % i for i in range(500)) + b'tail'
+        index = LineIndex(data, block_size=64)
+        lines = data.split(b'\n')
+        self.assertTrue(index.has_line(10))
+        self.assertFalse(index.complete())
+        for i in (0, 1, 7, 8, 9, 250, 499, 500):
+            self.assertEqual(data[index.line_start(i):index.line_end(i)], lines[i])
+        self.assertEqual(index.line_count(), len(lines))
+        self.assertFalse(index.has_line(501))
+        self.assertRaises(IndexError, index.line_start, 501)
+
+
+class PieceTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'text.txt')
+        self.tables = []
+    
+    def tearDown(self):
+        for table in self.tables:
+            table.close()
+        self.tmp.cleanup()
+    
+    def open(self, data, block_size=None):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        table = PieceTable(self.path)
+        if block_size:
+            table.index = LineIndex(table.data, block_size=block_size)
+        self.tables.append(table)
+        return table
+    
+    def lines(self, table):
+        return [table.get_line(i) for i in range(table.line_count())]
+    
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+    
+    def test_edits_match_list_model(self):
+        data = ''.join(f'строка {i}\n' for i in range(300))
+        table = self.open(data.encode('utf-8'), block_size=128)
+        model = data.split('\n')
+        rng = random.Random(1)
+        for step in range(400):
+            i = rng.randrange(len(model))
+            action = rng.choice('ids')
+            if action == 'i':
+                table.insert_line(i, f'новая {step}')
+                model.insert(i, f'новая {step}')
+            elif action == 'd' and len(model) > 1:
+                table.delete_line(i)
+                del model[i]
+            else:
+                table.set_line(i, f'правка {step}')
+                model[i] = f'правка {step}'
+        self.assertEqual(table.line_count(), len(model))
+        self.assertEqual(self.lines(table), model)
+        
+        table.save()
+        self.assertEqual(self.read(), '\n'.join(model).encode('utf-8'))
+    
+    def test_append_at_end_and_save_keeps_mode(self):
+        table = self.open(b'one\ntwo')
+        os.chmod(self.path, 0o640)
+        table.insert_line(2, 'three')
+        table.set_line(0, 'ONE')
+        self.assertEqual(self.lines(table), ['ONE', 'two', 'three'])
+        table.save()
+        self.assertEqual(self.read(), b'ONE\ntwo\nthree')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        self.assertEqual(os.listdir(self.tmp.name), ['text.txt'])
+    
+    def test_unchanged_and_empty_files_round_trip(self):
+        data = b'\xff\xfe binary\r\nline\n\n'
+        self.open(data).save()
+        self.assertEqual(self.read(), data)
+        
+        table = self.open(b'')
+        self.assertEqual(self.lines(table), [''])
+        table.set_line(0, 'text')
+        table.save()
+        self.assertEqual(self.read(), b'text')
+    
+    def test_save_to_other_path(self):
+        table = self.open(b'a\nb\n')
+        table.delete_line(0)
+        other = os.path.join(self.tmp.name, 'copy.txt')
+        table.save(other)
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), b'b\n')
+        self.assertEqual(self.read(), b'a\nb\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
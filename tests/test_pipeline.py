@@ -0,0 +1,77 @@
+"""Конвейеры и перенаправления: встроенные и внешние стадии, < > >>, grep из канала.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # история команд пишется в домашний каталог — подменяем его
+        patcher = mock.patch.dict(os.environ, {'HOME': self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.terminal = DoyarkaTerminal()
+        self.terminal.current_dir = self.tmp.name
+        self.write('in.txt', 'beta\nalpha\nПривет\n')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, name, text):
+        with open(os.path.join(self.tmp.name, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+    
+    def read(self, name):
+        with open(os.path.join(self.tmp.name, name), encoding='utf-8') as f:
+            return f.read()
+    
+    def run_command(self, command):
+        """Вывод команды; stdout — настоящий файл, как у терминала"""
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as out:
+            with contextlib.redirect_stdout(out):
+                self.terminal.run_command(command)
+            out.flush()
+            out.seek(0)
+            return out.buffer.read().decode()
+    
+    def test_builtin_stages_and_redirect(self):
+        self.run_command('cat in.txt | grep a > out.txt')
+        self.assertEqual(self.read('out.txt'), 'beta\nalpha\n')
+        self.run_command('echo gamma >> out.txt')
+        self.assertEqual(self.read('out.txt'), 'beta\nalpha\ngamma\n')
+    
+    def test_external_stages(self):
+        self.run_command('cat < in.txt | tr a-z A-Z | grep -c A > out.txt')
+        self.assertEqual(self.read('out.txt'), '2\n')
+        self.run_command('tr a-z A-Z < in.txt > out.txt')
+        self.assertEqual(self.read('out.txt'), 'BETA\nALPHA\nПривет\n')
+    
+    def test_grep_stdin_ignore_case(self):
+        self.run_command('cat in.txt | grep -i ПРИВЕТ > out.txt')
+        self.assertEqual(self.read('out.txt'), 'Привет\n')
+    
+    def test_quoted_operator_is_not_redirect(self):
+        self.write('f.txt', 'a > b\n')
+        output = self.run_command("grep '>' f.txt")
+        self.assertEqual(self.read('f.txt'), 'a > b\n')
+        self.assertIn('a > b', output)
+    
+    def test_missing_input_file(self):
+        output = self.run_command('cat < missing.txt > out.txt')
+        self.assertIn('missing.txt: Нет такого файла или каталога', output)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'out.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
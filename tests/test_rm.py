@@ -0,0 +1,62 @@
+"""rm: шаблоны, отказ удалять . и .., ошибки отдельных операндов
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import DoyarkaTerminal
+
+
+class RemoveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # [1] в имени каталога: метасимвол glob, который не должен стать частью шаблона
+        self.work = os.path.join(self.tmp.name, 'work[1]')
+        os.makedirs(os.path.join(self.work, 'sub'))
+        open(os.path.join(self.work, 'file'), 'w').close()
+        open(os.path.join(self.tmp.name, 'keep'), 'w').close()
+        self.terminal = DoyarkaTerminal(interactive=False)
+        self.terminal.owns_cwd = False
+        self.terminal.current_dir = self.work
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def rm(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.terminal.remove_file(list(args))
+        return out.getvalue()
+    
+    def test_dot_operands_refused(self):
+        for name in ('.', '..', './', 'sub/..', 'sub/../', 'sub/.'):
+            self.assertIn(f"rm: отказ удалять '{name}'", self.rm('-rf', name))
+        self.assertEqual(sorted(os.listdir(self.work)), ['file', 'sub'])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'keep')))
+    
+    def test_other_operands_still_removed(self):
+        self.rm('-r', '..', 'file', 'sub')
+        self.assertEqual(os.listdir(self.work), [])
+    
+    def test_glob_in_directory_with_metacharacters(self):
+        for name in ('a.txt', 'b.txt'):
+            open(os.path.join(self.work, name), 'w').close()
+        self.assertEqual(self.rm('*.txt'), '')
+        self.assertEqual(sorted(os.listdir(self.work)), ['file', 'sub'])
+    
+    def test_error_does_not_stop_other_operands(self):
+        open(os.path.join(self.work, 'other'), 'w').close()
+        output = self.rm('file/', 'other')
+        self.assertIn("rm: невозможно удалить 'file/'", output)
+        self.assertEqual(sorted(os.listdir(self.work)), ['file', 'sub'])
+
+
+if __name__ == '__main__':
+    unittest.main()
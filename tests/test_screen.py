@@ -0,0 +1,97 @@
+"""Экран nano: перерисовка только изменившихся строк, разбор клавиш из сырого ввода
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import RawInput, Screen
+
+
+class ScreenTest(unittest.TestCase):
+    def setUp(self):
+        self.out = io.StringIO()
+        self.screen = Screen(stream=self.out)
+        self.dims = (20, 5)
+        patcher = mock.patch.object(Screen, 'size', lambda screen: self.dims)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def frame(self, lines, cursor=None):
+        self.out.seek(0)
+        self.out.truncate()
+        self.screen.render(lines, cursor)
+        return self.out.getvalue()
+    
+    def test_only_changed_rows_redrawn(self):
+        first = self.frame(['a', 'b', 'c'])
+        self.assertIn('\033[2J', first)
+        for row, text in enumerate('abc', 1):
+            self.assertIn(f'\033[{row};1H{text}\033[K', first)
+        
+        second = self.frame(['a', 'B', 'c'], cursor=(1, 0))
+        self.assertNotIn('\033[2J', second)
+        self.assertIn('\033[2;1HB\033[K', second)
+        self.assertNotIn('\033[1;1Ha', second)
+        self.assertNotIn('\033[3;1Hc', second)
+        self.assertTrue(second.endswith('\033[2;1H\033[?25h'))
+        
+        self.assertEqual(self.frame(['a', 'B', 'c']), '\033[?25l\033[?25h')
+    
+    def test_removed_rows_erased_and_lines_clipped(self):
+        self.frame(['a', 'b', 'c'])
+        self.assertIn('\033[3;1H\033[K', self.frame(['a', 'b']))
+        output = self.frame(['x' * 30] + ['y'] * 10)
+        self.assertIn('\033[1;1H' + 'x' * 20 + '\033[K', output)
+        self.assertNotIn('\033[6;1H', output)
+    
+    def test_resize_forces_full_redraw(self):
+        self.frame(['a', 'b'])
+        self.dims = (30, 5)
+        output = self.frame(['a', 'b'])
+        self.assertIn('\033[2J', output)
+        self.assertIn('\033[1;1Ha\033[K', output)
+    
+    def test_plain_output_without_ansi(self):
+        screen = Screen(ansi=False, stream=self.out)
+        screen.render(['one', 'two'])
+        self.assertEqual(self.out.getvalue(), 'one\ntwo\n')
+        self.assertEqual(screen.frames, 1)
+        self.assertEqual(len(screen.latency()), 3)
+
+
+class RawInputTest(unittest.TestCase):
+    def keys(self, data):
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, data)
+        os.close(write_fd)
+        keys = []
+        try:
+            reader = RawInput(read_fd)
+            while True:
+                try:
+                    keys.append(reader.read_key())
+                except EOFError:
+                    return keys
+        finally:
+            os.close(read_fd)
+    
+    def test_escape_sequences(self):
+        self.assertEqual(self.keys(b'\x1b[A\x1bOB\x1b[5~\x1b[6~\x1b[3~'),
+                         ['up', 'down', 'pgup', 'pgdn', 'delete'])
+    
+    def test_unknown_sequence_and_plain_escape(self):
+        self.assertEqual(self.keys(b'\x1b[1;5Cx'), ['', 'x'])
+        self.assertEqual(self.keys(b'\x1b'), ['esc'])
+    
+    def test_utf8_and_control_keys(self):
+        self.assertEqual(self.keys('ж€\x13\x18'.encode('utf-8')), ['ж', '€', '\x13', '\x18'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Сервер и клиент: код завершения, stderr и stdin внешних программ, занятый сокет.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+DSH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dsh.py')
+
+
+class ServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.socket = os.path.join(cls.tmp.name, 'dsh.sock')
+        cls.server = subprocess.Popen([sys.executable, DSH, '--server', '--socket', cls.socket],
+                                      stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(cls.socket) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        cls.tmp.cleanup()
+    
+    def client(self, command):
+        return subprocess.run([sys.executable, DSH, '--client', '--socket', self.socket, '-c', command],
+                              stdin=subprocess.DEVNULL, capture_output=True, timeout=30)
+    
+    def test_client_status(self):
+        # код последней команды, как у локального -c
+        self.assertEqual(self.client('true').returncode, 0)
+        self.assertEqual(self.client('false').returncode, 1)
+        self.assertEqual(self.client('cat /nonexistent/file').returncode, 1)
+        self.assertEqual(self.client('exit 3\ntrue').returncode, 3)
+    
+    def test_external_stderr_and_stdin(self):
+        result = self.client('sh -c "echo out; echo err >&2; cat; exit 5"')
+        self.assertEqual(result.returncode, 5)
+        self.assertEqual(result.stdout, b'out\n')
+        self.assertEqual(result.stderr, b'err\n')
+    
+    def test_second_server_refused(self):
+        result = subprocess.run([sys.executable, DSH, '--server', '--socket', self.socket],
+                                stdin=subprocess.DEVNULL, capture_output=True, timeout=30)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('уже запущен', result.stderr.decode())
+        self.assertEqual(os.stat(self.socket).st_mode & 0o077, 0)
+        self.assertEqual(self.client('true').returncode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""sort и uniq: внешняя сортировка слиянием и сверка с LC_ALL=C sort/uniq
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+import dsh
+from dsh import external_sort, read_line_runs
+
+
+def make_lines(count, seed=7):
+    rng = random.Random(seed)
+    words = [b'alpha', b'Beta', b'gamma', b'10', b'9', b'-3', b'2.5', b'', b'zz', b'\xd0\xb6']
+    return [b' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(count)]
+
+
+class ExternalSortTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.lines = make_lines(3000)
+        self.data = b'\n'.join(self.lines) + b'\n'
+    
+    def sort(self, spec=(None, None, False), limit=2000, **options):
+        runs = read_line_runs([io.BytesIO(self.data)], limit)
+        return list(external_sort(runs, spec, tmpdir=self.tmp.name, **options))
+    
+    def test_spilled_runs_match_sorted(self):
+        with mock.patch.object(dsh, 'SORT_MERGE_FANIN', 4):
+            self.assertEqual(self.sort(), sorted(self.lines))
+            self.assertEqual(self.sort(reverse=True), sorted(self.lines, reverse=True))
+            self.assertEqual(self.sort(unique=True), sorted(set(self.lines)))
+        # временные файлы удалены
+        self.assertEqual(os.listdir(self.tmp.name), [])
+    
+    def test_in_memory_run(self):
+        self.assertEqual(self.sort(limit=1 << 30), sorted(self.lines))
+        self.assertEqual(list(external_sort(iter([]), (None, None, False))), [])
+    
+    def test_fields_and_numbers(self):
+        def number(line):
+            try:
+                return float(line.split()[0])
+            except (IndexError, ValueError):
+                return 0
+        
+        self.assertEqual(self.sort((None, None, True)), sorted(self.lines, key=lambda l: (number(l), l)))
+        key = lambda line: (b' '.join(line.split()[1:2]), line)
+        self.assertEqual(self.sort(((2, 2), None, False)), sorted(self.lines, key=key))
+    
+    def test_parallel(self):
+        self.assertEqual(self.sort(parallel=2), sorted(self.lines))
+
+
+class CoreutilsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        with open(os.path.join(self.tmp.name, 'input'), 'wb') as f:
+            f.write(b'\n'.join(make_lines(5000, seed=11)) + b'\n')
+        with open(os.path.join(self.tmp.name, 'fields'), 'wb') as f:
+            f.write(b''.join(b'%s:%d:%s\n' % (random.Random(i).choice([b'a', b'B', b'c']), i % 17, b'x' * (i % 5))
+                             for i in range(2000)))
+        self.env = dict(os.environ, HOME=self.tmp.name, LC_ALL='C')
+    
+    def run_dsh(self, script):
+        return subprocess.run([sys.executable, DSH, '-c', script], cwd=self.tmp.name,
+                              capture_output=True, env=self.env)
+    
+    def check(self, commands):
+        """Вывод команд в dsh и в sh с coreutils совпадает"""
+        script = '\n'.join(commands)
+        ours = self.run_dsh(script)
+        theirs = subprocess.run(['sh', '-c', script], cwd=self.tmp.name, capture_output=True, env=self.env)
+        self.assertEqual(ours.stdout.split(b'\n'), theirs.stdout.split(b'\n'))
+    
+    @unittest.skipUnless(shutil.which('sort') and shutil.which('uniq'), 'нет coreutils')
+    def test_sort_matches_coreutils(self):
+        self.check([f'sort {options} input' for options in
+                    ('', '-r', '-u', '-n', '-rn', '-nu', '-S 4K', '-S 4K -u', '-S 4K -n')])
+        # буквы после -k у нас действуют на всю сортировку, в GNU — только на поле,
+        # поэтому -r сверяется только глобальным ключом
+        self.check([f'sort {options} fields' for options in
+                    ('-t : -k 2', '-t : -k 2,2', '-t : -k 2,2n', '-rn -t : -k 2,2', '-t : -k 1,1 -u',
+                     '-t : -k2,2n -S 2K')])
+    
+    @unittest.skipUnless(shutil.which('sort') and shutil.which('uniq'), 'нет coreutils')
+    def test_uniq_matches_coreutils(self):
+        self.check([f'sort input | uniq {options}' for options in ('', '-c', '-d', '-u', '-i', '-ci')])
+        self.check(['uniq -c input', 'sort -S 4K --parallel 2 input'])
+    
+    def test_options(self):
+        self.assertEqual(self.run_dsh('sort --parallel=2 input | wc -l').stdout.split(), [b'5000'])
+        for script in ('sort --parallel=0 input', 'sort --parallelx input', 'sort -k 0 input',
+                       'sort -t ab input', 'sort -x input', 'uniq -z input', 'uniq input input'):
+            self.assertEqual(self.run_dsh(script).returncode, 1, script)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Разбор командной строки: операторы в кавычках остаются словами.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dsh import is_operator, parse_pipeline, split_command
+
+
+def operators(command):
+    return [part for part in split_command(command) if is_operator(part)]
+
+
+class SplitCommandTest(unittest.TestCase):
+    def test_quoted_operators_are_words(self):
+        self.assertEqual(split_command("grep '>' f.txt"), ['grep', '>', 'f.txt'])
+        self.assertEqual(operators("grep '>' f.txt"), [])
+        self.assertEqual(operators('echo "|"'), [])
+        self.assertEqual(operators('echo "&"'), [])
+        self.assertEqual(operators("echo '>>' \\< \\&"), [])
+
+    def test_quoted_operator_in_pipeline(self):
+        stages, redirects = parse_pipeline(split_command("echo '|' | grep '<' > out.txt"))
+        self.assertEqual(stages, [['echo', '|'], ['grep', '<']])
+        self.assertEqual(redirects, {'>': 'out.txt'})
+
+    def test_background_only_unquoted(self):
+        parts = split_command('echo "a & b" &')
+        self.assertEqual(parts, ['echo', 'a & b', '&'])
+        self.assertTrue(is_operator(parts[-1]))
+        self.assertFalse(is_operator(split_command('echo "&"')[-1]))
+
+    def test_unquoted_operators_split_words(self):
+        parts = split_command('cat a|grep b>>log')
+        self.assertEqual(parts, ['cat', 'a', '|', 'grep', 'b', '>>', 'log'])
+        self.assertEqual(operators('cat a|grep b>>log'), ['|', '>>'])
+
+    def test_comment_only_at_word_start(self):
+        self.assertEqual(split_command('echo x#y'), ['echo', 'x#y'])
+        self.assertEqual(split_command('echo x # комментарий'), ['echo', 'x'])
+        self.assertEqual(split_command("echo '#x'"), ['echo', '#x'])
+
+    def test_quotes_and_escapes(self):
+        self.assertEqual(split_command('echo "" a\\ b \'c d\'e "\\"q\\""'),
+                         ['echo', '', 'a b', 'c de', '"q"'])
+        with self.assertRaises(ValueError):
+            split_command('echo "open')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Быстрый запуск: тяжёлые модули и файл истории не загружаются заранее
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+
+# Модули, которые импортируются только внутри использующих их функций
+LAZY_MODULES = ('asyncio', 'concurrent.futures', 'subprocess', 'shutil', 'json', 'tempfile',
+                'socket', 'platform', 'queue', 'glob', 'readline', 'pathlib')
+
+
+def loaded_after(code):
+    """Какие из LAZY_MODULES загружены в свежем интерпретаторе после code"""
+    probe = (f"import sys\nsys.path.insert(0, {ROOT!r})\n{code}\n"
+             f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    with tempfile.TemporaryDirectory() as home:
+        result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True,
+                                env=dict(os.environ, HOME=home), check=True)
+    # последняя строка вывода — список модулей (перед ней может быть вывод команды)
+    return result.stdout.split('\n')[-2].split()
+
+
+class StartupTest(unittest.TestCase):
+    def test_import_is_light(self):
+        self.assertEqual(loaded_after('import dsh'), [])
+    
+    def test_batch_command_is_light(self):
+        self.assertEqual(loaded_after("import dsh\ndsh.main(['-c', 'pwd'])"), [])
+    
+    def test_history_read_on_first_use(self):
+        with tempfile.TemporaryDirectory() as home:
+            with open(os.path.join(home, '.doyarka_history'), 'w') as f:
+                f.write('ls\npwd\n')
+            probe = (f"import sys\nsys.path.insert(0, {ROOT!r})\nimport dsh\n"
+                     "terminal = dsh.DoyarkaTerminal()\n"
+                     "print(terminal.history.loaded, len(terminal.history), terminal.history.loaded)")
+            result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True,
+                                    env=dict(os.environ, HOME=home), check=True)
+        self.assertEqual(result.stdout.split()[-3:], ['False', '2', 'True'])
+    
+    def test_startup_profile(self):
+        result = subprocess.run([sys.executable, DSH, '--startup-profile'],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('dsh', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Замеры: time, stats, profile и счётчики CommandStats
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+from dsh import CommandStats, percentile
+
+
+def run(command):
+    """Выполнить команды в пакетном режиме: (код возврата, stdout)"""
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        env.pop('DSH_STATS', None)
+        result = subprocess.run([sys.executable, DSH, '-c', command], env=env,
+                                capture_output=True, text=True)
+    return result.returncode, result.stdout
+
+
+class CommandStatsTest(unittest.TestCase):
+    def test_percentile(self):
+        ordered = list(range(1, 101))
+        self.assertEqual(percentile([], 0.5), 0.0)
+        self.assertEqual(percentile(ordered, 0.50), 51)
+        self.assertEqual(percentile(ordered, 0.99), 100)
+        self.assertEqual(percentile([7], 0.95), 7)
+    
+    def test_rows(self):
+        stats = CommandStats(enabled=True)
+        for elapsed in (0.1, 0.2, 0.3):
+            stats.record('ls', True, elapsed)
+        stats.record('make', False, 5.0)
+        rows = stats.rows()
+        self.assertEqual([row[:3] for row in rows], [('make', False, 1), ('ls', True, 3)])
+        name, builtin, count, total, p50, p95, p99, peak = rows[1]
+        self.assertAlmostEqual(total, 0.6)
+        self.assertEqual((p50, peak), (0.2, 0.3))
+        stats.reset()
+        self.assertEqual(stats.rows(), [])
+
+
+class MeasureCommandsTest(unittest.TestCase):
+    def test_time_reports_and_keeps_status(self):
+        status, output = run('time sh -c "exit 3"')
+        self.assertEqual(status, 3)
+        for label in ('реальное', 'польз.', 'сист.'):
+            self.assertIn(label, output)
+    
+    def test_time_covers_pipeline(self):
+        status, output = run('time echo один два | wc -w')
+        self.assertEqual(status, 0)
+        self.assertEqual(output.split('\n')[0].split(), ['2'])
+        self.assertIn('реальное', output)
+    
+    def test_stats(self):
+        status, output = run('stats\nstats on\npwd\npwd\ntrue\nstats')
+        self.assertEqual(status, 0)
+        self.assertIn('stats: сбор выключен', output)
+        rows = {line.split()[0]: line.split()[1] for line in output.split('\n')
+                if line.startswith(('pwd ', 'true*'))}
+        self.assertEqual(rows, {'pwd': '2', 'true*': '1'})
+        self.assertEqual(run('stats bogus')[0], 1)
+    
+    def test_profile(self):
+        status, output = run('profile -n 5 pwd')
+        self.assertEqual(status, 0)
+        self.assertIn('горячие точки', output)
+        self.assertIn('cumulative', output)
+        status, output = run('profile -m pwd')
+        self.assertEqual(status, 0)
+        self.assertIn('profile: выделено сейчас', output)
+        self.assertEqual(run('profile -n x pwd')[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
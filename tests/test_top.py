@@ -0,0 +1,114 @@
+"""Снимки /proc для top и neofetch: CPU по разнице счётчиков, кэш снимка, процессы
+
+ProcSampler читает подставной каталог вместо /proc, поэтому тест не зависит
+от нагрузки машины. Файлы перезаписываются на месте: сэмплер перечитывает
+уже открытые дескрипторы.
+
+Запуск: python -m pytest tests (или python -m unittest discover tests)
+"""
+
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DSH = os.path.join(ROOT, 'dsh.py')
+sys.path.insert(0, ROOT)
+from dsh import ProcSampler
+
+
+def proc_stat(pid, name, state, utime, stime, rss_pages):
+    # поля после имени: состояние, 10 полей, utime, stime, ещё 8 полей, rss
+    fields = [state] + ['0'] * 10 + [str(utime), str(stime)] + ['0'] * 8 + [str(rss_pages)]
+    return f"{pid} ({name}) {' '.join(fields)}\n"
+
+
+class ProcSamplerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.write('stat', 'cpu  100 0 100 800 0 0 0 0 0 0\ncpu0 1 2 3 4\n')
+        self.write('meminfo', 'MemTotal:  2048 kB\nMemFree:  512 kB\nMemAvailable:  1024 kB\n'
+                              'SwapTotal:  100 kB\nSwapFree:  50 kB\n')
+        self.write('uptime', '12345.67 999.00\n')
+        self.write('loadavg', '0.50 0.25 0.10 1/100 4242\n')
+        self.write('cpuinfo', 'processor\t: 0\nmodel name\t: Test CPU @ 1GHz\n')
+        self.write('1/stat', proc_stat(1, 'init', 'S', 10, 5, 100))
+        self.write('42/stat', proc_stat(42, 'my (odd) name', 'R', 0, 0, 10))
+        self.sampler = ProcSampler(self.root)
+        self.sampler.clock_ticks = 100
+        self.addCleanup(self.sampler.close)
+    
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # на месте, без rename: открытые дескрипторы видят новое содержимое
+        with open(path, 'w') as f:
+            f.write(text)
+    
+    def test_system_counters(self):
+        first = self.sampler.sample(max_age=0)
+        self.assertEqual(first['cpu'], 0.0)
+        self.assertEqual(first['uptime'], 12345.67)
+        self.assertEqual(first['load'], (0.5, 0.25, 0.1))
+        self.assertEqual((first['mem_total'], first['mem_available']), (2048 * 1024, 1024 * 1024))
+        self.assertEqual((first['swap_total'], first['swap_free']), (100 * 1024, 50 * 1024))
+        self.assertIsNone(first['processes'])
+        
+        # за интервал: 800 тиков, из них 600 простоя — загрузка 25%
+        self.write('stat', 'cpu  200 0 200 1400 0 0 0 0 0 0\n')
+        self.assertAlmostEqual(self.sampler.sample(max_age=0)['cpu'], 25.0)
+    
+    def test_snapshot_cached(self):
+        first = self.sampler.sample()
+        self.assertIs(self.sampler.sample(), first)
+        # снимку без процессов нельзя ответить на запрос с процессами
+        with_processes = self.sampler.sample(processes=True)
+        self.assertIsNot(with_processes, first)
+        self.assertIs(self.sampler.sample(), with_processes)
+        self.assertIsNot(self.sampler.sample(max_age=0), with_processes)
+    
+    def test_processes(self):
+        self.sampler.sample(processes=True, max_age=0)
+        self.assertEqual(len(self.sampler.proc_fds), 2)
+        self.write('1/stat', proc_stat(1, 'init', 'S', 60, 5, 100))
+        os.remove(os.path.join(self.root, '42', 'stat'))
+        os.rmdir(os.path.join(self.root, '42'))
+        processes = self.sampler.sample(processes=True, max_age=0)['processes']
+        self.assertEqual(len(processes), 1)
+        pid, name, state, cpu, rss = processes[0]
+        self.assertEqual((pid, name, state, rss), (1, 'init', 'S', 100 * mmap.PAGESIZE))
+        self.assertGreater(cpu, 0.0)
+        # дескриптор исчезнувшего процесса закрыт
+        self.assertEqual(list(self.sampler.proc_fds), [1])
+    
+    def test_process_name_with_parentheses(self):
+        processes = self.sampler.sample(processes=True, max_age=0)['processes']
+        self.assertIn((42, 'my (odd) name', 'R', 0.0, 10 * mmap.PAGESIZE), processes)
+    
+    def test_static_info_and_missing_proc(self):
+        self.assertEqual(self.sampler.static()['cpu_model'], 'Test CPU @ 1GHz')
+        self.assertIsNone(ProcSampler(os.path.join(self.root, 'missing')).sample())
+
+
+@unittest.skipUnless(os.path.isdir('/proc/self'), 'нет /proc')
+class TopCommandTest(unittest.TestCase):
+    def run_dsh(self, command):
+        with tempfile.TemporaryDirectory() as home:
+            return subprocess.run([sys.executable, DSH, '-c', command], capture_output=True,
+                                  text=True, env=dict(os.environ, HOME=home), timeout=30)
+    
+    def test_batch_frames(self):
+        result = self.run_dsh('top -b -n 2 -d 0.1')
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.count('top - '), 2)
+        self.assertEqual(result.stdout.count('    PID S   %CPU     RSS'), 2)
+        self.assertEqual(self.run_dsh('top -n 0').returncode, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()